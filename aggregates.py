@@ -0,0 +1,94 @@
+"""
+Contadores de la clínica para los tableros de gestión.
+
+Mantiene las visitas por mes y los diagnósticos por especie, actualizados en
+O(1) con cada Pet.add_consultation (como los demás índices de toda la
+clínica), así que consultar un tablero cuesta lo mismo con cien consultas que
+con un millón. Las mascotas por raza salen del índice por raza del registro,
+que ya se actualiza con cada alta de mascota.
+
+Especies y diagnósticos se agrupan sin distinguir mayúsculas ("Otitis" y
+"otitis" son el mismo diagnóstico) y se muestran como se escribieron la
+primera vez.
+"""
+import functools
+from collections import Counter
+
+import classes
+from dates import NO_DATE, from_epoch_day
+from registry import fold_name
+
+
+@functools.lru_cache(maxsize=65536)
+def month_of(day):
+    """Mes 'AAAA-MM' de un día (días desde 1970-01-01), o None para fechas no interpretables."""
+    if day == NO_DATE:
+        return None
+    date = from_epoch_day(day)
+    return f"{date.year:04d}-{date.month:02d}"
+
+
+class ClinicAggregates:
+    """Visitas por mes y diagnósticos por especie de todas las consultas."""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._visits_by_month = Counter()  # 'AAAA-MM' -> consultas
+        self._diagnoses = {}  # especie normalizada -> Counter(diagnóstico normalizado)
+        self._labels = {}  # texto normalizado -> como se escribió la primera vez
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _key(self, value):
+        key = fold_name(value)
+        if key not in self._labels:
+            self._labels[key] = value
+        return key
+
+    def add(self, pet, consultation):
+        """Cuenta la consulta en su mes y en los diagnósticos de la especie de la mascota."""
+        month = month_of(consultation.day)
+        if month is not None:
+            self._visits_by_month[month] += 1
+        species = self._key(pet.species)
+        diagnoses = self._diagnoses.get(species)
+        if diagnoses is None:
+            diagnoses = self._diagnoses[species] = Counter()
+        diagnoses[self._key(consultation.diagnosis)] += 1
+        self._size += 1
+
+    def rebuild(self, pets):
+        """Recalcula los contadores en una sola pasada sobre las mascotas."""
+        self._reset()
+        for pet in pets:
+            for consultation in pet.consultations:
+                self.add(pet, consultation)
+
+    def attach(self):
+        """Empieza a recibir cada consulta agregada con Pet.add_consultation."""
+        if self.add not in classes.consultation_listeners:
+            classes.consultation_listeners.append(self.add)
+
+    def detach(self):
+        if self.add in classes.consultation_listeners:
+            classes.consultation_listeners.remove(self.add)
+
+    def visits_per_month(self, start=None, end=None):
+        """Lista de (mes 'AAAA-MM', visitas) en orden cronológico, opcionalmente entre start y end (inclusive)."""
+        return sorted(
+            (month, count) for month, count in self._visits_by_month.items()
+            if (start is None or month >= start) and (end is None or month <= end)
+        )
+
+    def top_diagnoses(self, species, limit=5):
+        """Los `limit` diagnósticos más frecuentes de la especie: lista de (diagnóstico, consultas)."""
+        diagnoses = self._diagnoses.get(fold_name(species), Counter())
+        return [(self._labels[key], count) for key, count in diagnoses.most_common(limit)]
+
+    def top_diagnoses_by_species(self, limit=5):
+        """{especie: top_diagnoses(especie, limit)} para cada especie con consultas."""
+        return {self._labels[species]: self.top_diagnoses(species, limit) for species in sorted(self._diagnoses)}
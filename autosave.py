@@ -0,0 +1,135 @@
+"""
+Autoguardado periódico en segundo plano.
+
+ChangeTracker cuenta los cambios desde el último guardado (altas de dueños,
+mascotas y consultas), a partir de los avisos del registro
+(Registry.listeners) y de Pet.add_consultation. Solo hace falta saber si hubo
+cambios: cada guardado escribe el registro completo, así que no se guarda
+referencia a los objetos cambiados. Los historiales que se cargan bajo
+demanda no cuentan: ya están guardados.
+
+Autosaver revisa cada `interval` segundos desde un hilo aparte, así que el
+menú sigue esperando en input() mientras tanto: si no hubo cambios no escribe
+nada, y si los hubo llama a la función de guardado (que trabaja sobre una
+copia instantánea del registro). Si el guardado falla, los cambios quedan
+anotados para el próximo intento.
+"""
+import logging
+import threading
+
+import classes
+
+# Segundos entre revisiones del autoguardado si no se indica otro intervalo
+DEFAULT_INTERVAL = 60
+
+
+class ChangeTracker:
+    """Cantidad de cambios desde el último guardado."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._changes = 0
+        self._reset = False  # alguna lista cambió sin ser un alta (borrado, reordenamiento)
+
+    def __bool__(self):
+        return bool(self._changes or self._reset)
+
+    def registry_changed(self, kind, item):
+        with self._lock:
+            if item is None:
+                self._reset = True
+            else:
+                self._changes += 1
+
+    def consultation_added(self, pet, consultation):
+        with self._lock:
+            self._changes += 1
+
+    def attach(self, registry):
+        """Empieza a contar los cambios del registro y las consultas nuevas."""
+        if self.registry_changed not in registry.listeners:
+            registry.listeners.append(self.registry_changed)
+        if self.consultation_added not in classes.consultation_listeners:
+            classes.consultation_listeners.append(self.consultation_added)
+
+    def detach(self, registry):
+        if self.registry_changed in registry.listeners:
+            registry.listeners.remove(self.registry_changed)
+        if self.consultation_added in classes.consultation_listeners:
+            classes.consultation_listeners.remove(self.consultation_added)
+
+    def take(self):
+        """Devuelve los cambios anotados (cantidad, otros cambios) y empieza de cero."""
+        with self._lock:
+            changes = (self._changes, self._reset)
+            self._changes, self._reset = 0, False
+        return changes
+
+    def restore(self, changes):
+        """Vuelve a anotar cambios que no se pudieron guardar."""
+        count, reset = changes
+        with self._lock:
+            self._changes += count
+            self._reset = self._reset or reset
+
+
+class Autosaver:
+    """Hilo que guarda cada `interval` segundos, solo si hubo cambios desde el último guardado."""
+
+    def __init__(self, registry, save, interval=DEFAULT_INTERVAL):
+        """save() guarda el registro completo y devuelve True si pudo."""
+        if interval <= 0:
+            raise ValueError("Autosave interval must be a positive number of seconds.")
+        self.registry = registry
+        self.interval = interval
+        self.tracker = ChangeTracker()
+        self.saves = 0
+        self.skipped = 0
+        self._save = save
+        self._save_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.tracker.attach(self.registry)
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name='autosave', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo, esperando a que termine un guardado en curso. No guarda lo pendiente."""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.tracker.detach(self.registry)
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            try:
+                self.save_if_changed()
+            except Exception as e:
+                logging.error("Autosave failed: %s", e)
+
+    def save_if_changed(self):
+        """
+        Guarda si hubo cambios. Devuelve True si guardó o no hacía falta, y False si el guardado
+        falló. Los cambios que llegan durante el guardado quedan anotados para el siguiente.
+        """
+        with self._save_lock:
+            changes = self.tracker.take()
+            count, reset = changes
+            if not (count or reset):
+                self.skipped += 1
+                logging.debug("Autosave skipped: no changes since the last save")
+                return True
+            saved = False
+            try:
+                saved = self._save()
+            finally:
+                if not saved:
+                    self.tracker.restore(changes)
+            if saved:
+                self.saves += 1
+                logging.info("Saved %d changes", count)
+            return saved
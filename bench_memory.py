@@ -0,0 +1,151 @@
+"""
+Benchmark de memoria: bytes por registro de Owner, Pet y Consultation.
+
+Compara la representación actual (__slots__, cadenas internadas e historial
+creado bajo demanda) con la representación anterior basada en __dict__.
+
+Uso:
+    python bench_memory.py [--owners N] [--pets-per-owner N] [--consultations-per-pet N]
+"""
+import argparse
+import gc
+import random
+import tracemalloc
+
+from classes import Owner, Pet, Consultation
+
+SPECIES = {"Perro": ["Labrador", "Beagle", "Boxer", "Pug"], "Gato": ["Siames", "Persa", "Angora"]}
+REASONS = ["Vacunación", "Control", "Cojera", "Vómito", "Tos", "Cirugía"]
+DIAGNOSES = ["Sano", "Otitis", "Gastritis", "Esguince", "Resfriado", "Recuperado"]
+
+
+class LegacyOwner:
+    """Representación anterior de Owner (atributos en __dict__)."""
+    def __init__(self, name, phone, address):
+        self._name = name
+        self._phone = phone
+        self._address = address
+
+
+class LegacyPet:
+    """Representación anterior de Pet (lista de consultas siempre creada)."""
+    def __init__(self, name, species, breed, age, owner):
+        self._name = name
+        self._species = species
+        self._breed = breed
+        self._age = age
+        self._owner = owner
+        self._consultations = []
+
+    def add_consultation(self, consultation):
+        self._consultations.append(consultation)
+
+
+class LegacyConsultation:
+    """Representación anterior de Consultation."""
+    def __init__(self, date, reason, diagnosis, pet):
+        self._date = date
+        self._reason = reason
+        self._diagnosis = diagnosis
+        self._pet = pet
+
+
+def _parsed(value):
+    """Devuelve una copia nueva de la cadena, como si se hubiera leído de un archivo."""
+    return "".join(list(value))
+
+
+def _generate_rows(owners, pets_per_owner, consultations_per_pet, seed=1234):
+    rng = random.Random(seed)
+    for o in range(owners):
+        owner_row = (f"Owner {o}", f"{5550000 + o}", f"Calle {o}")
+        pet_rows = []
+        for p in range(pets_per_owner):
+            species = rng.choice(list(SPECIES))
+            pet_row = (f"Pet {o}-{p}", _parsed(species), _parsed(rng.choice(SPECIES[species])), rng.randint(0, 15))
+            consultation_rows = [
+                (_parsed(f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024"),
+                 _parsed(rng.choice(REASONS)), _parsed(rng.choice(DIAGNOSES)))
+                for _ in range(consultations_per_pet)
+            ]
+            pet_rows.append((pet_row, consultation_rows))
+        yield owner_row, pet_rows
+
+
+def _measure(build, rows_factory):
+    """
+    Construye los objetos con `build` y devuelve los bytes que siguen asignados.
+    Las filas se generan durante la medición y se descartan, como en una importación real.
+    """
+    gc.collect()
+    tracemalloc.start()
+    objects = build(rows_factory())
+    gc.collect()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return current
+
+
+def _build(owner_cls, pet_cls, consultation_cls, level):
+    """level: 0 solo dueños, 1 dueños y mascotas, 2 también consultas."""
+    def build(rows):
+        objects = []
+        for owner_row, pet_rows in rows:
+            owner = owner_cls(*owner_row)
+            objects.append(owner)
+            if level < 1:
+                continue
+            for pet_row, consultation_rows in pet_rows:
+                pet = pet_cls(*pet_row, owner)
+                objects.append(pet)
+                if level < 2:
+                    continue
+                for consultation_row in consultation_rows:
+                    pet.add_consultation(consultation_cls(*consultation_row, pet))
+        return objects
+    return build
+
+
+def run(owners=2000, pets_per_owner=2, consultations_per_pet=10):
+    """Devuelve un diccionario con los bytes por registro antes y después."""
+    def rows_factory():
+        return _generate_rows(owners, pets_per_owner, consultations_per_pet)
+
+    n_pets = owners * pets_per_owner
+    n_consultations = n_pets * consultations_per_pet
+    layouts = {
+        "before": (LegacyOwner, LegacyPet, LegacyConsultation),
+        "after": (Owner, Pet, Consultation),
+    }
+    results = {}
+    for label, classes in layouts.items():
+        owners_only, with_pets, with_all = (
+            _measure(_build(*classes, level), rows_factory) for level in (0, 1, 2)
+        )
+        results[label] = {
+            "owner": owners_only / owners,
+            "pet": (with_pets - owners_only) / n_pets if n_pets else 0.0,
+            "consultation": (with_all - with_pets) / n_consultations if n_consultations else 0.0,
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per record for Owner/Pet/Consultation.")
+    parser.add_argument("--owners", type=int, default=2000)
+    parser.add_argument("--pets-per-owner", type=int, default=2)
+    parser.add_argument("--consultations-per-pet", type=int, default=10)
+    args = parser.parse_args()
+
+    results = run(args.owners, args.pets_per_owner, args.consultations_per_pet)
+    print(f"{'record':<14}{'before (B)':>12}{'after (B)':>12}{'saving':>10}")
+    for record in ("owner", "pet", "consultation"):
+        before = results["before"][record]
+        after = results["after"][record]
+        saving = (1 - after / before) * 100 if before else 0.0
+        print(f"{record:<14}{before:>12.1f}{after:>12.1f}{saving:>9.1f}%")
+
+
+if __name__ == "__main__":
+    main()
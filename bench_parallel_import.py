@@ -0,0 +1,93 @@
+"""
+Benchmark de la importación en paralelo por archivos frente a la importación en serie.
+
+Genera varios archivos (uno por recepción) con mascotas, dueños y consultas
+sintéticos y mide filas por segundo importándolos uno tras otro con
+import_mascotas_duenos_csv/import_consultas_json y con parallel_import.import_shards.
+
+Uso:
+    python bench_parallel_import.py [--shards N] [--pets-per-shard N] [--consultations-per-pet N] [--workers N]
+"""
+import argparse
+import contextlib
+import csv
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+import functions
+from parallel_import import import_shards
+
+
+def write_shards(directory, shards, pets_per_shard, consultations_per_pet, seed=1234):
+    """Escribe los archivos de prueba y devuelve (lista de CSV, lista de NDJSON)."""
+    rng = random.Random(seed)
+    csv_files, json_files = [], []
+    for shard in range(shards):
+        csv_name = os.path.join(directory, f"mascotas_{shard}.csv")
+        json_name = os.path.join(directory, f"consultas_{shard}.ndjson")
+        with open(csv_name, 'w', newline='', encoding='utf-8') as csvfile, \
+                open(json_name, 'w', encoding='utf-8') as jsonfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(['pet_name', 'species', 'breed', 'age', 'owner_name', 'owner_phone', 'owner_address'])
+            for number in range(pets_per_shard):
+                pet_name = f"Pet {shard}-{number}"
+                writer.writerow([pet_name, 'Perro', 'Labrador', rng.randint(0, 15),
+                                 f"Owner {shard}-{number // 2}", '5550000', f"Calle {number}"])
+                for visit in range(consultations_per_pet):
+                    jsonfile.write(json.dumps({
+                        'pet_name': pet_name,
+                        'date': f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2024",
+                        'reason': rng.choice(['Control', 'Vacuna', 'Tos']),
+                        'diagnosis': rng.choice(['Sano', 'Otitis', 'Resfriado']),
+                    }) + '\n')
+        csv_files.append(csv_name)
+        json_files.append(json_name)
+    return csv_files, json_files
+
+
+def run(shards=4, pets_per_shard=20000, consultations_per_pet=3, workers=None):
+    """Devuelve los tiempos y filas por segundo de la importación en serie y en paralelo."""
+    with tempfile.TemporaryDirectory() as directory:
+        csv_files, json_files = write_shards(directory, shards, pets_per_shard, consultations_per_pet)
+        total_rows = shards * pets_per_shard * (1 + consultations_per_pet)
+        results = {}
+
+        functions.reset_data()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            for name in csv_files:
+                functions.import_mascotas_duenos_csv(name)
+            for name in json_files:
+                functions.import_consultas_json(name)
+        results['serial'] = time.perf_counter() - start
+        serial_pets = len(functions.pets)
+
+        functions.reset_data()
+        start = time.perf_counter()
+        import_shards(csv_files, json_files, max_workers=workers)
+        results['parallel'] = time.perf_counter() - start
+        assert len(functions.pets) == serial_pets
+        functions.reset_data()
+    return {mode: {'seconds': seconds, 'rows_per_second': total_rows / seconds}
+            for mode, seconds in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serial vs parallel sharded import throughput.")
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--pets-per-shard", type=int, default=20000)
+    parser.add_argument("--consultations-per-pet", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    results = run(args.shards, args.pets_per_shard, args.consultations_per_pet, args.workers)
+    for mode, result in results.items():
+        print(f"{mode:<10}{result['seconds']:>10.2f} s{result['rows_per_second']:>14,.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Suite de benchmarks con datos sintéticos: importación, exportación, búsqueda y listados.
+
+Genera una clínica sintética reproducible (semilla fija) con la cantidad de
+dueños, mascotas por dueño y consultas por mascota indicada, y mide:
+
+- export_all e import_all (archivos CSV/JSON en un directorio temporal)
+- import_all con historiales bajo demanda (use_lazy_histories)
+- export_snapshot e import_snapshot (snapshot binario; los historiales quedan sin cargar)
+- find_pet_by_name
+- registro de consultas por el camino no interactivo (services.add_consultations)
+- el texto del listado de mascotas (iter_pets_rendered, lo que muestra list_pets)
+- el pico de memoria de import_all (tracemalloc)
+
+Los resultados se guardan en JSON. Con --compare se comparan contra un archivo
+de resultados anterior y se informa cada métrica que empeoró más que la
+tolerancia (el programa termina con código 1 si hay regresiones).
+
+Uso:
+    python bench_suite.py [--owners N] [--pets-per-owner N] [--consultations-per-pet N]
+                          [--seed N] [--repeat N] [--output archivo.json]
+                          [--compare base.json] [--tolerance 0.10] [--with-metrics]
+
+--with-metrics mide con las métricas de operaciones activas (metrics.enable), para
+conocer su costo comparando contra una ejecución sin ellas.
+"""
+import argparse
+import contextlib
+import datetime
+import gc
+import io
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import functions
+import metrics
+import services
+from classes import Owner, Pet, Consultation
+from clinic_logging import redirect_logging
+
+SPECIES = {"Perro": ["Labrador", "Beagle", "Boxer", "Pug"], "Gato": ["Siames", "Persa", "Angora"]}
+REASONS = ["Vacunación", "Control", "Cojera", "Vómito", "Tos", "Cirugía"]
+DIAGNOSES = ["Sano", "Otitis", "Gastritis", "Esguince", "Resfriado", "Recuperado"]
+
+# Métricas donde un valor mayor es peor (las demás se derivan de estas)
+COMPARED_FIELDS = ("seconds", "peak_bytes")
+
+
+def generate_clinic(owners, pets_per_owner, consultations_per_pet, seed=1234):
+    """Carga en memoria una clínica sintética; con la misma semilla siempre genera los mismos datos."""
+    rng = random.Random(seed)
+    functions.reset_data()
+    for o in range(owners):
+        owner = Owner(f"Owner {o}", f"{5550000 + o}", f"Calle {o}")
+        functions.owners.append(owner)
+        for p in range(pets_per_owner):
+            species = rng.choice(list(SPECIES))
+            pet = Pet(f"Pet {o}-{p}", species, rng.choice(SPECIES[species]), rng.randint(0, 15), owner)
+            functions.pets.append(pet)
+            for _ in range(consultations_per_pet):
+                date = f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2018, 2024)}"
+                pet.add_consultation(Consultation(date, rng.choice(REASONS), rng.choice(DIAGNOSES), pet))
+
+
+def _best_of(repeat, operation, setup=None):
+    """Ejecuta la operación `repeat` veces y devuelve el menor tiempo (en segundos)."""
+    best = None
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        operation()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _result(seconds, operations):
+    return {"seconds": seconds, "operations": operations,
+            "per_second": operations / seconds if seconds else 0.0}
+
+
+def run(owners=2000, pets_per_owner=2, consultations_per_pet=10, seed=1234, repeat=3):
+    """Ejecuta todas las mediciones y devuelve {"meta": ..., "results": {métrica: valores}}."""
+    n_pets = owners * pets_per_owner
+    n_rows = owners + n_pets + n_pets * consultations_per_pet
+    rng = random.Random(seed + 1)
+    results = {}
+    previous_directory = os.getcwd()
+    # El log de cada operación medida va al directorio temporal y no al de la clínica
+    with tempfile.TemporaryDirectory() as directory, contextlib.redirect_stdout(io.StringIO()), \
+            redirect_logging(os.path.join(directory, "clinica_veterinaria.log")):
+        os.chdir(directory)
+        try:
+            generate_clinic(owners, pets_per_owner, consultations_per_pet, seed)
+            results["export_all"] = _result(_best_of(repeat, functions.export_all), n_rows)
+            results["import_all"] = _result(_best_of(repeat, functions.import_all, functions.reset_data), n_rows)
+
+            functions.use_lazy_histories()
+            try:
+                results["import_all_lazy"] = _result(
+                    _best_of(repeat, functions.import_all, functions.reset_data), n_rows)
+            finally:
+                functions.use_lazy_histories(False)
+            results["export_snapshot"] = _result(
+                _best_of(repeat, lambda: functions.export_snapshot("clinica.snap")), n_rows)
+            results["import_snapshot"] = _result(
+                _best_of(repeat, lambda: functions.import_snapshot("clinica.snap"), functions.reset_data), n_rows)
+
+            gc.collect()
+            tracemalloc.start()
+            functions.reset_data()
+            functions.import_all()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results["import_all_memory"] = {"peak_bytes": peak, "rows": n_rows}
+
+            names = [f"Pet {rng.randrange(owners)}-{rng.randrange(pets_per_owner)}" for _ in range(10000)]
+            names += [f"pet {o}-x" for o in range(1000)]  # búsquedas sin resultado
+            results["find_pet_by_name"] = _result(
+                _best_of(repeat, lambda: [functions.find_pet_by_name(name) for name in names]), len(names))
+
+            results["list_pets_render"] = _result(
+                _best_of(repeat, lambda: "\n".join(functions.iter_pets_rendered())), n_pets)
+
+            batches = iter([
+                [{"pet_name": f"Pet {rng.randrange(owners)}-{rng.randrange(pets_per_owner)}",
+                  "date": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/2025",
+                  "reason": f"Control {run_number}-{number}", "diagnosis": rng.choice(DIAGNOSES)}
+                 for number in range(2000)]
+                for run_number in range(repeat)
+            ])
+            # Una llamada por consulta, como el registro desde el menú; cada repetición registra consultas nuevas
+            results["register_consultation"] = _result(
+                _best_of(repeat, lambda: [services.add_consultations([record]) for record in next(batches)]), 2000)
+        finally:
+            functions.reset_data()
+            os.chdir(previous_directory)
+
+    meta = {
+        "owners": owners, "pets_per_owner": pets_per_owner,
+        "consultations_per_pet": consultations_per_pet, "seed": seed, "repeat": repeat,
+        "metrics_enabled": metrics.enabled,
+        "python": platform.python_version(), "platform": platform.platform(),
+        "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+    }
+    return {"meta": meta, "results": results}
+
+
+def compare_results(current, baseline, tolerance=0.10):
+    """
+    Compara dos resultados de run(). Devuelve una lista de regresiones
+    (métrica, campo, valor base, valor actual, cambio relativo) donde el valor
+    actual supera al de la base en más de `tolerance`.
+    """
+    regressions = []
+    for metric, values in current["results"].items():
+        base_values = baseline.get("results", {}).get(metric)
+        if base_values is None:
+            continue
+        for field in COMPARED_FIELDS:
+            if field not in values or not base_values.get(field):
+                continue
+            change = values[field] / base_values[field] - 1
+            if change > tolerance:
+                regressions.append((metric, field, base_values[field], values[field], change))
+    return regressions
+
+
+def print_results(report):
+    meta = report["meta"]
+    print(f"Synthetic clinic: {meta['owners']} owners x {meta['pets_per_owner']} pets x "
+          f"{meta['consultations_per_pet']} consultations (seed {meta['seed']})")
+    for metric, values in report["results"].items():
+        if "seconds" in values:
+            print(f"{metric:<24}{values['seconds']:>10.4f} s{values['per_second']:>16,.0f} ops/s")
+        else:
+            print(f"{metric:<24}{values['peak_bytes'] / 1024 / 1024:>10.1f} MiB peak")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic benchmarks for import, export, lookup and listing.")
+    parser.add_argument("--owners", type=int, default=2000)
+    parser.add_argument("--pets-per-owner", type=int, default=2)
+    parser.add_argument("--consultations-per-pet", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json", help="where to write the JSON results")
+    parser.add_argument("--compare", help="baseline JSON results to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed slowdown (0.10 = 10%%)")
+    parser.add_argument("--with-metrics", action="store_true", help="run with operation metrics enabled")
+    args = parser.parse_args()
+
+    if args.with_metrics:
+        metrics.enable()
+
+    report = run(args.owners, args.pets_per_owner, args.consultations_per_pet, args.seed, args.repeat)
+    print_results(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_results(report, baseline, args.tolerance)
+        for metric, field, before, after, change in regressions:
+            print(f"REGRESSION {metric}.{field}: {before:.4g} -> {after:.4g} (+{change:.0%})")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.compare} (tolerance {args.tolerance:.0%}).")
+
+
+if __name__ == "__main__":
+    main()
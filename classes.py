@@ -1,8 +1,132 @@
+import sys
+import threading
 from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from operator import attrgetter
+
+from dates import NO_DATE, to_epoch_day
+
+
+# Callables notified as listener(pet, consultation) after every Pet.add_consultation.
+# Secondary indexes (columnar store, search, aggregates) register themselves here.
+consultation_listeners = []
+
+# Serializes loading pending histories, so two threads reading the same pet load it only once
+_history_lock = threading.Lock()
+
+
+def _intern(value):
+    """Interns repeated low-cardinality strings so equal values share one object."""
+    return sys.intern(value) if type(value) is str else value
+
+
+_day_of = attrgetter('_day')
+
+
+class IdSequence:
+    """
+    Hands out increasing integer IDs. IDs read from files are reserved, so the ones
+    handed out later never repeat them.
+    """
+
+    def __init__(self):
+        self._next = 1
+        self._lock = threading.Lock()
+
+    def take(self):
+        with self._lock:
+            value = self._next
+            self._next += 1
+            return value
+
+    def take_once(self, holder):
+        """Gives holder (an object with an _id slot) an ID unless it already has one; returns it."""
+        with self._lock:
+            if holder._id is None:
+                holder._id = self._next
+                self._next += 1
+            return holder._id
+
+    def reserve(self, value):
+        """Makes sure every later ID is greater than value."""
+        if value >= self._next:
+            with self._lock:
+                if value >= self._next:
+                    self._next = value + 1
+
+    def last(self):
+        """The largest ID handed out or reserved so far (0 if none)."""
+        return self._next - 1
+
+
+owner_ids = IdSequence()
+pet_ids = IdSequence()
+consultation_ids = IdSequence()
+
+
+# Consultation IDs are not indexed anywhere (a global set would cost memory per consultation),
+# so collisions between sources are only checked while loading them.
+
+def consultation_id_floor(pets):
+    """
+    Largest consultation ID that may already be in use among pets, loaded or pending.
+    0 if none of them has consultations, so a source loaded into an empty registry keeps its IDs.
+    """
+    if any(pet._consultations or pet._history_source is not None for pet in pets):
+        return consultation_ids.last()
+    return 0
+
+
+def keep_id(value, floor):
+    """
+    ID of a consultation read from a lazily loaded source. Its IDs are unique within the source;
+    the ones up to floor (taken when the source was attached) may repeat another source's, so
+    they are dropped and the consultation gets a fresh ID on first use.
+    """
+    return value if value is not None and value > floor else None
+
+
+class ConsultationIdClaims:
+    """
+    Consultation IDs in use during one import: the IDs of the loaded histories plus the ones
+    claimed so far. The IDs of pending histories are all at most floor. It only lives as long
+    as the import, so no set of IDs is kept afterwards.
+    """
+    __slots__ = ('_used', '_floor')
+
+    def __init__(self, pets):
+        self._used = {
+            consultation._id
+            for pet in pets if pet._history_source is None
+            for consultation in pet._consultations or ()
+            if consultation._id is not None
+        }
+        pending = any(pet._history_source is not None for pet in pets)
+        self._floor = consultation_ids.last() if pending else 0
+
+    def claim(self, value):
+        """
+        Returns value, reserved, if no other consultation has it. Returns None if value is None
+        or taken: the consultation then gets a fresh ID on first use.
+        """
+        if value is None or value <= self._floor or value in self._used:
+            return None
+        self._used.add(value)
+        consultation_ids.reserve(value)
+        return value
+
+
+def _assign_id(sequence, value):
+    if value is None:
+        return sequence.take()
+    sequence.reserve(value)
+    return value
 
 # Abstract class (Abstraction)
 class Person(ABC):
     """Abstract class representing a person. Demonstrates abstraction."""
+    __slots__ = ('_name', '__weakref__')
+
     def __init__(self, name):
         self._name = name  # Encapsulation: protected attribute
 
@@ -18,10 +142,13 @@ class Person(ABC):
 # Inheritance: Owner inherits from Person
 class Owner(Person):
     """Class representing a pet owner. Demonstrates inheritance and encapsulation."""
-    def __init__(self, name, phone, address):
+    __slots__ = ('_phone', '_address', '_id')
+
+    def __init__(self, name, phone, address, id=None):
         super().__init__(name)
         self._phone = phone
         self._address = address
+        self._id = _assign_id(owner_ids, id)  # Stable integer ID, carried through exports
 
     def show_info(self):
         """Shows the owner's information. Polymorphism in action."""
@@ -31,6 +158,10 @@ class Owner(Person):
         return self.show_info()
 
     # Encapsulation: getters
+    @property
+    def id(self):
+        return self._id
+
     @property
     def phone(self):
         return self._phone
@@ -41,55 +172,168 @@ class Owner(Person):
 
 class Pet:
     """Class representing a pet. Demonstrates encapsulation and polymorphism."""
-    def __init__(self, name, species, breed, age, owner):
+    __slots__ = ('_id', '_name', '_species', '_breed', '_age', '_owner',
+                 '_consultations', '_fingerprints', '_fingerprinted', '_history_source', '__weakref__')
+
+    def __init__(self, name, species, breed, age, owner, id=None):
+        self._id = _assign_id(pet_ids, id)  # Stable integer ID, carried through exports
         self._name = name
-        self._species = species
-        self._breed = breed
+        self._species = _intern(species)
+        self._breed = _intern(breed)
         self._age = age
         self._owner = owner  # Owner is an object of the Owner class
-        self._consultations = []  # List to store consultations
+        self._consultations = None  # List to store consultations, created on first use
+        self._fingerprints = None  # (date, reason, diagnosis) of each consultation
+        self._fingerprinted = 0  # Number of consultations covered by _fingerprints
+        self._history_source = None  # (source, key) of a persisted history not loaded yet
+
+    def set_history_source(self, source, key):
+        """
+        Defers loading the history: on first access source.load_consultations(pet, key)
+        must return the persisted consultations of this pet, sorted by date.
+        """
+        self._history_source = (source, key)
+
+    @property
+    def history_loaded(self):
+        """False while the history is still waiting in its persisted source."""
+        return self._history_source is None
+
+    def _history(self):
+        """The history list (None if the pet has no consultations), loading it first if it is pending."""
+        if self._history_source is not None:
+            with _history_lock:
+                if self._history_source is not None:
+                    source, key = self._history_source
+                    # If loading fails the history stays pending instead of looking empty
+                    self._consultations = source.load_consultations(self, key) or None
+                    self._fingerprints = None
+                    self._fingerprinted = 0
+                    self._history_source = None
+        return self._consultations
 
     def add_consultation(self, consultation):
-        """Adds a consultation to the pet's history."""
-        self._consultations.append(consultation)
+        """Adds a consultation to the pet's history, keeping it sorted by date."""
+        if self._history() is None:
+            self._consultations = []
+        self._sync_fingerprints()
+        history = self._consultations
+        if not history or history[-1].day <= consultation.day:
+            history.append(consultation)
+        else:
+            history.insert(bisect_right(history, consultation.day, key=_day_of), consultation)
+        self._fingerprints.add(consultation.fingerprint)
+        self._fingerprinted += 1
+        for listener in consultation_listeners:
+            listener(self, consultation)
+
+    def has_consultation(self, date, reason, diagnosis):
+        """Checks in constant time whether an equal consultation is already registered."""
+        if not self._history():
+            return False
+        self._sync_fingerprints()
+        return (date, reason, diagnosis) in self._fingerprints
+
+    def _sync_fingerprints(self):
+        """Rebuilds the fingerprint set if the history list was modified directly."""
+        if self._fingerprints is None or self._fingerprinted != len(self._consultations):
+            self._fingerprints = {c.fingerprint for c in self._consultations}
+            self._fingerprinted = len(self._consultations)
 
     def show_info(self):
         """Shows the pet's information and its owner. Polymorphism in action."""
         return (f"Pet: {self._name} | Species: {self._species} | "
                 f"Breed: {self._breed} | Age: {self._age} years\nOwner: {self._owner}")
 
+    def recent_consultations(self, limit=5, offset=0):
+        """Returns up to `limit` consultations, newest first, skipping the `offset` most recent."""
+        history = self._history() or []
+        end = max(len(history) - offset, 0)
+        return history[max(end - limit, 0):end][::-1]
+
+    def consultations_between(self, start, end):
+        """Returns the consultations dated between start and end (inclusive), oldest first."""
+        history = self._history() or []
+        start_day, end_day = to_epoch_day(start), to_epoch_day(end)
+        if start_day is None or end_day is None:
+            raise ValueError("Dates must look like 10/05/2024 or 2024-05-10.")
+        return history[bisect_left(history, start_day, key=_day_of):bisect_right(history, end_day, key=_day_of)]
+
+    def iter_consultations(self, offset=0, limit=None, newest_first=False):
+        """Yields the rendered consultations one by one, starting at `offset`, at most `limit` of them."""
+        history = self._history() or []
+        total = len(history)
+        stop = total if limit is None else min(offset + limit, total)
+        for position in range(offset, stop):
+            yield str(history[total - 1 - position] if newest_first else history[position])
+
     def show_consultations(self):
         """Displays the consultation history of the pet."""
-        if not self._consultations:
+        if not self._history():
             return "No consultations registered for this pet."
-        return "\n".join([str(c) for c in self._consultations])
+        return "\n".join(self.iter_consultations())
 
     def __str__(self):
         # Polymorphism: custom __str__ method
         return self.show_info()
 
     # Encapsulation: getters
+    @property
+    def id(self):
+        return self._id
+
     @property
     def name(self):
         return self._name
 
+    @property
+    def species(self):
+        return self._species
+
+    @property
+    def breed(self):
+        return self._breed
+
+    @property
+    def age(self):
+        return self._age
+
+    @property
+    def owner(self):
+        return self._owner
+
     @property
     def consultations(self):
-        return self._consultations
+        # Pets without history share no list; use add_consultation to add entries
+        history = self._history()
+        return history if history is not None else []
 
 class Consultation:
     """Class representing a veterinary consultation. Demonstrates encapsulation."""
-    def __init__(self, date, reason, diagnosis, pet):
-        self._date = date
-        self._reason = reason
-        self._diagnosis = diagnosis
+    __slots__ = ('_id', '_date', '_reason', '_diagnosis', '_pet', '_day')
+
+    def __init__(self, date, reason, diagnosis, pet, id=None):
+        # Consultations are created in bulk on import: an ID read from a file is kept unless
+        # another consultation has it (see ConsultationIdClaims), and a new one gets its ID on first use
+        self._id = id
+        self._date = _intern(date)
+        self._reason = _intern(reason)
+        self._diagnosis = _intern(diagnosis)
         self._pet = pet
+        day = to_epoch_day(date)
+        self._day = NO_DATE if day is None else day
 
     def __str__(self):
         return (f"Date: {self._date} | Reason: {self._reason} | "
                 f"Diagnosis: {self._diagnosis}")
 
     # Encapsulation: getters
+    @property
+    def id(self):
+        if self._id is None:
+            return consultation_ids.take_once(self)
+        return self._id
+
     @property
     def date(self):
         return self._date
@@ -106,6 +350,16 @@ class Consultation:
     def pet(self):
         return self._pet
 
+    @property
+    def day(self):
+        """Days since 1970-01-01, used to keep histories in date order."""
+        return self._day
+
+    @property
+    def fingerprint(self):
+        """Identity used to detect duplicated consultations."""
+        return (self._date, self._reason, self._diagnosis)
+
 # Polymorphism example
 def show_person(person):
     """Polymorphism example: accepts any object derived from Person."""
@@ -0,0 +1,106 @@
+"""
+Configuración del log de la clínica sin bloquear a quien registra eventos.
+
+Los registros se encolan con un QueueHandler y un QueueListener los escribe
+al archivo desde su propio hilo. El mensaje se formatea recién en ese hilo,
+así que llamadas como logging.info("Pet registered: %s", pet) no ejecutan
+str(pet) en el camino de registro. Opcionalmente el archivo rota por tamaño
+o por tiempo.
+"""
+import atexit
+import contextlib
+import logging
+import logging.handlers
+import queue
+
+LOG_FORMAT = '%(asctime)s | %(levelname)s | %(message)s'
+DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+_listener = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler que encola el registro sin formatearlo.
+    La cola vive en el mismo proceso, por lo que no hace falta convertir los
+    argumentos a texto antes de encolarlos.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def _file_handler(filename, rotation, max_bytes, backup_count, when):
+    if rotation is None:
+        return logging.FileHandler(filename, encoding='utf-8')
+    if rotation == 'size':
+        return logging.handlers.RotatingFileHandler(
+            filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+    if rotation == 'time':
+        return logging.handlers.TimedRotatingFileHandler(
+            filename, when=when, backupCount=backup_count, encoding='utf-8')
+    raise ValueError("Log rotation must be None, 'size' or 'time'.")
+
+
+def configure_logging(filename='clinica_veterinaria.log', level=logging.INFO, rotation=None,
+                      max_bytes=10 * 1024 * 1024, backup_count=5, when='midnight'):
+    """
+    Envía el log raíz a `filename` a través de una cola.
+    rotation: None (un solo archivo), 'size' (rota al superar max_bytes) o 'time' (rota según `when`).
+    """
+    global _listener
+    handler = _file_handler(filename, rotation, max_bytes, backup_count, when)
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+    stop_logging()
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(level)
+    _listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+    _listener.start()
+    return _listener
+
+
+def stop_logging():
+    """Escribe los registros pendientes, detiene el hilo del log y quita su handler."""
+    global _listener
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        if isinstance(existing, DeferredQueueHandler):
+            root.removeHandler(existing)
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+@contextlib.contextmanager
+def redirect_logging(filename):
+    """
+    Escribe el log en `filename` mientras dura el bloque with y después vuelve al archivo
+    configurado. Sin configure_logging previo no cambia nada.
+    """
+    listener = _listener
+    if listener is None:
+        yield
+        return
+    handler = logging.FileHandler(filename, encoding='utf-8')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT, DATE_FORMAT))
+    previous = listener.handlers
+    # El hilo del log se detiene para cambiar de archivo: así lo encolado antes del cambio
+    # queda en el archivo anterior y lo encolado durante el bloque, en `filename`
+    listener.stop()
+    listener.handlers = (handler,)
+    listener.start()
+    try:
+        yield
+    finally:
+        listener.stop()
+        listener.handlers = previous
+        listener.start()
+        handler.close()
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,200 @@
+"""
+Almacén columnar opcional de consultas para consultas por rango de fechas.
+
+Cada consulta ocupa una fila en arreglos compactos de enteros de 32 bits:
+día (días desde 1970-01-01), id de mascota y códigos de categoría para el
+motivo y el diagnóstico. Si NumPy está instalado, los filtros y conteos se
+calculan de forma vectorizada sobre esos arreglos; si no, se recorren con
+un bucle en Python sobre los mismos datos.
+
+Las mascotas siguen guardando su historial en Pet.consultations; el almacén
+es un índice que se mantiene al día desde Pet.add_consultation. Lo usan las
+consultas por rango de fechas del menú (functions.consultations_between y
+functions.diagnosis_counts) cuando está activo.
+
+NumPy ve los arreglos sin copiarlos (np.frombuffer), y un array no puede
+crecer mientras otro objeto lo está viendo. Por eso agregar filas y filtrar
+se hacen con el candado del almacén tomado.
+"""
+import threading
+from array import array
+
+import classes
+from dates import NO_DATE, to_epoch_day
+from registry import fold_name
+
+try:
+    import numpy as np
+except ImportError:  # NumPy es opcional
+    np = None
+
+
+class _Categories:
+    """Asigna un código entero a cada valor distinto (sin distinguir mayúsculas)."""
+
+    def __init__(self):
+        self._codes = {}
+        self.values = []
+
+    def code(self, value):
+        key = fold_name(value)
+        code = self._codes.get(key)
+        if code is None:
+            code = self._codes[key] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        return self._codes.get(fold_name(value))
+
+
+class ConsultationStore:
+    """Columnas de consultas con filtros por fecha, especie y diagnóstico."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._days = array('i')
+        self._pet_rows = array('i')
+        self._reason_codes = array('i')
+        self._diagnosis_codes = array('i')
+        self._consultations = []  # fila -> Consultation
+        self._pet_ids = {}  # Pet -> id
+        self._pets = []  # id -> Pet
+        self._pet_species = array('i')  # id -> código de especie
+        self.species = _Categories()
+        self.reasons = _Categories()
+        self.diagnoses = _Categories()
+
+    def __len__(self):
+        return len(self._consultations)
+
+    # Carga
+
+    def _pet_id(self, pet):
+        pet_id = self._pet_ids.get(pet)
+        if pet_id is None:
+            pet_id = self._pet_ids[pet] = len(self._pets)
+            self._pets.append(pet)
+            self._pet_species.append(self.species.code(pet.species))
+        return pet_id
+
+    def append(self, pet, consultation):
+        """Agrega una fila para la consulta de la mascota indicada."""
+        with self._lock:
+            self._append(pet, consultation)
+
+    def _append(self, pet, consultation):
+        self._days.append(consultation.day)
+        self._pet_rows.append(self._pet_id(pet))
+        self._reason_codes.append(self.reasons.code(consultation.reason))
+        self._diagnosis_codes.append(self.diagnoses.code(consultation.diagnosis))
+        self._consultations.append(consultation)
+
+    def rebuild(self, pets):
+        """Reconstruye el almacén en una sola pasada sobre las mascotas."""
+        with self._lock:
+            self._reset()
+            for pet in pets:
+                for consultation in pet.consultations:
+                    self._append(pet, consultation)
+
+    def attach(self):
+        """Empieza a recibir cada consulta agregada con Pet.add_consultation."""
+        if self.append not in classes.consultation_listeners:
+            classes.consultation_listeners.append(self.append)
+
+    def detach(self):
+        if self.append in classes.consultation_listeners:
+            classes.consultation_listeners.remove(self.append)
+
+    # Filtros
+
+    def _bounds(self, start, end):
+        start_day = to_epoch_day(start) if start is not None else None
+        end_day = to_epoch_day(end) if end is not None else None
+        if (start is not None and start_day is None) or (end is not None and end_day is None):
+            raise ValueError("Dates must look like 10/05/2024 or 2024-05-10.")
+        return start_day, end_day
+
+    def _mask(self, start=None, end=None, species=None, diagnosis=None, reason=None):
+        """
+        Filas que cumplen todos los filtros (fechas inclusivas).
+        Devuelve un arreglo booleano de NumPy o, sin NumPy, una lista de índices.
+        Se llama con el candado tomado: las vistas de NumPy no sobreviven a la llamada.
+        """
+        start_day, end_day = self._bounds(start, end)
+        species_code = self.species.lookup(species) if species is not None else None
+        diagnosis_code = self.diagnoses.lookup(diagnosis) if diagnosis is not None else None
+        reason_code = self.reasons.lookup(reason) if reason is not None else None
+        if not self._consultations:
+            return np.zeros(0, dtype=bool) if np is not None else []
+        unknown = ((species is not None and species_code is None)
+                   or (diagnosis is not None and diagnosis_code is None)
+                   or (reason is not None and reason_code is None))
+
+        if np is not None:
+            days = np.frombuffer(self._days, dtype=np.int32)
+            mask = np.full(len(days), not unknown, dtype=bool)
+            if unknown:
+                return mask
+            if start_day is not None:
+                mask &= days >= start_day
+            if end_day is not None:
+                mask &= (days <= end_day) & (days != NO_DATE)
+            if species_code is not None:
+                pet_species = np.frombuffer(self._pet_species, dtype=np.int32)
+                mask &= pet_species[np.frombuffer(self._pet_rows, dtype=np.int32)] == species_code
+            if diagnosis_code is not None:
+                mask &= np.frombuffer(self._diagnosis_codes, dtype=np.int32) == diagnosis_code
+            if reason_code is not None:
+                mask &= np.frombuffer(self._reason_codes, dtype=np.int32) == reason_code
+            return mask
+
+        if unknown:
+            return []
+        rows = []
+        pet_species = self._pet_species
+        for row, (day, pet_id, reason_value, diagnosis_value) in enumerate(
+                zip(self._days, self._pet_rows, self._reason_codes, self._diagnosis_codes)):
+            if start_day is not None and day < start_day:
+                continue
+            if end_day is not None and (day > end_day or day == NO_DATE):
+                continue
+            if species_code is not None and pet_species[pet_id] != species_code:
+                continue
+            if diagnosis_code is not None and diagnosis_value != diagnosis_code:
+                continue
+            if reason_code is not None and reason_value != reason_code:
+                continue
+            rows.append(row)
+        return rows
+
+    def count(self, start=None, end=None, species=None, diagnosis=None, reason=None):
+        """Cantidad de consultas que cumplen los filtros."""
+        with self._lock:
+            mask = self._mask(start, end, species, diagnosis, reason)
+        return int(mask.sum()) if np is not None else len(mask)
+
+    def select(self, start=None, end=None, species=None, diagnosis=None, reason=None):
+        """Consultas (objetos Consultation) que cumplen los filtros, en orden de registro."""
+        with self._lock:
+            mask = self._mask(start, end, species, diagnosis, reason)
+            rows = np.flatnonzero(mask) if np is not None else mask
+            return [self._consultations[row] for row in rows]
+
+    def counts_by_diagnosis(self, start=None, end=None, species=None):
+        """Diccionario diagnóstico -> cantidad de consultas que cumplen los filtros."""
+        with self._lock:
+            mask = self._mask(start, end, species)
+            if np is not None:
+                codes = np.frombuffer(self._diagnosis_codes, dtype=np.int32)[mask]
+                totals = np.bincount(codes, minlength=len(self.diagnoses.values))
+                return {self.diagnoses.values[code]: int(n) for code, n in enumerate(totals) if n}
+            totals = {}
+            for row in mask:
+                value = self.diagnoses.values[self._diagnosis_codes[row]]
+                totals[value] = totals.get(value, 0) + 1
+            return totals
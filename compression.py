@@ -0,0 +1,128 @@
+"""
+Escritura atómica y compresión opcional de los archivos exportados.
+
+Los archivos de texto (CSV, JSON, NDJSON) se escriben en bloques de
+CHUNK_SIZE a un archivo temporal que reemplaza al definitivo recién al
+terminar (os.replace), así que un corte a mitad de camino nunca deja un
+archivo a medias. Cada escritura usa su propio archivo temporal (tempfile), así
+que dos escrituras del mismo archivo a la vez (el menú y el autoguardado,
+o un checkpoint y un SAVE del servidor) no se pisan: queda completa la última que termina. Opcionalmente se comprimen al vuelo con gzip (.gz) o xz
+(.xz) sin armar el contenido completo en memoria.
+
+Al leer, la compresión se detecta por los primeros bytes del archivo y no
+por su nombre, así que las importaciones aceptan archivos comprimidos sin
+ninguna opción.
+"""
+import contextlib
+import gzip
+import io
+import lzma
+import os
+import secrets
+
+# Bytes que se juntan antes de pasarlos al compresor o al disco
+CHUNK_SIZE = 256 * 1024
+GZIP_LEVEL = 6
+# xz rápido: con presets altos comprimir tarda más de lo que se ahorra en escribir
+XZ_PRESET = 1
+
+# Compresión -> extensión que se agrega al nombre del archivo
+SUFFIXES = {'gzip': '.gz', 'xz': '.xz'}
+_MAGIC = ((b'\x1f\x8b', 'gzip'), (b'\xfd7zXZ\x00', 'xz'))
+# Intentos de crear un temporal con un nombre al azar antes de rendirse
+_TEMPORARY_ATTEMPTS = 100
+
+
+def check_compression(compression):
+    """Valida el nombre de una compresión (None es sin comprimir)."""
+    if compression is not None and compression not in SUFFIXES:
+        raise ValueError(f"Unknown compression: {compression} (use {', '.join(SUFFIXES)})")
+    return compression
+
+
+def compressed_name(filename, compression):
+    """Nombre del archivo con la extensión de la compresión (el mismo si no se comprime)."""
+    return filename + SUFFIXES[compression] if compression else filename
+
+
+def latest_export(filename):
+    """
+    La versión más nueva de un archivo exportado entre el original y sus variantes comprimidas
+    (mascotas_dueños.csv, mascotas_dueños.csv.gz, ...). Si no existe ninguna, el nombre original.
+    """
+    candidates = [name for name in [filename] + [filename + suffix for suffix in SUFFIXES.values()]
+                  if os.path.exists(name)]
+    return max(candidates, key=os.path.getmtime) if candidates else filename
+
+
+def compression_of(filename):
+    """'gzip', 'xz' o None según los primeros bytes del archivo."""
+    with open(filename, 'rb') as f:
+        head = f.read(6)
+    for magic, compression in _MAGIC:
+        if head.startswith(magic):
+            return compression
+    return None
+
+
+def open_text(filename, newline=None):
+    """Abre un archivo de texto UTF-8 para leer, descomprimiéndolo si hace falta."""
+    compression = compression_of(filename)
+    if compression == 'gzip':
+        return gzip.open(filename, 'rt', encoding='utf-8', newline=newline)
+    if compression == 'xz':
+        return lzma.open(filename, 'rt', encoding='utf-8', newline=newline)
+    return open(filename, 'r', encoding='utf-8', newline=newline)
+
+
+def _compressor(raw, compression, filename):
+    if compression == 'gzip':
+        # mtime=0: el mismo contenido da el mismo archivo
+        stream = gzip.GzipFile(os.path.basename(filename), 'wb', GZIP_LEVEL, raw, mtime=0)
+    else:
+        stream = lzma.LZMAFile(raw, 'wb', preset=XZ_PRESET)
+    return io.BufferedWriter(stream, CHUNK_SIZE)
+
+
+def temporary_file(filename, buffering=CHUNK_SIZE):
+    """
+    Abre para escribir (en binario) un archivo temporal nuevo junto a `filename`, con un nombre
+    que no repite ninguna otra escritura en curso. Devuelve (archivo, ruta del temporal); al
+    terminar, la ruta reemplaza a filename con os.replace.
+    Como mkstemp crea el archivo en exclusiva (O_EXCL), pero con los permisos de un archivo
+    nuevo según la umask (mkstemp los deja solo para el dueño).
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    for _ in range(_TEMPORARY_ATTEMPTS):
+        temporary = f"{filename}.{secrets.token_hex(4)}.tmp"
+        try:
+            fd = os.open(temporary, flags, 0o666)
+        except FileExistsError:
+            continue
+        return open(fd, 'wb', buffering=buffering), temporary
+    raise FileExistsError(f"No free temporary file name for {filename}")
+
+
+@contextlib.contextmanager
+def atomic_text_writer(filename, compression=None, newline=None):
+    """
+    Archivo de texto UTF-8 para escribir `filename` de forma atómica, comprimido si se indica.
+    Si el bloque with termina con una excepción, el archivo anterior queda intacto.
+    """
+    check_compression(compression)
+    raw, temporary = temporary_file(filename)
+    try:
+        stream = raw if compression is None else _compressor(raw, compression, filename)
+        text = io.TextIOWrapper(stream, encoding='utf-8', newline=newline)
+        yield text
+        text.flush()
+        if compression is not None:
+            text.close()  # cierra el bloque comprimido; raw sigue abierto
+        raw.flush()
+        os.fsync(raw.fileno())
+    except BaseException:
+        raw.close()
+        os.remove(temporary)
+        raise
+    raw.close()
+    os.replace(temporary, filename)
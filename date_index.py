@@ -0,0 +1,80 @@
+"""
+Índice de consultas de toda la clínica ordenado por fecha.
+
+Agrupa las consultas por día y mantiene ordenada (con bisect) la lista de
+días distintos, de modo que "las N más recientes" o "todas las de esta
+semana" se responden en O(log n + k) sin recorrer ni ordenar el historial
+completo. Como los días distintos son pocos, agregar una consulta con una
+fecha antigua no obliga a desplazar todo el índice.
+"""
+from bisect import bisect_left, bisect_right, insort
+
+import classes
+from dates import to_epoch_day
+
+
+class ClinicDateIndex:
+    """Consultas de todas las mascotas agrupadas y ordenadas por fecha."""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._days = []  # días distintos, ordenados
+        self._by_day = {}  # día -> consultas de ese día, en orden de llegada
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, pet, consultation):
+        """Agrega la consulta al grupo de su día (después de las ya registradas ese día)."""
+        day = consultation.day
+        bucket = self._by_day.get(day)
+        if bucket is None:
+            bucket = self._by_day[day] = []
+            if not self._days or self._days[-1] < day:
+                self._days.append(day)
+            else:
+                insort(self._days, day)
+        bucket.append(consultation)
+        self._size += 1
+
+    def rebuild(self, pets):
+        """Reconstruye el índice en una sola pasada sobre las mascotas."""
+        self._reset()
+        for pet in pets:
+            for consultation in pet.consultations:
+                self.add(pet, consultation)
+
+    def attach(self):
+        """Empieza a recibir cada consulta agregada con Pet.add_consultation."""
+        if self.add not in classes.consultation_listeners:
+            classes.consultation_listeners.append(self.add)
+
+    def detach(self):
+        if self.add in classes.consultation_listeners:
+            classes.consultation_listeners.remove(self.add)
+
+    def recent(self, limit=10, offset=0):
+        """Las `limit` consultas más recientes de la clínica (más nuevas primero), saltando `offset`."""
+        result = []
+        for day in reversed(self._days):
+            bucket = self._by_day[day]
+            if offset >= len(bucket):
+                offset -= len(bucket)
+                continue
+            end = len(bucket) - offset
+            offset = 0
+            result.extend(bucket[max(end - (limit - len(result)), 0):end][::-1])
+            if len(result) >= limit:
+                break
+        return result
+
+    def between(self, start, end):
+        """Consultas con fecha entre start y end (inclusive), de la más antigua a la más nueva."""
+        start_day, end_day = to_epoch_day(start), to_epoch_day(end)
+        if start_day is None or end_day is None:
+            raise ValueError("Dates must look like 10/05/2024 or 2024-05-10.")
+        days = self._days[bisect_left(self._days, start_day):bisect_right(self._days, end_day)]
+        return [consultation for day in days for consultation in self._by_day[day]]
@@ -0,0 +1,48 @@
+"""
+Conversión de las fechas de consulta (texto libre) a valores ordenables.
+
+Las consultas guardan la fecha tal como se ingresó (por ejemplo 10/05/2024).
+Estas funciones la interpretan como día/mes/año, o como año-mes-día si la
+primera parte tiene cuatro dígitos, y devuelven None si no es una fecha real.
+"""
+import datetime
+import functools
+import re
+
+_DATE_PARTS = re.compile(r"^\s*(\d{1,4})[/\-.](\d{1,2})[/\-.](\d{1,4})\s*$")
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+# Día usado para fechas que no se pudieron interpretar (se ordenan antes que cualquier otra)
+NO_DATE = -2 ** 31
+
+
+def parse_date(value):
+    """Convierte una fecha de consulta en datetime.date, o devuelve None si no se puede interpretar."""
+    if isinstance(value, datetime.date):
+        return value
+    match = _DATE_PARTS.match(value or "")
+    if not match:
+        return None
+    first, second, third = match.groups()
+    if len(first) == 4:
+        year, month, day = int(first), int(second), int(third)
+    else:
+        day, month, year = int(first), int(second), int(third)
+        if len(third) == 2:
+            year += 2000
+    try:
+        return datetime.date(year, month, day)
+    except ValueError:
+        return None
+
+
+@functools.lru_cache(maxsize=65536)
+def to_epoch_day(value):
+    """Número de días desde 1970-01-01 para una fecha de consulta, o None si no es válida."""
+    date = parse_date(value)
+    return date.toordinal() - _EPOCH_ORDINAL if date else None
+
+
+def from_epoch_day(day):
+    """Inversa de to_epoch_day."""
+    return datetime.date.fromordinal(day + _EPOCH_ORDINAL)
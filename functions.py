@@ -1,178 +1,306 @@
 import logging
 import csv
+import functools
 import json
 import os
-from classes import Owner, Pet, Consultation
-
-# Configuración del logging
-logging.basicConfig(
-    filename='clinica_veterinaria.log',
-    level=logging.INFO,
-    format='%(asctime)s | %(levelname)s | %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from operator import attrgetter
+from classes import Owner, Pet, Consultation, consultation_ids, consultation_id_floor, ConsultationIdClaims
+from registry import default_registry, ImportMatches, fold_name
+from date_index import ClinicDateIndex
+from search_index import ConsultationSearchIndex
+from aggregates import ClinicAggregates
+from clinic_logging import configure_logging
+from compression import atomic_text_writer, open_text, compressed_name, compression_of, latest_export, check_compression
+from validation import (
+    is_valid_name, is_valid_reason_or_diagnosis, is_valid_date,
+    PET_OWNER_ROW_RULES, CONSULTATION_RECORD_RULES, RejectFile, reject_filename, validated_rows, parse_id
 )
+import services
+import metrics
+from metrics import timed
 
-# Listas para almacenar objetos Owner y Pet
-owners = []
-pets = []
+# Configuración del logging: escritura en segundo plano a través de una cola.
+# Igual que logging.basicConfig, no toca una configuración ya existente.
+# VET_LOG_ROTATION=size|time activa la rotación del archivo.
+if not logging.getLogger().handlers:
+    configure_logging('clinica_veterinaria.log', rotation=os.environ.get('VET_LOG_ROTATION') or None)
 
-def is_valid_name(value):
-    """Valida que el valor no sea solo numérico y tenga sentido como nombre."""
-    return value and not value.isdigit() and any(char.isalpha() for char in value)
+# Listas para almacenar objetos Owner y Pet (indexadas por el registro)
+registry = default_registry
+owners = registry.owners
+pets = registry.pets
 
-def is_valid_reason_or_diagnosis(value):
-    """Valida que el motivo o diagnóstico no sea solo numérico, no esté vacío y tenga letras."""
-    return value and not value.isdigit() and any(char.isalpha() for char in value)
+def writes_registry(func):
+    """
+    Decorador para las funciones que modifican el registro en bloque (importaciones, recargas):
+    se ejecutan con el candado de escritura tomado, sin mezclarse con altas de otros hilos.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with registry.lock.write():
+            return func(*args, **kwargs)
+    return wrapper
+
+# Índice por fecha de las consultas de toda la clínica
+clinic_dates = ClinicDateIndex()
+clinic_dates.attach()
+
+# Índice de texto sobre motivo y diagnóstico de las consultas
+search_index = ConsultationSearchIndex()
+search_index.attach()
 
-def is_valid_date(value):
-    """Valida que la fecha no esté vacía, no sea solo números y que tenga formato básico."""
-    return value and not value.isdigit() and any(char.isdigit() for char in value) and not any(char.isalpha() for char in value)
+# Contadores para el reporte de la clínica (visitas por mes, diagnósticos por especie)
+clinic_aggregates = ClinicAggregates()
+clinic_aggregates.attach()
+
+# Máximo de resultados mostrados por búsqueda
+SEARCH_RESULTS_LIMIT = 50
+# Máximo de registros parecidos sugeridos cuando un nombre no existe
+SUGGESTIONS_LIMIT = 5
+# Meses, diagnósticos por especie y razas mostrados en el reporte de la clínica
+REPORT_MONTHS = 12
+REPORT_TOP_DIAGNOSES = 3
+REPORT_TOP_BREEDS = 10
+
+# Cantidad de consultas mostradas por página en los historiales
+HISTORY_PAGE_SIZE = 10
+# Cantidad de mascotas mostradas por página en el listado
+LIST_PAGE_SIZE = 20
 
 def register_owner():
     """Registra un nuevo dueño y lo agrega a la lista de dueños. Maneja errores de entrada y los deja en el log."""
     print("=== Register Owner ===")
     try:
         name = input("Owner's name: ").strip()
-        if not is_valid_name(name):
-            logging.warning(f"Nombre de dueño inválido ingresado: '{name}'")
-            raise ValueError("Owner's name must contain letters and cannot be only numbers.")
-
         phone = input("Phone: ").strip()
-        if not phone or phone.isalpha():
-            logging.warning(f"Teléfono inválido ingresado: '{phone}'")
-            raise ValueError("Phone must be a non-empty number.")
-
         address = input("Address: ").strip()
-        if not address:
-            logging.warning("Dirección vacía ingresada.")
-            raise ValueError("Address cannot be empty.")
-
-        owner = Owner(name, phone, address)
-        owners.append(owner)
+        result = services.add_owners([{'name': name, 'phone': phone, 'address': address}], registry)
+        if result.errors:
+            raise result.errors[0][1]
+        owner = result.added[0]
         print("Owner successfully registered.")
-        logging.info(f"Owner registered: {owner}")
+        logging.info("Owner registered: %s", owner)
         return owner
     except ValueError as ve:
         print(f"Input error: {ve}")
-        logging.warning(f"Input error in register_owner: {ve}")
+        logging.warning("Input error in register_owner: %s", ve)
     except Exception as e:
         print(f"Error registering owner: {e}")
-        logging.error(f"Exception in register_owner: {e}")
+        logging.error("Exception in register_owner: %s", e)
+
+
+def clinic_indexes():
+    """Índices que abarcan las consultas de toda la clínica (fechas, texto, contadores y, si está activo, el columnar)."""
+    indexes = [clinic_dates, search_index, clinic_aggregates]
+    if consultation_store is not None:
+        indexes.append(consultation_store)
+    return indexes
+
+
+@writes_registry
+def reset_data():
+    """Vacía dueños y mascotas y deja los índices de consultas de la clínica en blanco."""
+    owners.clear()
+    pets.clear()
+    # Las mascotas descartadas que aún tengan historial pendiente siguen usando su origen
+    history_sources.clear()
+    rebuild_clinic_indexes()
+
+
+def rebuild_clinic_indexes():
+    """Reconstruye en una pasada los índices de toda la clínica y los vuelve a conectar."""
+    for index in clinic_indexes():
+        index.rebuild(pets)
+        index.attach()
 
 
+@timed("find_owner")
 def find_owner_by_name(name):
-    """Busca un dueño por nombre."""
-    for o in owners:
-        if o.name.lower() == name.lower():
-            return o
+    """Busca un dueño por nombre usando el índice del registro."""
+    return registry.find_owner(name)
+
+
+@timed("suggest_owners")
+def suggest_owners(name, limit=SUGGESTIONS_LIMIT):
+    """Dueños con nombres parecidos al ingresado (errores de tipeo), del más al menos parecido."""
+    return registry.similar_owners(name, limit)
+
+
+def choose_suggestion(matches, describe):
+    """
+    Ofrece los registros parecidos numerados y devuelve el que elija el usuario,
+    o None si no hay sugerencias o no elige ninguna.
+    """
+    if not matches:
+        return None
+    print("Did you mean:")
+    for number, match in enumerate(matches, 1):
+        print(f"  {number}. {describe(match)}")
+    choice = input("Select a number (or press Enter for none): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(matches):
+        return matches[int(choice) - 1]
     return None
 
 
+def choose_same_name(matches, describe):
+    """
+    Con varios registros del mismo nombre, los muestra numerados y devuelve el elegido
+    (el primero si no se elige uno válido); con uno solo lo devuelve sin preguntar.
+    """
+    if len(matches) < 2:
+        return matches[0] if matches else None
+    print(f"{len(matches)} records share that name:")
+    for number, match in enumerate(matches, 1):
+        print(f"  {number}. {describe(match)}")
+    choice = input("Select a number (or press Enter for the first one): ").strip()
+    if choice.isdigit() and 1 <= int(choice) <= len(matches):
+        return matches[int(choice) - 1]
+    return matches[0]
+
+
+def describe_owner(owner):
+    return f"#{owner.id} {owner.name} | Phone: {owner.phone} | Address: {owner.address}"
+
+
+def describe_pet(pet):
+    return f"#{pet.id} {pet.name} ({pet.species}, {pet.breed}) | Owner: {pet.owner.name}"
+
+
 def register_pet():
     """Registra una nueva mascota y la asigna a un dueño, validando entradas y logueando errores."""
     print("=== Register Pet ===")
     try:
-        name = input("Pet's name: ").strip()
-        if not is_valid_name(name):
-            logging.warning(f"Nombre de mascota inválido ingresado: '{name}'")
-            raise ValueError("Pet's name must contain letters and cannot be only numbers.")
-
-        species = input("Species: ").strip()
-        if not is_valid_name(species):
-            logging.warning(f"Especie inválida ingresada: '{species}'")
-            raise ValueError("Species must contain letters and cannot be only numbers.")
-
-        breed = input("Breed: ").strip()
-        if not is_valid_name(breed):
-            logging.warning(f"Raza inválida ingresada: '{breed}'")
-            raise ValueError("Breed must contain letters and cannot be only numbers.")
-
-        age_input = input("Age: ").strip()
-        if not age_input.isdigit() or int(age_input) < 0:
-            logging.warning(f"Edad inválida ingresada: '{age_input}'")
-            raise ValueError("Age must be a non-negative integer.")
-        age = int(age_input)
-
-        owner_name = input("Owner's name: ").strip()
-        if not is_valid_name(owner_name):
-            logging.warning(f"Nombre de dueño inválido ingresado: '{owner_name}'")
-            raise ValueError("Owner's name must contain letters and cannot be only numbers.")
-
-        owner = find_owner_by_name(owner_name)
-        if not owner:
-            print("Owner not found. Please register them first.")
-            logging.warning(f"Attempted to register pet for non-existent owner: {owner_name}")
-            owner = register_owner()
+        record = {
+            'name': input("Pet's name: ").strip(),
+            'species': input("Species: ").strip(),
+            'breed': input("Breed: ").strip(),
+            'age': input("Age: ").strip(),
+            'owner_name': input("Owner's name: ").strip()
+        }
+        # Si hay varios dueños con ese nombre, el usuario elige a cuál pertenece la mascota
+        namesakes = registry.find_owners(record['owner_name'])
+        if len(namesakes) > 1:
+            record['owner'] = choose_same_name(namesakes, describe_owner)
+        result = services.add_pets([record], registry)
+        if result.errors and isinstance(result.errors[0][1], LookupError):
+            print("Owner not found.")
+            logging.warning("Attempted to register pet for non-existent owner: %s", record['owner_name'])
+            # Un nombre mal tipeado no debe terminar en un dueño duplicado
+            owner = choose_suggestion(suggest_owners(record['owner_name']), describe_owner)
+            if owner is None:
+                print("Please register the owner first.")
+                owner = register_owner()
             if not owner:
                 logging.error("Pet registration aborted due to failed owner registration.")
                 return
-
-        pet = Pet(name, species, breed, age, owner)
-        pets.append(pet)
+            result = services.add_pets([dict(record, owner=owner)], registry)
+        if result.errors:
+            raise result.errors[0][1]
+        pet = result.added[0]
         print("Pet successfully registered.")
-        logging.info(f"Pet registered: {pet}")
+        logging.info("Pet registered: %s", pet)
     except ValueError as ve:
         print(f"Input error: {ve}")
-        logging.warning(f"Input error in register_pet: {ve}")
+        logging.warning("Input error in register_pet: %s", ve)
     except Exception as e:
         print(f"Error registering pet: {e}")
-        logging.error(f"Exception in register_pet: {e}")
+        logging.error("Exception in register_pet: %s", e)
 
 
+@timed("find_pet")
 def find_pet_by_name(name):
-    """Busca una mascota por nombre."""
-    for p in pets:
-        if p.name.lower() == name.lower():
-            return p
-    return None
+    """Busca una mascota por nombre usando el índice del registro."""
+    return registry.find_pet(name)
+
+
+@timed("suggest_pets")
+def suggest_pets(name, limit=SUGGESTIONS_LIMIT):
+    """Mascotas con nombres parecidos al ingresado (errores de tipeo), de la más a la menos parecida."""
+    return registry.similar_pets(name, limit)
 
 
 def register_consultation():
     """Registra una consulta veterinaria para una mascota específica, validando entradas y logueando errores."""
     print("=== Register Consultation ===")
     try:
-        pet_name = input("Pet's name: ").strip()
-        if not is_valid_name(pet_name):
-            logging.warning(f"Nombre de mascota inválido ingresado para consulta: '{pet_name}'")
-            raise ValueError("Pet's name must contain letters and cannot be only numbers.")
-        pet = find_pet_by_name(pet_name)
-        if not pet:
-            print("Pet not found, please register it first.")
-            logging.warning(f"Attempted to register consultation for non-existent pet: {pet_name}")
-            return
-        date = input("Date of consultation: ").strip()
-        if not is_valid_date(date):
-            logging.warning(f"Fecha inválida ingresada: '{date}'")
-            raise ValueError("Date must not be only numbers, cannot be empty and should contain digits and separators (e.g. 10/05/2024).")
-        reason = input("Reason: ").strip()
-        if not is_valid_reason_or_diagnosis(reason):
-            logging.warning(f"Motivo inválido ingresado: '{reason}'")
-            raise ValueError("Reason must contain letters and cannot be only numbers.")
-        diagnosis = input("Diagnosis: ").strip()
-        if not is_valid_reason_or_diagnosis(diagnosis):
-            logging.warning(f"Diagnóstico inválido ingresado: '{diagnosis}'")
-            raise ValueError("Diagnosis must contain letters and cannot be only numbers.")
-        consultation = Consultation(date, reason, diagnosis, pet)
-        pet.add_consultation(consultation)
+        record = {
+            'pet_name': input("Pet's name: ").strip(),
+            'date': input("Date of consultation: ").strip(),
+            'reason': input("Reason: ").strip(),
+            'diagnosis': input("Diagnosis: ").strip()
+        }
+        namesakes = registry.find_pets(record['pet_name'])
+        if len(namesakes) > 1:
+            record['pet'] = choose_same_name(namesakes, describe_pet)
+        result = services.add_consultations([record], registry)
+        if result.errors and isinstance(result.errors[0][1], LookupError):
+            print("Pet not found.")
+            logging.warning("Attempted to register consultation for non-existent pet: %s", record['pet_name'])
+            pet = choose_suggestion(suggest_pets(record['pet_name']), describe_pet)
+            if pet is None:
+                print("Please register the pet first.")
+                return
+            result = services.add_consultations([dict(record, pet=pet)], registry)
+        if result.errors:
+            raise result.errors[0][1]
+        consultation = result.added[0]
         print("Consultation successfully registered.")
-        logging.info(f"Consultation registered for pet {pet.name}: {consultation}")
+        logging.info("Consultation registered for pet %s: %s", consultation.pet.name, consultation)
     except ValueError as ve:
         print(f"Input error: {ve}")
-        logging.warning(f"Input error in register_consultation: {ve}")
+        logging.warning("Input error in register_consultation: %s", ve)
     except Exception as e:
         print(f"Error registering consultation: {e}")
-        logging.error(f"Exception in register_consultation: {e}")
+        logging.error("Exception in register_consultation: %s", e)
+
+
+def iter_pets_rendered(offset=0, limit=None):
+    """Genera el texto de cada mascota (con su separador) a partir de offset, sin construir el listado completo."""
+    stop = len(pets) if limit is None else min(offset + limit, len(pets))
+    for position in range(offset, stop):
+        yield f"{pets[position]}\n{'-' * 40}"
+
+
+def browse_pages(render_page, total, page_size):
+    """
+    Muestra resultados por páginas con navegación siguiente/anterior.
+    render_page(offset, limit) debe generar las líneas de una página.
+    """
+    offset = 0
+    pages = max((total + page_size - 1) // page_size, 1)
+    while True:
+        for chunk in render_page(offset, page_size):
+            print(chunk)
+        if pages == 1:
+            return
+        print(f"Page {offset // page_size + 1} of {pages}")
+        choice = input("[n]ext page, [p]revious page, [q]uit: ").strip().lower()
+        if choice == "n":
+            if offset + page_size < total:
+                offset += page_size
+            else:
+                print("Already on the last page.")
+        elif choice == "p":
+            if offset > 0:
+                offset -= page_size
+            else:
+                print("Already on the first page.")
+        elif choice == "q":
+            return
+        else:
+            print("Invalid option.")
 
 
 def list_pets():
-    """Muestra todas las mascotas registradas y sus dueños."""
+    """Muestra todas las mascotas registradas y sus dueños, por páginas."""
     print("=== List of Pets ===")
     if not pets:
         print("No pets registered.")
         logging.info("Attempted to list pets but none registered.")
-    for p in pets:
-        print(p)
-        print("-" * 40)
+        return
+    browse_pages(iter_pets_rendered, len(pets), LIST_PAGE_SIZE)
 
 
 def view_pet_history():
@@ -181,167 +309,1056 @@ def view_pet_history():
     try:
         pet_name = input("Pet's name: ").strip()
         pet = find_pet_by_name(pet_name)
+        if pet is None:
+            pet = choose_suggestion(suggest_pets(pet_name), describe_pet)
+        else:
+            pet = choose_same_name(registry.find_pets(pet_name), describe_pet)
         if pet:
-            print(pet.show_consultations())
-            logging.info(f"Consultation history viewed for pet {pet_name}")
+            if not pet.consultations:
+                print(pet.show_consultations())
+            else:
+                # Historial de la más nueva a la más antigua, por páginas
+                browse_pages(
+                    lambda offset, limit: pet.iter_consultations(offset, limit, newest_first=True),
+                    len(pet.consultations),
+                    HISTORY_PAGE_SIZE
+                )
+            logging.info("Consultation history viewed for pet %s", pet_name)
         else:
             print("Pet not found.")
-            logging.warning(f"Consultation history requested for non-existent pet: {pet_name}")
+            logging.warning("Consultation history requested for non-existent pet: %s", pet_name)
     except Exception as e:
         print(f"Error viewing pet history: {e}")
-        logging.error(f"Exception in view_pet_history: {e}")
+        logging.error("Exception in view_pet_history: %s", e)
+
+
+def consultations_between(start, end, species=None, diagnosis=None):
+    """
+    Consultas de toda la clínica con fecha entre start y end (inclusive), de la más antigua a la
+    más nueva, opcionalmente solo de una especie y un diagnóstico (sin distinguir mayúsculas).
+    Con el almacén columnar activo los filtros se calculan sobre sus columnas.
+    """
+    ensure_histories_loaded()
+    with registry.lock.read():
+        if consultation_store is not None:
+            # El almacén las devuelve en orden de registro; sorted es estable dentro de cada día
+            return sorted(consultation_store.select(start, end, species, diagnosis), key=attrgetter('day'))
+        results = clinic_dates.between(start, end)
+    if species is not None:
+        results = [c for c in results if fold_name(c.pet.species) == fold_name(species)]
+    if diagnosis is not None:
+        results = [c for c in results if fold_name(c.diagnosis) == fold_name(diagnosis)]
+    return results
+
+
+def diagnosis_counts(start, end, species=None):
+    """
+    {diagnóstico: consultas} entre start y end (inclusive), opcionalmente de una sola especie.
+    Los diagnósticos se agrupan sin distinguir mayúsculas, escritos como en la primera consulta.
+    """
+    ensure_histories_loaded()
+    with registry.lock.read():
+        if consultation_store is not None:
+            return consultation_store.counts_by_diagnosis(start, end, species)
+    spelling = {}
+    totals = {}
+    for consultation in consultations_between(start, end, species):
+        name = spelling.setdefault(fold_name(consultation.diagnosis), consultation.diagnosis)
+        totals[name] = totals.get(name, 0) + 1
+    return totals
+
+
+def view_recent_consultations():
+    """
+    Muestra las consultas más recientes de toda la clínica o las de un rango de fechas
+    (opcionalmente de una especie o un diagnóstico), con cuántas hubo de cada diagnóstico.
+    """
+    print("=== Recent Consultations ===")
+    try:
+        ensure_histories_loaded()
+        start = input("From date (leave empty for the most recent): ").strip()
+        diagnosis = None
+        if start:
+            end = input("To date: ").strip()
+            species = input("Species (leave empty for all): ").strip() or None
+            diagnosis = input("Diagnosis (leave empty for all): ").strip() or None
+            results = consultations_between(start, end, species, diagnosis)
+        else:
+            with registry.lock.read():
+                results = clinic_dates.recent(HISTORY_PAGE_SIZE)
+        if not results:
+            print("No consultations found.")
+        for consultation in results:
+            print(f"Pet: {consultation.pet.name} | {consultation}")
+        if start and results and diagnosis is None:
+            print("Diagnoses in this range:")
+            counts = diagnosis_counts(start, end, species)
+            for name, count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+                print(f"  {name:<24}{count:>8}")
+        logging.info("Clinic-wide consultations viewed: %s results", len(results))
+    except ValueError as ve:
+        print(f"Input error: {ve}")
+        logging.warning("Input error in view_recent_consultations: %s", ve)
+    except Exception as e:
+        print(f"Error viewing recent consultations: {e}")
+        logging.error("Exception in view_recent_consultations: %s", e)
+
+
+def search_consultations():
+    """Busca consultas por palabras en el motivo, el diagnóstico o ambos."""
+    print("=== Search Consultations ===")
+    try:
+        query = input("Search text: ").strip()
+        if not is_valid_reason_or_diagnosis(query):
+            logging.warning("Búsqueda inválida ingresada: '%s'", query)
+            raise ValueError("Search text must contain letters.")
+        field = input("Search in (1) reason, (2) diagnosis, (Enter) both: ").strip()
+        field = {"1": "reason", "2": "diagnosis"}.get(field)
+        ensure_histories_loaded()
+        with registry.lock.read():
+            results = search_index.search(query, field)
+        if not results:
+            print("No consultations found.")
+        for consultation in results[:SEARCH_RESULTS_LIMIT]:
+            print(f"Pet: {consultation.pet.name} | {consultation}")
+        if len(results) > SEARCH_RESULTS_LIMIT:
+            print(f"... {len(results) - SEARCH_RESULTS_LIMIT} more results not shown.")
+        logging.info("Consultation search for '%s' returned %s results", query, len(results))
+    except ValueError as ve:
+        print(f"Input error: {ve}")
+        logging.warning("Input error in search_consultations: %s", ve)
+    except Exception as e:
+        print(f"Error searching consultations: {e}")
+        logging.error("Exception in search_consultations: %s", e)
+
+
+def clinic_report():
+    """
+    Datos del reporte de la clínica, leídos de los contadores (no recorre las consultas):
+    {'visits_per_month': [(mes, visitas)], 'top_diagnoses': {especie: [(diagnóstico, consultas)]},
+     'pets_per_breed': [(raza, mascotas)]}, con las razas de la más a la menos numerosa.
+    """
+    ensure_histories_loaded()
+    with registry.lock.read():
+        return {
+            'visits_per_month': clinic_aggregates.visits_per_month(),
+            'top_diagnoses': clinic_aggregates.top_diagnoses_by_species(REPORT_TOP_DIAGNOSES),
+            'pets_per_breed': sorted(registry.breed_counts().items(), key=lambda item: (-item[1], item[0])),
+        }
+
+
+def show_clinic_report():
+    """Muestra las visitas de los últimos meses, los diagnósticos más comunes por especie y las mascotas por raza."""
+    print("=== Clinic Report ===")
+    try:
+        report = clinic_report()
+        months = report['visits_per_month'][-REPORT_MONTHS:]
+        print("Visits per month:")
+        for month, visits in months:
+            print(f"  {month}  {visits:>8}")
+        if not months:
+            print("  No consultations registered.")
+        print("Top diagnoses per species:")
+        for species, diagnoses in report['top_diagnoses'].items():
+            print(f"  {species}: " + ", ".join(f"{diagnosis} ({count})" for diagnosis, count in diagnoses))
+        print("Pets per breed:")
+        for breed, count in report['pets_per_breed'][:REPORT_TOP_BREEDS]:
+            print(f"  {breed:<24}{count:>8}")
+        if not report['pets_per_breed']:
+            print("  No pets registered.")
+        logging.info("Clinic report viewed")
+    except Exception as e:
+        print(f"Error showing clinic report: {e}")
+        logging.error("Exception in show_clinic_report: %s", e)
 
 
 ##############################
 # SERIALIZACIÓN Y DESERIALIZACIÓN
 ##############################
 
-def export_mascotas_duenos_csv(filename='mascotas_dueños.csv'):
+# Los guardados en segundo plano no muestran mensajes de éxito: el menú está esperando en input()
+_output = threading.local()
+
+def report_success(message):
+    """Muestra el mensaje de éxito de un guardado, salvo en un hilo que guarda en silencio."""
+    if not getattr(_output, 'quiet', False):
+        print(message)
+
+def call_with_output(quiet, func, *args):
+    """Llama a func(*args) en este hilo mostrando (quiet=False) u ocultando los mensajes de éxito."""
+    previous = getattr(_output, 'quiet', False)
+    _output.quiet = quiet
+    try:
+        return func(*args)
+    finally:
+        _output.quiet = previous
+
+@timed("export_csv")
+def export_mascotas_duenos_csv(filename='mascotas_dueños.csv', view=None, compression=None):
     """
     Guarda la información de mascotas y dueños en un archivo CSV.
-    Cada fila contiene: pet_name, species, breed, age, owner_name, owner_phone, owner_address
+    Cada fila contiene: pet_id, pet_name, species, breed, age, owner_id, owner_name, owner_phone, owner_address
+    view es la copia del registro a exportar (por defecto, una copia tomada en el momento).
+    compression: None, 'gzip' o 'xz'. El archivo se reemplaza de forma atómica al terminar.
     """
     try:
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
+        view = view or registry.snapshot()
+        with atomic_text_writer(filename, compression, newline='') as csvfile:
             writer = csv.writer(csvfile)
             # Cabecera
-            writer.writerow(['pet_name', 'species', 'breed', 'age', 'owner_name', 'owner_phone', 'owner_address'])
-            for pet in pets:
+            writer.writerow(['pet_id', 'pet_name', 'species', 'breed', 'age',
+                             'owner_id', 'owner_name', 'owner_phone', 'owner_address'])
+            for pet in view.pets:
                 writer.writerow([
+                    pet._id,
                     pet.name,
                     pet._species,
                     pet._breed,
                     pet._age,
+                    pet._owner.id,
                     pet._owner.name,
                     pet._owner.phone,
                     pet._owner.address
                 ])
-        logging.info(f"Exported pets and owners to CSV: {filename}")
-        print(f"Data exported to {filename}")
+        metrics.add_rows("export_csv", len(view.pets))
+        logging.info("Exported pets and owners to CSV: %s", filename)
+        report_success(f"Data exported to {filename}")
+        return True
     except Exception as e:
-        logging.error(f"Error exporting to CSV {filename}: {e}")
+        logging.error("Error exporting to CSV %s: %s", filename, e)
         print(f"Error exporting to CSV: {e}")
+        return False
+
+def report_rejects(rejects):
+    """Informa cuántas filas se apartaron al archivo de rechazos durante una importación."""
+    if rejects.count:
+        logging.warning("%d invalid records from %s quarantined in %s", rejects.count, rejects.source, rejects.filename)
+        print(f"{rejects.count} invalid records skipped; see {rejects.filename}")
 
-def import_mascotas_duenos_csv(filename='mascotas_dueños.csv'):
+def merge_pet_owner_row(pet_name, species, breed, age, owner_name, owner_phone, owner_address,
+                        pet_id=None, owner_id=None, seen=None):
+    """
+    Incorpora al registro una fila de mascota y dueño importada (reglas de duplicados de la importación).
+    Con IDs se reutiliza el dueño o la mascota que ya tenga ese ID y el mismo nombre, así que dos
+    mascotas con el mismo nombre en el archivo son distintas; sin IDs (archivos anteriores) se
+    reutiliza por nombre. seen es el ImportMatches del archivo en curso.
+    """
+    seen = seen if seen is not None else ImportMatches()
+    # Verificar si el dueño ya existe (directo al registro: no cuenta como búsqueda en las métricas)
+    owner = seen.owners.get(owner_id) or registry.match_owner(owner_id, owner_name, seen.claimed)
+    if not owner:
+        owner = Owner(owner_name, owner_phone, owner_address, registry.unused_owner_id(owner_id))
+        owners.append(owner)
+    if owner_id is not None:
+        seen.owners[owner_id] = owner
+        seen.claimed.add(owner)
+    # Verificar si la mascota ya existe
+    pet = seen.pets.get(pet_id) or registry.match_pet(pet_id, pet_name, seen.claimed)
+    if not pet:
+        pet = Pet(pet_name, species, breed, int(age), owner, registry.unused_pet_id(pet_id))
+        pets.append(pet)
+    if pet_id is not None:
+        seen.pets[pet_id] = pet
+        seen.claimed.add(pet)
+    return pet
+
+def pet_for_record(pet_id, pet_name):
+    """
+    Mascota a la que pertenece una consulta importada: la del ID indicado si el nombre coincide,
+    o si no (archivos sin IDs, o IDs de otra instalación) la primera con ese nombre.
+    """
+    return registry.match_pet(pet_id, pet_name)
+
+def merge_consultation_record(pet_name, date, reason, diagnosis, pet_id, consultation_id, missing_pets,
+                              resolved=None, claims=None):
+    """
+    Incorpora una consulta importada a su mascota, evitando duplicados.
+    Las mascotas que no están en memoria se informan una sola vez (se anotan en missing_pets).
+    resolved guarda durante una importación la mascota de cada (ID, nombre) ya encontrada:
+    las consultas de una misma mascota vienen seguidas y se resuelven una sola vez.
+    claims (ConsultationIdClaims) son los IDs de consulta en uso durante la importación.
+    """
+    pet = resolved.get((pet_id, pet_name)) if resolved is not None else None
+    if pet is None:
+        pet = pet_for_record(pet_id, pet_name)
+        if pet and resolved is not None:
+            resolved[pet_id, pet_name] = pet
+    if pet:
+        # Evitar duplicados
+        if not pet.has_consultation(date, reason, diagnosis):
+            # Un ID que ya usa otra consulta (de otro archivo u otra instalación) se reemplaza por uno nuevo
+            if claims is None:
+                claims = ConsultationIdClaims(pets)
+            pet.add_consultation(Consultation(date, reason, diagnosis, pet, claims.claim(consultation_id)))
+    elif pet_name not in missing_pets:
+        missing_pets.add(pet_name)
+        logging.warning("Consultation import found pet not in memory: %s", pet_name)
+
+@timed("import_csv")
+@writes_registry
+def import_mascotas_duenos_csv(filename='mascotas_dueños.csv', validate=True):
     """
     Carga la información de mascotas y dueños desde un archivo CSV.
-    Valida duplicados y consistencia.
+    Valida duplicados y consistencia. Con validate=True, las filas con datos inválidos
+    se apartan a un archivo de rechazos en lugar de importarse.
     """
     try:
         if not os.path.exists(filename):
-            logging.warning(f"File {filename} does not exist. No data imported.")
+            logging.warning("File %s does not exist. No data imported.", filename)
             return
 
-        with open(filename, 'r', encoding='utf-8') as csvfile:
+        with open_text(filename) as csvfile, \
+                RejectFile(reject_filename(filename), filename) as rejects:
             reader = csv.DictReader(csvfile)
+            if validate:
+                reader = validated_rows(reader, PET_OWNER_ROW_RULES, rejects)
+            merged = 0
+            seen = ImportMatches()
             for row in reader:
-                # Verificar si el dueño ya existe
-                owner = find_owner_by_name(row['owner_name'])
-                if not owner:
-                    owner = Owner(row['owner_name'], row['owner_phone'], row['owner_address'])
-                    owners.append(owner)
-                # Verificar si la mascota ya existe
-                pet = find_pet_by_name(row['pet_name'])
-                if not pet:
-                    pet = Pet(
-                        row['pet_name'],
-                        row['species'],
-                        row['breed'],
-                        int(row['age']),
-                        owner
-                    )
-                    pets.append(pet)
-        logging.info(f"Imported pets and owners from CSV: {filename}")
+                merge_pet_owner_row(
+                    row['pet_name'], row['species'], row['breed'], row['age'],
+                    row['owner_name'], row['owner_phone'], row['owner_address'],
+                    parse_id(row.get('pet_id')), parse_id(row.get('owner_id')), seen
+                )
+                merged += 1
+        metrics.add_rows("import_csv", merged + rejects.count)
+        report_rejects(rejects)
+        logging.info("Imported pets and owners from CSV: %s", filename)
         print(f"Data imported from {filename}")
     except Exception as e:
-        logging.error(f"Error importing from CSV {filename}: {e}")
+        logging.error("Error importing from CSV %s: %s", filename, e)
         print(f"Error importing from CSV: {e}")
 
-def export_consultas_json(filename='consultas.json'):
+@timed("export_json")
+def export_consultas_json(filename='consultas.json', view=None, compression=None):
     """
     Guarda el historial de consultas en un archivo JSON.
     Estructura:
     [
         {
+            "pet_id": ...,
             "pet_name": ...,
             "consultations": [
-                {"date": ..., "reason": ..., "diagnosis": ...},
+                {"id": ..., "date": ..., "reason": ..., "diagnosis": ...},
                 ...
             ]
         },
         ...
     ]
+    view es la copia del registro a exportar (por defecto, una copia tomada en el momento).
+    Se escribe mascota por mascota, sin armar la lista completa en memoria. Sin comprimir conserva
+    el formato indentado; con compression ('gzip' o 'xz') va una mascota por línea sin indentar
+    (json.dumps sin indent usa el codificador en C, varias veces más rápido).
     """
     try:
-        data = []
-        for pet in pets:
-            consultas_list = []
-            for consulta in pet.consultations:
-                consultas_list.append({
-                    'date': consulta.date,
-                    'reason': consulta.reason,
-                    'diagnosis': consulta.diagnosis
-                })
-            data.append({
-                'pet_name': pet.name,
-                'consultations': consultas_list
-            })
-        with open(filename, 'w', encoding='utf-8') as jsonfile:
-            json.dump(data, jsonfile, ensure_ascii=False, indent=4)
-        logging.info(f"Exported consultations to JSON: {filename}")
-        print(f"Consultations exported to {filename}")
+        # El archivo puede ser el origen de historiales pendientes: se cargan antes de reescribirlo
+        ensure_histories_loaded()
+        view = view or registry.snapshot()
+        with atomic_text_writer(filename, compression) as jsonfile:
+            separator = '['
+            for pet, history in zip(view.pets, view.histories):
+                consultas_list = []
+                for consulta in history:
+                    consultas_list.append({
+                        'id': consulta.id,
+                        'date': consulta.date,
+                        'reason': consulta.reason,
+                        'diagnosis': consulta.diagnosis
+                    })
+                item = {
+                    'pet_id': pet.id,
+                    'pet_name': pet.name,
+                    'consultations': consultas_list
+                }
+                if compression is None:
+                    # Igual que json.dump(lista, indent=4): cada bloque queda con un nivel de sangría
+                    block = '    ' + json.dumps(item, ensure_ascii=False, indent=4).replace('\n', '\n    ')
+                else:
+                    block = json.dumps(item, ensure_ascii=False)
+                jsonfile.write(separator)
+                jsonfile.write('\n')
+                jsonfile.write(block)
+                separator = ','
+                metrics.add_rows("export_json", len(consultas_list))
+            jsonfile.write('[]' if separator == '[' else '\n]')
+        logging.info("Exported consultations to JSON: %s", filename)
+        report_success(f"Consultations exported to {filename}")
+        return True
     except Exception as e:
-        logging.error(f"Error exporting consultations to JSON {filename}: {e}")
+        logging.error("Error exporting consultations to JSON %s: %s", filename, e)
         print(f"Error exporting consultations to JSON: {e}")
+        return False
+
+def iter_consultation_records(view=None):
+    """Genera un diccionario por consulta registrada (de la copia view, o una tomada en el momento)."""
+    view = view or registry.snapshot()
+    for pet, history in zip(view.pets, view.histories):
+        for consulta in history:
+            yield {
+                'id': consulta.id,
+                'pet_id': pet.id,
+                'pet_name': pet.name,
+                'date': consulta.date,
+                'reason': consulta.reason,
+                'diagnosis': consulta.diagnosis
+            }
+
+@timed("export_ndjson")
+def export_consultas_ndjson(filename='consultas.ndjson', view=None, compression=None):
+    """
+    Guarda el historial de consultas en formato JSON por líneas (NDJSON).
+    Cada línea es una consulta independiente:
+    {"id": ..., "pet_id": ..., "pet_name": ..., "date": ..., "reason": ..., "diagnosis": ...}
+    Se escribe consulta a consulta, por lo que la memoria usada no depende del tamaño del historial.
+    compression: None, 'gzip' o 'xz'. El archivo se reemplaza de forma atómica al terminar.
+    """
+    try:
+        ensure_histories_loaded()
+        written = 0
+        with atomic_text_writer(filename, compression) as ndjsonfile:
+            for record in iter_consultation_records(view):
+                ndjsonfile.write(json.dumps(record, ensure_ascii=False))
+                ndjsonfile.write('\n')
+                written += 1
+        metrics.add_rows("export_ndjson", written)
+        logging.info("Exported consultations to NDJSON: %s", filename)
+        report_success(f"Consultations exported to {filename}")
+        return True
+    except Exception as e:
+        logging.error("Error exporting consultations to NDJSON %s: %s", filename, e)
+        print(f"Error exporting consultations to NDJSON: {e}")
+        return False
+
+def detect_consultas_format(jsonfile):
+    """
+    Detecta el formato de un archivo de consultas abierto mirando su primer carácter significativo.
+    Devuelve 'json' (lista completa), 'ndjson' (una consulta por línea) o None si está vacío.
+    Deja el archivo posicionado al inicio.
+    """
+    first_char = None
+    while True:
+        chunk = jsonfile.read(1024)
+        if not chunk:
+            break
+        stripped = chunk.lstrip()
+        if stripped:
+            first_char = stripped[0]
+            break
+    jsonfile.seek(0)
+    if first_char is None:
+        return None
+    return 'json' if first_char == '[' else 'ndjson'
 
-def import_consultas_json(filename='consultas.json'):
+def iter_consultas_ndjson(jsonfile):
     """
-    Carga el historial de consultas desde un archivo JSON.
-    Valida consistencia de mascotas.
+    Lee un archivo NDJSON de consultas línea a línea y genera un diccionario por consulta.
+    Una línea que no es JSON válido se genera como texto, para que la validación la aparte
+    a los rechazos sin cortar la importación.
+    """
+    for line in jsonfile:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                yield line
+
+def iter_consultas_json(jsonfile):
+    """Lee el formato JSON clásico (lista de mascotas con sus consultas) y genera un diccionario por consulta."""
+    for item in json.load(jsonfile):
+        for consulta_data in item['consultations']:
+            yield {
+                'id': consulta_data.get('id'),
+                'pet_id': item.get('pet_id'),
+                'pet_name': item.get('pet_name'),
+                'date': consulta_data.get('date'),
+                'reason': consulta_data.get('reason'),
+                'diagnosis': consulta_data.get('diagnosis')
+            }
+
+def iter_consultas_file(jsonfile):
+    """Genera las consultas de un archivo abierto, detectando automáticamente si es JSON o NDJSON."""
+    file_format = detect_consultas_format(jsonfile)
+    if file_format == 'json':
+        return iter_consultas_json(jsonfile)
+    if file_format == 'ndjson':
+        return iter_consultas_ndjson(jsonfile)
+    return iter(())
+
+@timed("import_consultations")
+@writes_registry
+def import_consultas_json(filename='consultas.json', validate=True, lazy=None):
+    """
+    Carga el historial de consultas desde un archivo JSON o NDJSON (se detecta automáticamente).
+    Valida consistencia de mascotas. Con validate=True, las consultas con datos inválidos
+    se apartan a un archivo de rechazos en lugar de importarse.
+    Con lazy=True (por defecto, lazy_histories) solo indexa el archivo y cada historial se
+    carga al acceder a la mascota. Los archivos comprimidos (gzip o xz) se leen igual, pero
+    siempre completos: no se puede saltar a la posición de un historial dentro de ellos.
     """
     try:
         if not os.path.exists(filename):
-            logging.warning(f"File {filename} does not exist. No consultations imported.")
+            logging.warning("File %s does not exist. No consultations imported.", filename)
             return
+        if lazy if lazy is not None else lazy_histories:
+            if compression_of(filename) is None:
+                index_consultas_file(filename, validate)
+                return
+            logging.info("Compressed consultations file %s is loaded in full instead of on demand", filename)
 
-        with open(filename, 'r', encoding='utf-8') as jsonfile:
-            data = json.load(jsonfile)
-            for item in data:
-                pet = find_pet_by_name(item['pet_name'])
-                if pet:
-                    for consulta_data in item['consultations']:
-                        # Evitar duplicados
-                        exists = any(
-                            c.date == consulta_data['date'] and
-                            c.reason == consulta_data['reason'] and
-                            c.diagnosis == consulta_data['diagnosis']
-                            for c in pet.consultations
-                        )
-                        if not exists:
-                            consulta = Consultation(
-                                consulta_data['date'],
-                                consulta_data['reason'],
-                                consulta_data['diagnosis'],
-                                pet
-                            )
-                            pet.add_consultation(consulta)
-                else:
-                    logging.warning(f"Consultation import found pet not in memory: {item['pet_name']}")
-        logging.info(f"Imported consultations from JSON: {filename}")
+        missing_pets = set()
+        resolved = {}
+        claims = ConsultationIdClaims(pets)
+        with open_text(filename) as jsonfile, \
+                RejectFile(reject_filename(filename), filename) as rejects:
+            records = iter_consultas_file(jsonfile)
+            # Sin validar los campos igual se apartan las líneas que no son una consulta (JSON inválido)
+            records = validated_rows(records, CONSULTATION_RECORD_RULES if validate else (), rejects)
+            merged = 0
+            for consulta_data in records:
+                merge_consultation_record(
+                    consulta_data['pet_name'], consulta_data['date'],
+                    consulta_data['reason'], consulta_data['diagnosis'],
+                    parse_id(consulta_data.get('pet_id')), parse_id(consulta_data.get('id')),
+                    missing_pets, resolved, claims
+                )
+                merged += 1
+        metrics.add_rows("import_consultations", merged + rejects.count)
+        report_rejects(rejects)
+        logging.info("Imported consultations from JSON: %s", filename)
         print(f"Consultations imported from {filename}")
     except Exception as e:
-        logging.error(f"Error importing consultations from JSON {filename}: {e}")
+        logging.error("Error importing consultations from JSON %s: %s", filename, e)
         print(f"Error importing consultations from JSON: {e}")
 
-def export_all():
-    """Guarda toda la información (mascotas, dueños y consultas) en los archivos recomendados."""
-    export_mascotas_duenos_csv()
-    export_consultas_json()
+def index_consultas_file(filename, validate=True):
+    """Importación diferida: valida e indexa el archivo de consultas sin crear las consultas."""
+    from history_index import ConsultationFileIndex
+    with RejectFile(reject_filename(filename), filename) as rejects:
+        index = ConsultationFileIndex(filename, consultation_id_floor(pets))
+        index.build(CONSULTATION_RECORD_RULES if validate else None, rejects)
+    for pet_name in attach_history_index(index):
+        logging.warning("Consultation import found pet not in memory: %s", pet_name)
+    metrics.add_rows("import_consultations", index.records)
+    report_rejects(rejects)
+    logging.info("Indexed consultations from %s: %s records, %s histories pending", filename,
+                 index.records, index.pending)
+    print(f"Consultations indexed from {filename}")
+    return index
+
+def import_multiple_files():
+    """Importa en paralelo varios archivos CSV y de consultas (por ejemplo, uno por recepción)."""
+    from parallel_import import import_shards
+    try:
+        csv_files = [name.strip() for name in input("Pet/owner CSV files (comma separated): ").split(",") if name.strip()]
+        json_files = [name.strip() for name in input("Consultation files (comma separated): ").split(",") if name.strip()]
+        missing = [name for name in csv_files + json_files if not os.path.exists(name)]
+        if missing:
+            logging.warning("Parallel import skipped missing files: %s", ", ".join(missing))
+            print(f"Skipping missing files: {', '.join(missing)}")
+        stats = import_shards(csv_files, json_files)
+        logging.info("Parallel import finished: %s", stats)
+        print(f"Imported {stats['pet_owner_rows']} pet/owner rows and {stats['consultation_rows']} consultations "
+              f"({stats['rejected']} invalid records skipped).")
+    except Exception as e:
+        logging.error("Error in parallel import: %s", e)
+        print(f"Error importing files in parallel: {e}")
+
+##############################
+# ALMACENAMIENTO SQLITE (OPCIONAL)
+##############################
+
+# Backend activo; None significa usar los archivos CSV/JSON
+storage = None
+
+def use_sqlite_storage(path='clinica_veterinaria.db', csv_filename='mascotas_dueños.csv', json_filename='consultas.json'):
+    """
+    Activa el backend SQLite para import_all/export_all.
+    Si la base de datos está vacía y existen los archivos CSV/JSON, los migra una sola vez.
+    """
+    global storage
+    from sqlite_storage import SQLiteStorage
+    storage = SQLiteStorage(path)
+    csv_filename, json_filename = latest_export(csv_filename), latest_export(json_filename)
+    if storage.is_empty() and (os.path.exists(csv_filename) or os.path.exists(json_filename)):
+        migrate_files_to_sqlite(csv_filename, json_filename)
+    return storage
+
+def migrate_files_to_sqlite(csv_filename='mascotas_dueños.csv', json_filename='consultas.json'):
+    """
+    Importa los archivos CSV/JSON al registro y los guarda en la base de datos SQLite activa.
+    Cada importación toma la escritura del registro; el guardado toma solo la lectura.
+    """
+    try:
+        import_mascotas_duenos_csv(csv_filename)
+        import_consultas_json(json_filename)
+        storage.save(registry)
+        logging.info("Migrated %s and %s to SQLite: %s", csv_filename, json_filename, storage.path)
+        print(f"Data migrated to {storage.path}")
+    except Exception as e:
+        logging.error("Error migrating files to SQLite: %s", e)
+        print(f"Error migrating data to SQLite: {e}")
+
+##############################
+# HISTORIALES BAJO DEMANDA
+##############################
+
+# Orígenes (snapshot o índice de un archivo de consultas) con historiales todavía sin cargar
+history_sources = []
+# Si import_consultas_json indexa el archivo en lugar de cargar todas las consultas (VET_LAZY_HISTORY=1)
+lazy_histories = False
+
+def use_lazy_histories(enabled=True):
+    """Activa la carga diferida: cada historial se lee del archivo de consultas al acceder a la mascota."""
+    global lazy_histories
+    lazy_histories = enabled
+    logging.info("Lazy consultation histories: %s", enabled)
+
+def track_history_source(source):
+    """
+    Registra un origen con historiales pendientes. Mientras haya alguno, los índices de toda la
+    clínica quedan desconectados y se reconstruyen completos en ensure_histories_loaded.
+    """
+    history_sources.append(source)
+    for index in clinic_indexes():
+        index.detach()
+
+def ensure_histories_loaded():
+    """
+    Carga los historiales pendientes y pone al día los índices de toda la clínica.
+    Se llama antes de cualquier consulta que abarque todas las mascotas y antes de
+    reescribir los archivos de los que se leen los historiales.
+    """
+    if not history_sources:
+        return
+    with registry.lock.write():
+        if not history_sources:  # otro hilo los cargó mientras se esperaba el candado
+            return
+        rebuild_clinic_indexes()  # recorrer pet.consultations carga cada historial pendiente
+        for source in history_sources:
+            if not source.pending:
+                source.close()
+        history_sources.clear()
+    logging.info("Pending consultation histories loaded")
+
+def attach_history_index(index):
+    """
+    Deja pendiente en cada mascota su historial indexado en el archivo. Las mascotas que ya
+    tienen consultas (o un historial pendiente de otro origen) las reciben en el momento.
+    Devuelve las mascotas que no están en memoria.
+    """
+    missing = []
+    for key in index.pet_keys():
+        pet = pet_for_record(key[0], index.names[key])
+        if pet is None:
+            missing.append(index.names[key])
+        elif pet.history_loaded and not pet.consultations:
+            pet.set_history_source(index, key)
+            index.pending += 1
+        else:
+            for consultation in index.read_history(pet, key):
+                if not pet.has_consultation(consultation.date, consultation.reason, consultation.diagnosis):
+                    pet.add_consultation(consultation)
+    if index.pending:
+        track_history_source(index)
+    return missing
+
+##############################
+# COMPRESIÓN DE LAS EXPORTACIONES (OPCIONAL)
+##############################
+
+# Compresión de los archivos que escribe export_all: None, 'gzip' o 'xz'
+export_compression = None
+
+def use_compression(compression='gzip'):
+    """
+    Hace que export_all escriba mascotas_dueños.csv.gz y consultas.json.gz (o .xz) en lugar de los
+    archivos sin comprimir. import_all lee siempre la versión más nueva de cada archivo.
+    """
+    global export_compression
+    export_compression = check_compression(compression)
+    logging.info("Export compression: %s", compression)
+
+##############################
+# SNAPSHOT BINARIO (OPCIONAL)
+##############################
+
+# Snapshot activo; None significa no usarlo
+snapshot_path = None
+# Si export_all también escribe los archivos CSV/JSON junto al snapshot
+snapshot_text_files = True
+
+def use_snapshot(path='clinica_veterinaria.snap', text_files=True):
+    """
+    Activa el snapshot binario: import_all lo usa si está al día y export_all lo escribe
+    (junto a los archivos CSV/JSON, o en lugar de ellos con text_files=False).
+    """
+    global snapshot_path, snapshot_text_files
+    snapshot_path = path
+    snapshot_text_files = text_files
+    logging.info("Binary snapshot enabled: %s (text files: %s)", path, text_files)
+
+def snapshot_is_current(csv_filename='mascotas_dueños.csv', json_filename='consultas.json'):
+    """Indica si el snapshot existe y no es más viejo que los archivos CSV/JSON (que pudieron editarse a mano)."""
+    if not os.path.exists(snapshot_path):
+        return False
+    snapshot_time = os.path.getmtime(snapshot_path)
+    return all(not os.path.exists(name) or os.path.getmtime(name) <= snapshot_time
+               for name in (latest_export(csv_filename), latest_export(json_filename)))
+
+@timed("export_snapshot")
+def export_snapshot(path=None, view=None):
+    """
+    Guarda dueños, mascotas y consultas en el snapshot binario. Devuelve True si se guardó.
+    view es la copia del registro a exportar (por defecto, una copia tomada en el momento).
+    """
+    from snapshot import write_snapshot
+    path = path or snapshot_path or 'clinica_veterinaria.snap'
+    try:
+        # Carga los historiales pendientes y libera el snapshot abierto antes de reemplazarlo
+        ensure_histories_loaded()
+        view = view or registry.snapshot()
+        written = write_snapshot(path, view.owners, view.pets, view.histories)
+        metrics.add_rows("export_snapshot", len(view.owners) + len(view.pets) + written)
+        logging.info("Exported binary snapshot: %s", path)
+        report_success(f"Snapshot saved to {path}")
+        return True
+    except Exception as e:
+        logging.error("Error exporting snapshot %s: %s", path, e)
+        print(f"Error saving snapshot: {e}")
+        return False
+
+@timed("import_snapshot")
+@writes_registry
+def import_snapshot(path=None):
+    """
+    Carga dueños y mascotas desde el snapshot binario. Los historiales quedan en el archivo
+    hasta que se consulta cada mascota; los índices de toda la clínica se completan la primera
+    vez que se usan (ensure_histories_loaded).
+    """
+    from snapshot import SnapshotReader
+    path = path or snapshot_path or 'clinica_veterinaria.snap'
+    try:
+        if not os.path.exists(path):
+            logging.warning("Snapshot %s does not exist. No data imported.", path)
+            return
+        reader = SnapshotReader(path)
+        if reader.load(registry):
+            track_history_source(reader)
+        else:
+            reader.close()
+        metrics.add_rows("import_snapshot", reader.owner_count + reader.pet_count)
+        print(f"Data loaded from {path}")
+    except Exception as e:
+        logging.error("Error importing snapshot %s: %s", path, e)
+        print(f"Error loading snapshot: {e}")
+
+# Un export_all a la vez (menú, autoguardado, servidor): escriben los mismos archivos temporales
+export_lock = threading.Lock()
+
+@timed("export_all")
+def export_all(view=None):
+    """
+    Guarda toda la información (mascotas, dueños y consultas) en los archivos recomendados o en SQLite.
+    Los archivos se escriben desde una sola copia instantánea del registro (view, o una tomada al
+    empezar), así que son coherentes entre sí y las altas de otros hilos no esperan a la escritura.
+    Devuelve True si todo se guardó correctamente.
+    """
+    with export_lock:
+        return _export_all(view)
+
+def _export_all(view):
+    if storage is not None:
+        try:
+            # Incremental (solo lo nuevo): junta las filas con la lectura tomada y escribe sin ella
+            storage.save(registry)
+            report_success(f"Data saved to {storage.path}")
+            return True
+        except Exception as e:
+            logging.error("Error saving to SQLite %s: %s", storage.path, e)
+            print(f"Error saving to SQLite: {e}")
+            return False
+    ensure_histories_loaded()
+    view = view or registry.snapshot()
+    if snapshot_path is not None and not snapshot_text_files:
+        return export_snapshot(view=view)
+    # El CSV se escribe en otro hilo mientras este escribe el JSON: la compresión y la escritura
+    # en disco liberan el GIL, así que los dos archivos avanzan a la vez
+    csv_name = compressed_name('mascotas_dueños.csv', export_compression)
+    json_name = compressed_name('consultas.json', export_compression)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix='export-csv') as pool:
+        csv_future = pool.submit(call_with_output, getattr(_output, 'quiet', False),
+                                 export_mascotas_duenos_csv, csv_name, view, export_compression)
+        json_ok = export_consultas_json(json_name, view, export_compression)
+        csv_ok = csv_future.result()
+    # El snapshot se escribe al final para que quede más nuevo que los archivos de texto
+    snapshot_ok = export_snapshot(view=view) if snapshot_path is not None else True
+    return csv_ok and json_ok and snapshot_ok
 
+@timed("import_all")
+@writes_registry
 def import_all():
-    """Carga toda la información desde los archivos recomendados."""
-    import_mascotas_duenos_csv()
-    import_consultas_json()
+    """
+    Carga toda la información desde los archivos recomendados o desde SQLite, y reaplica el diario si está activo.
+    Los índices de toda la clínica no se actualizan consulta a consulta durante la carga: se
+    reconstruyen en una sola pasada al final (o al usarlos, si quedan historiales pendientes).
+    """
+    for index in clinic_indexes():
+        index.detach()
+    try:
+        if storage is not None:
+            try:
+                # Los historiales quedan en la base de datos hasta que se consulta cada mascota
+                histories = storage.load(registry)
+                if histories.pending:
+                    track_history_source(histories)
+                print(f"Data loaded from {storage.path}")
+            except Exception as e:
+                logging.error("Error loading from SQLite %s: %s", storage.path, e)
+                print(f"Error loading from SQLite: {e}")
+        elif snapshot_path is not None and snapshot_is_current():
+            import_snapshot()
+        else:
+            # La versión más nueva de cada archivo, comprimida o no
+            import_mascotas_duenos_csv(latest_export('mascotas_dueños.csv'))
+            import_consultas_json(latest_export('consultas.json'))
+        if change_journal is not None:
+            replay_journal()
+    finally:
+        if not history_sources:
+            rebuild_clinic_indexes()
+
+
+##############################
+# ALMACÉN COLUMNAR DE CONSULTAS (OPCIONAL)
+##############################
+
+# Almacén activo; None significa que no se mantiene el índice columnar
+consultation_store = None
+
+def enable_columnar_store():
+    """
+    Crea el almacén columnar con las consultas actuales y lo mantiene al día con cada consulta nueva.
+    Desde ahí consultations_between y diagnosis_counts filtran sobre sus columnas.
+    """
+    global consultation_store
+    from columnar import ConsultationStore
+    ensure_histories_loaded()
+    consultation_store = ConsultationStore()
+    consultation_store.rebuild(pets)
+    consultation_store.attach()
+    logging.info("Columnar consultation store enabled with %s rows", len(consultation_store))
+    return consultation_store
+
+
+##############################
+# DIARIO DE CAMBIOS (JOURNAL)
+##############################
+
+# Diario activo; None significa que los cambios solo se guardan con export_all
+change_journal = None
+# Tamaño a partir del cual checkpoint() compacta el diario en un snapshot nuevo
+JOURNAL_COMPACT_BYTES = 4 * 1024 * 1024
+
+def enable_journal(path='clinica_veterinaria.journal', sync_every=32):
+    """Activa el diario de cambios: cada alta exitosa (interactiva o por lotes) se agrega al final del archivo indicado."""
+    global change_journal
+    from journal import Journal
+    change_journal = Journal(path, sync_every=sync_every)
+    if journal_record not in services.change_listeners:
+        services.change_listeners.append(journal_record)
+    return change_journal
+
+def journal_record(record):
+    """Agrega un registro al diario si está activo. Un fallo del diario no interrumpe el alta."""
+    if change_journal is None:
+        return
+    try:
+        change_journal.append(record)
+    except Exception as e:
+        logging.error("Error writing to journal %s: %s", change_journal.path, e)
+
+def _journal_lookup(by_id, by_name, record_id, name):
+    return by_name(name) if record_id is None else by_id(record_id)
+
+def apply_journal_record(record):
+    """Aplica un registro del diario al registro en memoria, con las mismas reglas de duplicados que la importación."""
+    # Los IDs del diario son los de esta misma instalación: con ID se busca solo por ID
+    # (puede haber varios con el mismo nombre); los diarios anteriores a los IDs, por nombre
+    op = record.get('op')
+    record_id = parse_id(record.get('id'))
+    if op == 'owner':
+        if not _journal_lookup(registry.owner_by_id, registry.find_owner, record_id, record['name']):
+            owners.append(Owner(record['name'], record['phone'], record['address'],
+                                registry.unused_owner_id(record_id)))
+    elif op == 'pet':
+        owner = _journal_lookup(registry.owner_by_id, registry.find_owner,
+                                parse_id(record.get('owner_id')), record['owner_name'])
+        if not owner:
+            logging.warning("Journal pet references unknown owner: %s", record['owner_name'])
+        elif not _journal_lookup(registry.pet_by_id, registry.find_pet, record_id, record['name']):
+            pets.append(Pet(record['name'], record['species'], record['breed'], int(record['age']), owner,
+                            registry.unused_pet_id(record_id)))
+    elif op == 'consultation':
+        pet = _journal_lookup(registry.pet_by_id, registry.find_pet,
+                              parse_id(record.get('pet_id')), record['pet_name'])
+        if not pet:
+            logging.warning("Journal consultation references unknown pet: %s", record['pet_name'])
+        elif not pet.has_consultation(record['date'], record['reason'], record['diagnosis']):
+            if record_id is not None:
+                consultation_ids.reserve(record_id)
+            pet.add_consultation(Consultation(record['date'], record['reason'], record['diagnosis'], pet, record_id))
+    else:
+        logging.warning("Unknown journal record ignored: %s", record)
+
+@timed("replay_journal")
+@writes_registry
+def replay_journal():
+    """Reaplica sobre el último snapshot los cambios guardados en el diario."""
+    from journal import read_journal
+    try:
+        count = 0
+        for record in read_journal(change_journal.path):
+            apply_journal_record(record)
+            count += 1
+        metrics.add_rows("replay_journal", count)
+        logging.info("Replayed %s journal records from %s", count, change_journal.path)
+        if count:
+            print(f"Replayed {count} pending changes from {change_journal.path}")
+    except Exception as e:
+        logging.error("Error replaying journal %s: %s", change_journal.path, e)
+        print(f"Error replaying journal: {e}")
+
+@timed("compact_journal")
+def compact_journal():
+    """
+    Guarda un snapshot completo con export_all y, si tuvo éxito, quita del diario lo que ya
+    quedó guardado. Las altas que llegan mientras se escribe el snapshot siguen en el diario.
+    El CSV solo tiene filas de mascotas: si se guarda en archivos de texto, los dueños sin
+    mascotas conservan su alta en el diario.
+    """
+    if change_journal is None:
+        return export_all()
+    with registry.lock.write():
+        ensure_histories_loaded()
+        view = registry.snapshot()
+        change_journal.sync()
+        saved_bytes = change_journal.size()
+    keep = ()
+    if storage is None and snapshot_path is None:
+        with_pets = {id(pet.owner) for pet in view.pets}
+        keep = [services.owner_record(owner) for owner in view.owners if id(owner) not in with_pets]
+    if not export_all(view):
+        logging.warning("Journal compaction skipped because the snapshot could not be saved.")
+        return False
+    with registry.lock.write():
+        change_journal.discard_prefix(saved_bytes, keep)
+    logging.info("Journal compacted into snapshot: %s", change_journal.path)
+    return True
+
+@timed("checkpoint")
+def checkpoint():
+    """
+    Punto de guardado usado al salir o ante errores.
+    Con el autoguardado activo no escribe nada si no hubo cambios desde el último guardado.
+    """
+    if autosaver is not None:
+        return autosaver.save_if_changed()
+    return write_checkpoint()
+
+def write_checkpoint():
+    """
+    Guarda el registro: con el diario activo solo sincroniza los cambios pendientes (y compacta
+    si el diario creció demasiado); sin diario hace un export_all completo.
+    """
+    if change_journal is None:
+        return export_all()
+    try:
+        change_journal.sync()
+        if change_journal.size() >= JOURNAL_COMPACT_BYTES:
+            return compact_journal()
+        return True
+    except Exception as e:
+        logging.error("Error syncing journal %s: %s", change_journal.path, e)
+        return export_all()
+
+
+##############################
+# AUTOGUARDADO EN SEGUNDO PLANO (OPCIONAL)
+##############################
+
+# Autoguardado activo; None significa guardar solo al salir o desde el menú
+autosaver = None
+
+def enable_autosave(interval=None):
+    """
+    Guarda cada `interval` segundos (por defecto autosave.DEFAULT_INTERVAL) desde un hilo aparte,
+    solo si hubo cambios. Los cambios se cuentan desde que se activa: conviene activarlo
+    después de import_all.
+    """
+    global autosaver
+    from autosave import Autosaver, DEFAULT_INTERVAL
+    disable_autosave()
+    autosaver = Autosaver(registry, functools.partial(call_with_output, True, write_checkpoint),
+                          interval or DEFAULT_INTERVAL)
+    autosaver.start()
+    logging.info("Autosave enabled every %s seconds", autosaver.interval)
+    return autosaver
+
+def disable_autosave():
+    """Detiene el autoguardado (sin guardar lo pendiente: para eso está checkpoint)."""
+    global autosaver
+    if autosaver is not None:
+        autosaver.stop()
+        autosaver = None
+
+##############################
+# MÉTRICAS DE OPERACIONES (OPCIONAL)
+##############################
+
+def enable_metrics(textfile=None):
+    """Activa la medición de las operaciones; textfile es el archivo Prometheus a escribir (opcional)."""
+    metrics.enable(textfile)
+    logging.info("Operation metrics enabled (textfile: %s)", textfile)
+
+def dump_metrics():
+    """Escribe el archivo de métricas en formato Prometheus si hay uno configurado."""
+    if not metrics.enabled or not metrics.textfile_path:
+        return False
+    try:
+        metrics.write_textfile()
+        return True
+    except Exception as e:
+        logging.error("Error writing metrics textfile %s: %s", metrics.textfile_path, e)
+        print(f"Error writing metrics: {e}")
+        return False
+
+def format_seconds(seconds):
+    """Duración legible (µs, ms o s) para la vista de estadísticas."""
+    if seconds is None:
+        return "-"
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds:.2f} s"
+
+def show_stats():
+    """Muestra llamadas, latencias p50/p99 y filas por segundo de cada operación medida."""
+    print("=== Operation Stats ===")
+    if not metrics.enabled:
+        print("Metrics are disabled. Start the program with VET_METRICS=1 to collect them.")
+        return
+    rows = metrics.summary()
+    if not rows:
+        print("No operations measured yet.")
+        return
+    print(f"{'Operation':<22}{'Calls':>8}{'p50':>12}{'p99':>12}{'Rows/s':>12}")
+    for name, count, p50, p99, rows_per_second in rows:
+        rate = f"{rows_per_second:,.0f}" if rows_per_second else "-"
+        print(f"{name:<22}{count:>8}{format_seconds(p50):>12}{format_seconds(p99):>12}{rate:>12}")
+    if dump_metrics():
+        print(f"Metrics written to {metrics.textfile_path}")
 
 
 # MENÚ DE IMPORTACIÓN/EXPORTACIÓN OPCIONAL
@@ -352,7 +1369,13 @@ def show_export_import_menu():
     print("3. Export pets and owners (CSV)")
     print("4. Import pets and owners (CSV)")
     print("5. Export consultations (JSON)")
-    print("6. Import consultations (JSON)")
+    print("6. Import consultations (JSON/NDJSON)")
+    print("7. Export consultations (NDJSON, streaming)")
+    print("8. Import consultations (NDJSON, streaming)")
+    print("9. Compact journal into a new snapshot")
+    print("10. Import several files in parallel")
+    print("11. Export binary snapshot")
+    print("12. Import binary snapshot")
     print("0. Back to main menu")
 
     option = input("Select an option: ").strip()
@@ -363,16 +1386,28 @@ def show_export_import_menu():
     elif option == "3":
         export_mascotas_duenos_csv()
     elif option == "4":
-        import_mascotas_duenos_csv()
+        import_mascotas_duenos_csv(latest_export('mascotas_dueños.csv'))
     elif option == "5":
         export_consultas_json()
     elif option == "6":
-        import_consultas_json()
+        import_consultas_json(latest_export('consultas.json'))
+    elif option == "7":
+        export_consultas_ndjson()
+    elif option == "8":
+        import_consultas_json(latest_export('consultas.ndjson'))
+    elif option == "9":
+        compact_journal()
+    elif option == "10":
+        import_multiple_files()
+    elif option == "11":
+        export_snapshot()
+    elif option == "12":
+        import_snapshot()
     elif option == "0":
         return
     else:
         print("Invalid option.")
-        logging.warning(f"Invalid import/export menu option selected: {option}")
+        logging.warning("Invalid import/export menu option selected: %s", option)
 
 # NOTA IMPORTANTE:
 # - Al iniciar la aplicación, llama a import_all() para cargar datos si existen.
@@ -0,0 +1,232 @@
+"""
+Índice de los historiales guardados en un archivo de consultas (JSON o NDJSON).
+
+Al importar en modo diferido el archivo se recorre una sola vez: cada
+consulta se valida (las inválidas van al archivo de rechazos como en la
+importación normal) y solo se anota en qué bytes del archivo está, por
+mascota. Los objetos Consultation de una mascota se crean recién cuando se
+accede a su historial, releyendo esos tramos del archivo.
+
+En NDJSON cada tramo es una línea (una consulta); en el formato JSON clásico
+es el bloque {"pet_id": ..., "pet_name": ..., "consultations": [...]} de la
+mascota. El archivo se lee línea a línea (NDJSON) o en bloques de CHUNK_SIZE
+bytes (JSON): en memoria solo queda la tabla de posiciones. Las consultas se agrupan por (ID de mascota, nombre normalizado), así
+que dos mascotas con el mismo nombre tienen historiales separados; en archivos
+anteriores a los IDs el ID es None y se agrupan solo por nombre.
+"""
+import codecs
+import json
+import os
+from array import array
+from operator import attrgetter
+
+from classes import Consultation, consultation_ids, keep_id
+from registry import fold_name
+from validation import row_errors, parse_id
+
+_day_of = attrgetter('day')
+
+# Bytes leídos por vez al recorrer un archivo JSON
+CHUNK_SIZE = 1024 * 1024
+_WHITESPACE = b' \t\r\n'
+
+
+def _first_byte(f):
+    """Primer byte significativo del archivo binario f (b'' si está vacío); deja f al inicio."""
+    while True:
+        chunk = f.read(CHUNK_SIZE)
+        stripped = chunk.lstrip(_WHITESPACE)
+        if stripped or not chunk:
+            f.seek(0)
+            return stripped[:1]
+
+
+def _json_blocks(f, chunk_size=CHUNK_SIZE):
+    """
+    Genera (elemento, inicio, fin) por cada elemento de la lista JSON del archivo binario f, con
+    inicio y fin en bytes. Se lee por partes: en memoria está solo el bloque en curso.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    text = ''
+    position = 0  # posición en text
+    offset = 0  # posición en bytes de text[position]
+    at_end = False
+
+    def next_char(separators):
+        # Salta los separadores (ASCII: un byte por carácter) leyendo más si hace falta
+        nonlocal text, position, offset, at_end
+        while True:
+            while position < len(text) and text[position] in separators:
+                position += 1
+                offset += 1
+            if position < len(text) or at_end:
+                return text[position:position + 1]
+            chunk = f.read(chunk_size)
+            at_end = not chunk
+            text = text[position:] + utf8.decode(chunk, final=at_end)
+            position = 0
+
+    if next_char(' \t\r\n') != '[':
+        raise ValueError("A JSON consultations file must be a list.")
+    position += 1
+    offset += 1
+    while next_char(' \t\r\n,') not in (']', ''):
+        while True:
+            try:
+                item, end = decoder.raw_decode(text, position)
+                break
+            except json.JSONDecodeError:
+                if at_end:
+                    raise
+                # El bloque sigue en la parte del archivo que todavía no se leyó
+                chunk = f.read(chunk_size)
+                at_end = not chunk
+                text = text[position:] + utf8.decode(chunk, final=at_end)
+                position = 0
+        block = text[position:end]
+        size = len(block) if block.isascii() else len(block.encode('utf-8'))
+        yield item, offset, offset + size
+        position, offset = end, offset + size
+
+
+class ConsultationFileIndex:
+    """Posiciones de las consultas de cada mascota dentro de un archivo de consultas."""
+
+    def __init__(self, filename, id_floor=0):
+        self.filename = filename
+        # Los IDs de consulta hasta id_floor ya pueden estar en uso (ver classes.keep_id)
+        self.id_floor = id_floor
+        self.format = None
+        self.names = {}  # clave de mascota -> nombre tal como figura en el archivo
+        self.records = 0
+        self.pending = 0  # mascotas con el historial todavía en el archivo
+        self._spans = {}  # clave de mascota -> array con inicio y fin (en bytes) de cada tramo
+        self._rules = None
+        self._stat = None
+
+    def close(self):
+        """No mantiene el archivo abierto; existe para tratarlo igual que un snapshot."""
+
+    def _add_span(self, pet_id, pet_name, start, end):
+        key = (parse_id(pet_id), fold_name(pet_name))
+        spans = self._spans.get(key)
+        if spans is None:
+            spans = self._spans[key] = array('q')
+            self.names[key] = pet_name
+        spans.append(start)
+        spans.append(end)
+
+    def build(self, rules=None, rejects=None):
+        """
+        Recorre el archivo y anota las consultas de cada mascota.
+        Con rules, las consultas inválidas se escriben en rejects (RejectFile) y no se indexan.
+        """
+        self._rules = rules
+        with open(self.filename, 'rb') as f:
+            self._stat = os.fstat(f.fileno())
+            first_char = _first_byte(f)
+            if first_char == b'[':
+                self.format = 'json'
+                self._build_json(f, rejects, self._verdicts())
+            elif first_char:
+                self.format = 'ndjson'
+                self._build_ndjson(f, rejects, self._verdicts())
+        return self
+
+    def _check(self, record, rejects, verdicts):
+        """
+        True si la consulta es válida (las inválidas se apartan a rejects). Reserva su ID para que
+        las consultas nuevas no lo repitan aunque el historial todavía no se haya cargado.
+        verdicts guarda por campo el resultado de cada valor ya validado: fechas, motivos,
+        diagnósticos y nombres se repiten mucho y así se valida cada valor distinto una vez.
+        """
+        self.records += 1
+        if type(record) is dict:
+            consultation_id = parse_id(record.get('id'))
+            if consultation_id is not None:
+                consultation_ids.reserve(consultation_id)
+            if self._rules is None:
+                return True
+            try:
+                for field, check, _ in self._rules:
+                    value = record.get(field)
+                    known = verdicts[field]
+                    valid = known.get(value)
+                    if valid is None:
+                        valid = known[value] = value is not None and check(value)
+                    if not valid:
+                        break
+                else:
+                    return True
+            except TypeError:  # valor no hashable: se informa con row_errors
+                pass
+        if rejects is not None:
+            rejects.write(self.records, record, row_errors(record, self._rules))
+        return False
+
+    def _verdicts(self):
+        return {field: {} for field, _, _ in self._rules or ()}
+
+    def _build_ndjson(self, f, rejects, verdicts):
+        start = 0
+        for line in f:
+            end = start + len(line)
+            line = line.strip()
+            if line:
+                try:
+                    record = json.loads(line)
+                except ValueError:  # línea que no es JSON: va a los rechazos como texto
+                    record = line.decode('utf-8', 'replace')
+                if self._check(record, rejects, verdicts):
+                    self._add_span(record.get('pet_id'), record['pet_name'], start, end)
+            start = end
+
+    def _build_json(self, f, rejects, verdicts):
+        for item, start, end in _json_blocks(f, CHUNK_SIZE):
+            indexed = False
+            for consulta_data in item['consultations']:
+                record = {'pet_name': item['pet_name'], **consulta_data}
+                if self._check(record, rejects, verdicts) and not indexed:
+                    self._add_span(item.get('pet_id'), item['pet_name'], start, end)
+                    indexed = True
+
+    def pet_keys(self):
+        """Claves (ID de mascota o None, nombre normalizado) de las mascotas con consultas en el archivo."""
+        return self._spans.keys()
+
+    def _read_records(self, key):
+        stat = os.stat(self.filename)
+        if (stat.st_size, stat.st_mtime_ns) != (self._stat.st_size, self._stat.st_mtime_ns):
+            raise RuntimeError(f"{self.filename} changed since it was indexed; import it again.")
+        spans = self._spans.get(key, ())
+        with open(self.filename, 'rb') as f:
+            for position in range(0, len(spans), 2):
+                f.seek(spans[position])
+                item = json.loads(f.read(spans[position + 1] - spans[position]))
+                if self.format == 'ndjson':
+                    yield item
+                else:
+                    for consulta_data in item['consultations']:
+                        yield {'pet_name': item['pet_name'], **consulta_data}
+
+    def read_history(self, pet, key):
+        """Crea las consultas guardadas de la mascota, sin duplicados y ordenadas por fecha."""
+        history = []
+        seen = set()
+        for record in self._read_records(key):
+            if self._rules is not None and row_errors(record, self._rules):
+                continue
+            fingerprint = (record['date'], record['reason'], record['diagnosis'])
+            if fingerprint not in seen:
+                seen.add(fingerprint)
+                history.append(Consultation(*fingerprint, pet, keep_id(parse_id(record.get('id')), self.id_floor)))
+        # Orden estable: igual que agregarlas una a una con Pet.add_consultation
+        history.sort(key=_day_of)
+        return history
+
+    def load_consultations(self, pet, key):
+        """Historial pendiente de una mascota (lo llama Pet al accederlo por primera vez)."""
+        history = self.read_history(pet, key)
+        self.pending -= 1
+        return history
@@ -0,0 +1,110 @@
+"""
+Diario (journal) de solo escritura al final para los cambios de la sesión.
+
+Cada alta exitosa se agrega como una línea JSON compacta. El archivo se vacía
+al sistema operativo en cada escritura y se sincroniza con el disco (fsync)
+por lotes, así que un cierre inesperado del proceso no pierde datos y el
+costo de guardar depende de la cantidad de cambios y no del tamaño total.
+"""
+import json
+import logging
+import os
+import time
+
+from compression import temporary_file
+
+
+class Journal:
+    """Archivo de registros JSON por línea con fsync agrupado."""
+
+    def __init__(self, path='clinica_veterinaria.journal', sync_every=32, sync_interval=1.0):
+        self.path = path
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def append(self, record):
+        """Agrega un registro al final del diario."""
+        self._file.write(_line(record))
+        self._file.flush()
+        self._pending += 1
+        if self._pending >= self.sync_every or time.monotonic() - self._last_sync >= self.sync_interval:
+            self.sync()
+
+    def sync(self):
+        """Fuerza la escritura a disco de los registros pendientes."""
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._last_sync = time.monotonic()
+
+    def reset(self):
+        """Vacía el diario, normalmente después de guardar un snapshot completo."""
+        self._file.close()
+        self._file = open(self.path, 'w', encoding='utf-8')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def discard_prefix(self, size, keep=()):
+        """
+        Quita del diario sus primeros `size` bytes (ya guardados en un snapshot) y conserva los
+        registros agregados después. Los registros de `keep` (lo que el snapshot no guardó) quedan
+        al principio, antes que los posteriores que puedan depender de ellos.
+        El reemplazo es atómico (archivo temporal y rename).
+        """
+        self.sync()
+        with open(self.path, 'rb') as journal_file:
+            journal_file.seek(size)
+            remaining = journal_file.read()
+        if not remaining and not keep:
+            self.reset()
+            return
+        f, temporary = temporary_file(self.path)
+        with f:
+            try:
+                f.write(''.join(_line(record) for record in keep).encode('utf-8'))
+                f.write(remaining)
+                f.flush()
+                os.fsync(f.fileno())
+            except BaseException:
+                f.close()
+                os.remove(temporary)
+                raise
+        self._file.close()
+        os.replace(temporary, self.path)
+        self._file = open(self.path, 'a', encoding='utf-8')
+        self._pending = 0
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+    def size(self):
+        """Tamaño actual del diario en bytes."""
+        return os.path.getsize(self.path)
+
+
+def _line(record):
+    return json.dumps(record, ensure_ascii=False, separators=(',', ':')) + '\n'
+
+
+def read_journal(path):
+    """
+    Genera los registros del diario en orden.
+    Una última línea incompleta (por ejemplo, tras un corte) se ignora.
+    """
+    if not os.path.exists(path):
+        return
+    with open(path, 'r', encoding='utf-8') as journal_file:
+        for line_number, line in enumerate(journal_file, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                logging.warning("Skipping corrupt journal line %s in %s", line_number, path)
@@ -1,5 +1,6 @@
 import functions
 import logging
+import os
 
 def show_menu():
     print("\n=== Veterinary Clinic - Main Menu ===")
@@ -9,11 +10,51 @@ def show_menu():
     print("4. View consultation history of a pet")
     print("5. Import/Export Data")
     print("6. Exit")
+    print("7. Recent consultations (whole clinic)")
+    print("8. Search consultations by reason or diagnosis")
+    print("9. Operation stats")
+    print("10. Clinic report (visits, diagnoses, breeds)")
 
-def main():
-    logging.info("Application started.")
+def start_up():
+    """Activa las opciones elegidas por variables de entorno y carga los datos (menú y modo servidor)."""
+    # Métricas opcionales: VET_METRICS=1 (y VET_METRICS_FILE para el archivo en formato Prometheus)
+    if os.environ.get("VET_METRICS") == "1":
+        functions.enable_metrics(os.environ.get("VET_METRICS_FILE"))
+    # Backend opcional: VET_STORAGE=sqlite guarda en clinica_veterinaria.db
+    if os.environ.get("VET_STORAGE") == "sqlite":
+        functions.use_sqlite_storage(os.environ.get("VET_SQLITE_PATH", "clinica_veterinaria.db"))
+    # Snapshot binario opcional: VET_SNAPSHOT=1 (junto a CSV/JSON) o VET_SNAPSHOT=only (en lugar de ellos)
+    if os.environ.get("VET_SNAPSHOT") in ("1", "only"):
+        functions.use_snapshot(os.environ.get("VET_SNAPSHOT_PATH", "clinica_veterinaria.snap"),
+                               text_files=os.environ.get("VET_SNAPSHOT") != "only")
+    # Historiales bajo demanda: VET_LAZY_HISTORY=1 indexa el archivo de consultas y carga cada historial al usarlo
+    if os.environ.get("VET_LAZY_HISTORY") == "1":
+        functions.use_lazy_histories()
+    # Exportaciones comprimidas: VET_COMPRESS=gzip o VET_COMPRESS=xz
+    if os.environ.get("VET_COMPRESS"):
+        functions.use_compression(os.environ["VET_COMPRESS"])
+    # Diario opcional: VET_JOURNAL=1 guarda cada alta al momento en clinica_veterinaria.journal
+    if os.environ.get("VET_JOURNAL") == "1":
+        functions.enable_journal()
     # Cargar datos al inicio
     functions.import_all()
+    # Índice columnar opcional para consultas por rango de fechas: VET_COLUMNAR=1
+    if os.environ.get("VET_COLUMNAR") == "1":
+        functions.enable_columnar_store()
+    # Autoguardado en segundo plano: VET_AUTOSAVE=1 (VET_AUTOSAVE_INTERVAL en segundos, 60 por defecto).
+    # Se activa después de cargar para que los datos recién leídos no cuenten como cambios
+    if os.environ.get("VET_AUTOSAVE") == "1":
+        functions.enable_autosave(float(os.environ.get("VET_AUTOSAVE_INTERVAL", 0)) or None)
+
+def shut_down():
+    """Guarda lo pendiente y detiene el autoguardado (al salir, ante errores y en modo servidor)."""
+    functions.checkpoint()
+    functions.disable_autosave()
+    functions.dump_metrics()
+
+def main():
+    logging.info("Application started.")
+    start_up()
     try:
         while True:
             show_menu()
@@ -30,18 +71,26 @@ def main():
                 functions.show_export_import_menu()
             elif option == "6":
                 # Guardar datos al salir
-                functions.export_all()
+                shut_down()
                 print("Goodbye!")
                 logging.info("Application closed by user.")
                 break
+            elif option == "7":
+                functions.view_recent_consultations()
+            elif option == "8":
+                functions.search_consultations()
+            elif option == "9":
+                functions.show_stats()
+            elif option == "10":
+                functions.show_clinic_report()
             else:
                 print("Invalid option. Please try again.")
-                logging.warning(f"Invalid menu option selected: {option}")
+                logging.warning("Invalid menu option selected: %s", option)
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
-        logging.error(f"Unexpected error in main loop: {e}")
+        logging.error("Unexpected error in main loop: %s", e)
         # Guardar datos en caso de excepción
-        functions.export_all()
+        shut_down()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
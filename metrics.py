@@ -0,0 +1,188 @@
+"""
+Métricas de las operaciones de la clínica: cantidad de llamadas, latencias y filas por segundo.
+
+Las funciones se marcan con @timed("nombre"), que las anota pero las deja
+tal cual: mientras las métricas están desactivadas (lo normal) no cuestan
+nada. enable() reemplaza cada función anotada en su módulo por una versión
+que mide cada llamada y suma su duración a un histograma de buckets fijos,
+del que se estiman p50 y p99 sin guardar las muestras; disable() vuelve a
+poner las originales. Las importaciones y exportaciones
+informan además cuántas filas procesaron con add_rows().
+
+Los valores se pueden ver con summary() o volcar a un archivo de texto en el
+formato de Prometheus (write_textfile), por ejemplo para el "textfile
+collector" de node_exporter.
+"""
+import functools
+import sys
+import time
+from bisect import bisect_left
+
+from compression import atomic_text_writer
+
+# Límites superiores de los buckets (segundos): de 1 µs a ~95 s, cada uno √2 veces el anterior
+BUCKET_BOUNDS = tuple(1e-6 * 2 ** (i / 2) for i in range(54))
+
+enabled = False
+textfile_path = None
+_operations = {}
+# Funciones anotadas con @timed: (módulo, nombre de la función, nombre de la operación, función original)
+_instrumented = []
+
+
+class OperationStats:
+    """Acumulados de una operación: llamadas, tiempo total, filas e histograma de latencias."""
+
+    __slots__ = ('count', 'seconds', 'max_seconds', 'rows', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)  # el último es +Inf
+
+    def observe(self, seconds):
+        self.count += 1
+        self.seconds += seconds
+        if seconds > self.max_seconds:
+            self.max_seconds = seconds
+        self.buckets[bisect_left(BUCKET_BOUNDS, seconds)] += 1
+
+    def quantile(self, q):
+        """Estimación del cuantil q (límite superior del bucket donde cae), o None sin llamadas."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for position, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= target:
+                return BUCKET_BOUNDS[position] if position < len(BUCKET_BOUNDS) else self.max_seconds
+        return self.max_seconds
+
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.rows and self.seconds else None
+
+
+def enable(textfile=None):
+    """Empieza a medir. textfile: ruta donde write_textfile() vuelca las métricas por defecto."""
+    global enabled, textfile_path
+    textfile_path = textfile
+    if enabled:
+        return
+    enabled = True
+    for module, attribute, name, func in _instrumented:
+        setattr(sys.modules[module], attribute, _measured(name, func))
+
+
+def disable():
+    """Deja de medir y vuelve a poner las funciones originales."""
+    global enabled
+    if not enabled:
+        return
+    enabled = False
+    for module, attribute, name, func in _instrumented:
+        setattr(sys.modules[module], attribute, func)
+
+
+def reset():
+    """Descarta todo lo medido hasta ahora (las funciones ya instrumentadas siguen midiendo)."""
+    for stats in _operations.values():
+        stats.__init__()
+
+
+def _stats(name):
+    stats = _operations.get(name)
+    if stats is None:
+        stats = _operations[name] = OperationStats()
+    return stats
+
+
+def observe(name, seconds):
+    """Registra una llamada a la operación `name` que tardó `seconds`."""
+    if enabled:
+        _stats(name).observe(seconds)
+
+
+def add_rows(name, rows):
+    """Suma filas procesadas por la operación `name` (para calcular filas por segundo)."""
+    if enabled:
+        _stats(name).rows += rows
+
+
+def _measured(name, func):
+    """Versión de func que registra la duración de cada llamada como la operación `name`."""
+    stats = _stats(name)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stats.observe(time.perf_counter() - start)
+    return wrapper
+
+
+def timed(name):
+    """
+    Anota una función de nivel de módulo para medirla como la operación `name` cuando las métricas
+    estén activas. Los llamadores deben usarla a través del módulo (functions.export_all o el nombre
+    global dentro del mismo módulo), no con una referencia guardada antes de enable().
+    """
+    def decorator(func):
+        _instrumented.append((func.__module__, func.__name__, name, func))
+        if enabled:
+            return _measured(name, func)
+        return func
+    return decorator
+
+
+def snapshot():
+    """Copia de las estadísticas actuales: {operación: OperationStats}."""
+    return dict(_operations)
+
+
+def summary():
+    """Filas (operación, llamadas, p50, p99, filas por segundo) de las operaciones llamadas, por nombre."""
+    return [
+        (name, stats.count, stats.quantile(0.5), stats.quantile(0.99), stats.rows_per_second())
+        for name, stats in sorted(_operations.items()) if stats.count
+    ]
+
+
+def render_prometheus(prefix='vet'):
+    """Texto en el formato de exposición de Prometheus con todas las operaciones medidas."""
+    lines = [
+        f"# HELP {prefix}_operation_seconds Duration of clinic operations.",
+        f"# TYPE {prefix}_operation_seconds histogram",
+    ]
+    for name, stats in sorted(_operations.items()):
+        label = f'operation="{name}"'
+        cumulative = 0
+        for bound, bucket_count in zip(BUCKET_BOUNDS, stats.buckets):
+            cumulative += bucket_count
+            lines.append(f'{prefix}_operation_seconds_bucket{{{label},le="{bound:.6g}"}} {cumulative}')
+        lines.append(f'{prefix}_operation_seconds_bucket{{{label},le="+Inf"}} {stats.count}')
+        lines.append(f'{prefix}_operation_seconds_sum{{{label}}} {stats.seconds:.9f}')
+        lines.append(f'{prefix}_operation_seconds_count{{{label}}} {stats.count}')
+    lines.append(f"# HELP {prefix}_operation_rows_total Rows processed by imports and exports.")
+    lines.append(f"# TYPE {prefix}_operation_rows_total counter")
+    for name, stats in sorted(_operations.items()):
+        if stats.rows:
+            lines.append(f'{prefix}_operation_rows_total{{operation="{name}"}} {stats.rows}')
+    return "\n".join(lines) + "\n"
+
+
+def write_textfile(path=None):
+    """
+    Escribe las métricas en formato Prometheus de forma atómica (archivo temporal y rename),
+    para que un lector nunca vea un archivo a medio escribir. Devuelve la ruta usada.
+    """
+    path = path or textfile_path
+    if not path:
+        raise ValueError("No metrics textfile path configured.")
+    with atomic_text_writer(path) as f:
+        f.write(render_prometheus())
+    return path
@@ -0,0 +1,102 @@
+"""
+Importación en paralelo de varios archivos (uno por recepción).
+
+Cada archivo CSV de mascotas/dueños y cada archivo JSON/NDJSON de consultas
+se lee y valida en un proceso aparte (ProcessPoolExecutor). Después los
+resultados se incorporan al registro en el proceso principal, siempre en el
+orden en que se indicaron los archivos y con las mismas reglas de duplicados
+que import_mascotas_duenos_csv e import_consultas_json. Así el resultado no
+depende de qué proceso termina primero.
+"""
+import csv
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import functions
+from classes import ConsultationIdClaims
+from compression import open_text
+from registry import ImportMatches
+from validation import (
+    PET_OWNER_ROW_RULES, CONSULTATION_RECORD_RULES, RejectFile, reject_filename, validated_rows, parse_id
+)
+
+CSV_FIELDS = ('pet_name', 'species', 'breed', 'age', 'owner_name', 'owner_phone', 'owner_address')
+CONSULTATION_FIELDS = ('pet_name', 'date', 'reason', 'diagnosis')
+# Columnas de ID opcionales (los archivos anteriores no las tienen), al final de cada tupla
+CSV_ID_FIELDS = ('pet_id', 'owner_id')
+CONSULTATION_ID_FIELDS = ('pet_id', 'id')
+
+
+def parse_pet_owner_shard(filename, validate=True):
+    """
+    Lee un CSV de mascotas y dueños (en un proceso del pool).
+    Devuelve (filas como tuplas, cantidad de filas rechazadas).
+    """
+    if not os.path.exists(filename):
+        return [], 0
+    with open_text(filename) as csvfile, \
+            RejectFile(reject_filename(filename), filename) as rejects:
+        reader = csv.DictReader(csvfile)
+        if validate:
+            reader = validated_rows(reader, PET_OWNER_ROW_RULES, rejects)
+        rows = [tuple(row[field] for field in CSV_FIELDS) + tuple(parse_id(row.get(field)) for field in CSV_ID_FIELDS)
+                for row in reader]
+        return rows, rejects.count
+
+
+def parse_consultation_shard(filename, validate=True):
+    """
+    Lee un archivo de consultas JSON o NDJSON (en un proceso del pool).
+    Devuelve (consultas como tuplas, cantidad de consultas rechazadas).
+    """
+    if not os.path.exists(filename):
+        return [], 0
+    with open_text(filename) as jsonfile, \
+            RejectFile(reject_filename(filename), filename) as rejects:
+        records = functions.iter_consultas_file(jsonfile)
+        # Sin validar los campos igual se apartan las líneas que no son una consulta (JSON inválido)
+        records = validated_rows(records, CONSULTATION_RECORD_RULES if validate else (), rejects)
+        rows = [tuple(record[field] for field in CONSULTATION_FIELDS)
+                + tuple(parse_id(record.get(field)) for field in CONSULTATION_ID_FIELDS)
+                for record in records]
+        return rows, rejects.count
+
+
+def import_shards(csv_files=(), json_files=(), max_workers=None, validate=True):
+    """
+    Importa varios archivos en paralelo y los incorpora al registro de forma determinista:
+    primero los CSV y luego los de consultas, cada grupo en el orden recibido.
+    Devuelve un diccionario con la cantidad de filas leídas y rechazadas.
+    """
+    csv_files = list(csv_files)
+    json_files = list(json_files)
+    stats = {'pet_owner_rows': 0, 'consultation_rows': 0, 'rejected': 0}
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        csv_futures = [pool.submit(parse_pet_owner_shard, name, validate) for name in csv_files]
+        json_futures = [pool.submit(parse_consultation_shard, name, validate) for name in json_files]
+
+        # Las consultas se refieren a mascotas, así que todos los CSV se incorporan antes
+        for filename, future in zip(csv_files, csv_futures):
+            rows, rejected = future.result()
+            seen = ImportMatches()  # los IDs de cada archivo se cruzan solo dentro de ese archivo
+            with functions.registry.lock.write():
+                for row in rows:
+                    functions.merge_pet_owner_row(*row, seen)
+            stats['pet_owner_rows'] += len(rows)
+            stats['rejected'] += rejected
+            logging.info("Merged %d pet/owner rows from shard %s", len(rows), filename)
+
+        missing_pets = set()
+        resolved = {}
+        for filename, future in zip(json_files, json_futures):
+            rows, rejected = future.result()
+            with functions.registry.lock.write():
+                # Los IDs en uso se toman con el candado: incluyen los de los archivos anteriores
+                claims = ConsultationIdClaims(functions.pets)
+                for row in rows:
+                    functions.merge_consultation_record(*row, missing_pets, resolved, claims)
+            stats['consultation_rows'] += len(rows)
+            stats['rejected'] += rejected
+            logging.info("Merged %d consultations from shard %s", len(rows), filename)
+    return stats
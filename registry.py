@@ -0,0 +1,414 @@
+"""
+Registro en memoria de dueños y mascotas con índices hash.
+
+Las listas `owners` y `pets` siguen siendo listas normales para el resto del
+código, pero cada inserción actualiza índices por ID y por nombre (sin
+distinguir mayúsculas/minúsculas), de modo que las búsquedas son O(1) en lugar
+de un recorrido lineal. Varios dueños o mascotas pueden llamarse igual: los
+distingue su ID, y las mascotas de un dueño se obtienen por su ID en O(k).
+
+El registro puede compartirse entre hilos: `Registry.lock` es un candado de
+lectores/escritor. Las altas, importaciones y recargas toman la escritura; las
+lecturas que recorren toda la clínica toman la lectura, y las exportaciones
+trabajan sobre una copia instantánea (`Registry.snapshot`) para no frenar las
+altas mientras escriben los archivos. Las búsquedas por nombre no toman el
+candado: leer un diccionario es atómico y los índices solo crecen por el final
+(salvo al vaciar el registro, que se hace con la escritura tomada).
+
+Quien necesite saber qué cambió (el autoguardado) se anota en
+`Registry.listeners`: recibe cada dueño o mascota agregado y un aviso cuando
+una lista se modifica de otra forma (borrado, reordenamiento, vaciado).
+
+Para los errores de tipeo hay además índices de trigramas de los nombres
+(name_index.py), que se crean la primera vez que se piden sugerencias y desde
+ahí se actualizan con cada alta.
+"""
+import threading
+from collections import namedtuple
+
+from name_index import TrigramIndex
+
+
+def fold_name(value):
+    """Normaliza un nombre para usarlo como clave de índice."""
+    return value.casefold()
+
+
+class _Guard:
+    """Context manager reutilizable que toma y suelta una de las dos modalidades del candado."""
+
+    __slots__ = ('_acquire', '_release')
+
+    def __init__(self, acquire, release):
+        self._acquire = acquire
+        self._release = release
+
+    def __enter__(self):
+        self._acquire()
+
+    def __exit__(self, *exc_info):
+        self._release()
+
+
+class RWLock:
+    """
+    Candado de lectores/escritor: muchas lecturas a la vez o una sola escritura.
+    Da prioridad a los escritores (una escritura en espera frena las lecturas nuevas) y es
+    reentrante: un hilo puede volver a leer mientras lee, o leer y escribir mientras escribe.
+    Pasar de lectura a escritura no está permitido (dos hilos que lo intenten se bloquearían).
+
+        with registry.lock.read(): ...
+        with registry.lock.write(): ...
+    """
+
+    def __init__(self):
+        # Se entra con `with self._mutex` (más barato que con la Condition); wait() la usa igual
+        self._mutex = threading.Lock()
+        self._condition = threading.Condition(self._mutex)
+        self._readers = 0
+        self._writer = None
+        self._writer_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+        self._read_guard = _Guard(self.acquire_read, self.release_read)
+        self._write_guard = _Guard(self.acquire_write, self.release_write)
+
+    def read(self):
+        return self._read_guard
+
+    def write(self):
+        return self._write_guard
+
+    def acquire_read(self):
+        if self._writer == threading.get_ident():
+            self._writer_depth += 1
+            return
+        local = self._local
+        depth = getattr(local, 'reads', 0)
+        if not depth:
+            with self._mutex:
+                while self._writer is not None or self._waiting_writers:
+                    self._condition.wait()
+                self._readers += 1
+        local.reads = depth + 1
+
+    def release_read(self):
+        if self._writer == threading.get_ident():
+            self._writer_depth -= 1
+            return
+        local = self._local
+        local.reads -= 1
+        if not local.reads:
+            with self._mutex:
+                self._readers -= 1
+                if not self._readers:
+                    self._condition.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        if self._writer == me:
+            self._writer_depth += 1
+            return
+        if getattr(self._local, 'reads', 0):
+            raise RuntimeError("Cannot take the registry write lock while holding the read lock.")
+        with self._mutex:
+            self._waiting_writers += 1
+            try:
+                while self._writer is not None or self._readers:
+                    self._condition.wait()
+            finally:
+                self._waiting_writers -= 1
+            self._writer = me
+            self._writer_depth = 1
+
+    def release_write(self):
+        with self._mutex:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._condition.notify_all()
+
+
+# Copia instantánea del registro: listas de dueños y mascotas, y en histories[i] la
+# tupla con las consultas de pets[i] (ordenadas por fecha) en el momento de la copia.
+RegistrySnapshot = namedtuple('RegistrySnapshot', ['owners', 'pets', 'histories'])
+
+
+class IndexedList(list):
+    """
+    Lista que avisa al registro cuando cambia su contenido.
+    Las inserciones al final se indexan de forma incremental; cualquier otra
+    modificación (borrado, reordenamiento, inserción intermedia) reconstruye
+    los índices para conservar el orden de aparición.
+
+    Cada elemento se indexa antes de agregarlo: si no se puede indexar (un
+    objeto que no es del tipo esperado) no queda en la lista, y los índices
+    se reconstruyen para descartar lo que llegó a indexarse de él.
+    """
+
+    def __init__(self, on_add, on_reset):
+        super().__init__()
+        self._on_add = on_add
+        self._on_reset = on_reset
+
+    def append(self, item):
+        try:
+            self._on_add(item)
+        except Exception:
+            self._on_reset()
+            raise
+        super().append(item)
+
+    def extend(self, items):
+        items = list(items)
+        for position, item in enumerate(items):
+            try:
+                self._on_add(item)
+            except Exception:
+                super().extend(items[:position])
+                self._on_reset()
+                raise
+        super().extend(items)
+
+    def __iadd__(self, items):
+        self.extend(items)
+        return self
+
+    def clear(self):
+        super().clear()
+        self._on_reset()
+
+    def _mutate_and_reset(name):
+        def method(self, *args, **kwargs):
+            result = getattr(super(IndexedList, self), name)(*args, **kwargs)
+            self._on_reset()
+            return result
+        method.__name__ = name
+        return method
+
+    insert = _mutate_and_reset('insert')
+    remove = _mutate_and_reset('remove')
+    pop = _mutate_and_reset('pop')
+    sort = _mutate_and_reset('sort')
+    reverse = _mutate_and_reset('reverse')
+    __setitem__ = _mutate_and_reset('__setitem__')
+    __delitem__ = _mutate_and_reset('__delitem__')
+    __imul__ = _mutate_and_reset('__imul__')
+    del _mutate_and_reset
+
+
+def _match(by_id, by_name, item_id, name, claimed):
+    key = fold_name(name)
+    if item_id is not None:
+        item = by_id.get(item_id)
+        if item is not None and fold_name(item.name) == key:
+            return item
+    for item in by_name.get(key, ()):
+        if item not in claimed:
+            return item
+    return None
+
+
+class ImportMatches:
+    """
+    IDs de un archivo ya resueltos durante su importación: las filas que repiten un ID se cruzan
+    con el mismo objeto aunque el registro le haya dado otro ID (por estar ocupado), y un objeto
+    ya asignado a un ID del archivo no se reutiliza por nombre para otro ID.
+    """
+    __slots__ = ('owners', 'pets', 'claimed')
+
+    def __init__(self):
+        self.owners = {}  # ID de dueño en el archivo -> Owner
+        self.pets = {}  # ID de mascota en el archivo -> Pet
+        self.claimed = set()
+
+
+class Registry:
+    """
+    Contenedor de dueños y mascotas con índices primarios por ID y por nombre e
+    índices secundarios de mascotas por dueño, especie y raza.
+    """
+
+    def __init__(self):
+        self._owners_by_id = {}
+        self._pets_by_id = {}
+        self._owners_by_name = {}
+        self._pets_by_name = {}
+        self._pets_by_owner = {}  # ID del dueño -> sus mascotas
+        self._pets_by_species = {}
+        self._pets_by_breed = {}
+        self.owners = IndexedList(self._owner_added, self._owners_reset)
+        self.pets = IndexedList(self._pet_added, self._pets_reset)
+        self.lock = RWLock()
+        # Callables notificados como listener(kind, item) con kind 'owner' o 'pet' por cada alta,
+        # y como listener(kind, None) cuando esa lista cambia de otra forma
+        self.listeners = []
+        # Índices de trigramas de los nombres; None hasta la primera búsqueda aproximada
+        self._owner_names = None
+        self._pet_names = None
+        self._names_lock = threading.Lock()
+
+    # Mantenimiento de índices
+
+    def _index_owner(self, owner):
+        # Ante un ID repetido queda el primero, igual que con los nombres
+        self._owners_by_id.setdefault(owner.id, owner)
+        self._owners_by_name.setdefault(fold_name(owner.name), []).append(owner)
+        if self._owner_names is not None:
+            self._owner_names.add(owner.name)
+
+    def _index_pet(self, pet):
+        self._pets_by_id.setdefault(pet.id, pet)
+        self._pets_by_name.setdefault(fold_name(pet.name), []).append(pet)
+        self._pets_by_owner.setdefault(pet.owner.id, []).append(pet)
+        self._pets_by_species.setdefault(fold_name(pet.species), []).append(pet)
+        self._pets_by_breed.setdefault(fold_name(pet.breed), []).append(pet)
+        if self._pet_names is not None:
+            self._pet_names.add(pet.name)
+
+    def _owner_added(self, owner):
+        self._index_owner(owner)
+        for listener in self.listeners:
+            listener('owner', owner)
+
+    def _pet_added(self, pet):
+        self._index_pet(pet)
+        for listener in self.listeners:
+            listener('pet', pet)
+
+    def _owners_reset(self):
+        self._reindex_owners()
+        for listener in self.listeners:
+            listener('owner', None)
+
+    def _pets_reset(self):
+        self._reindex_pets()
+        for listener in self.listeners:
+            listener('pet', None)
+
+    def _reindex_owners(self):
+        self._owners_by_id.clear()
+        self._owners_by_name.clear()
+        self._owner_names = None
+        for owner in self.owners:
+            self._index_owner(owner)
+
+    def _reindex_pets(self):
+        self._pets_by_id.clear()
+        self._pets_by_name.clear()
+        self._pets_by_owner.clear()
+        self._pets_by_species.clear()
+        self._pets_by_breed.clear()
+        self._pet_names = None
+        for pet in self.pets:
+            self._index_pet(pet)
+
+    # Consultas
+
+    def find_owner(self, name):
+        """Devuelve el primer dueño registrado con ese nombre, o None."""
+        matches = self._owners_by_name.get(fold_name(name))
+        return matches[0] if matches else None
+
+    def find_pet(self, name):
+        """Devuelve la primera mascota registrada con ese nombre, o None."""
+        matches = self._pets_by_name.get(fold_name(name))
+        return matches[0] if matches else None
+
+    def find_owners(self, name):
+        """Todos los dueños registrados con ese nombre, en orden de registro."""
+        return list(self._owners_by_name.get(fold_name(name), ()))
+
+    def find_pets(self, name):
+        """Todas las mascotas registradas con ese nombre, en orden de registro."""
+        return list(self._pets_by_name.get(fold_name(name), ()))
+
+    def owner_by_id(self, owner_id):
+        """Dueño con ese ID, o None."""
+        return self._owners_by_id.get(owner_id)
+
+    def pet_by_id(self, pet_id):
+        """Mascota con ese ID, o None."""
+        return self._pets_by_id.get(pet_id)
+
+    def pets_of(self, owner):
+        """Mascotas del dueño, en O(k) para k mascotas."""
+        return list(self._pets_by_owner.get(owner.id, ()))
+
+    def pets_by_owner(self, owner_name):
+        """Mascotas de los dueños que tienen el nombre indicado."""
+        return [pet for owner in self._owners_by_name.get(fold_name(owner_name), ())
+                for pet in self._pets_by_owner.get(owner.id, ())]
+
+    # Correspondencia de registros importados (con ID o, en archivos anteriores, solo por nombre)
+
+    def match_owner(self, owner_id, name, claimed=()):
+        """
+        Dueño ya registrado que corresponde a un registro importado: el que tiene ese ID y el mismo
+        nombre o, si no hay (archivos sin IDs o de otra instalación), el primero con ese nombre que
+        no esté en claimed (los ya asignados a otro ID del mismo archivo). None si es un dueño nuevo.
+        """
+        return _match(self._owners_by_id, self._owners_by_name, owner_id, name, claimed)
+
+    def match_pet(self, pet_id, name, claimed=()):
+        """Como match_owner, para mascotas."""
+        return _match(self._pets_by_id, self._pets_by_name, pet_id, name, claimed)
+
+    def unused_owner_id(self, owner_id):
+        """owner_id si ningún dueño lo usa; si no, None (el dueño nuevo recibe otro ID)."""
+        return owner_id if owner_id not in self._owners_by_id else None
+
+    def unused_pet_id(self, pet_id):
+        """pet_id si ninguna mascota lo usa; si no, None (la mascota nueva recibe otro ID)."""
+        return pet_id if pet_id not in self._pets_by_id else None
+
+    def pets_by_species(self, species):
+        """Mascotas de la especie indicada."""
+        return list(self._pets_by_species.get(fold_name(species), ()))
+
+    def pets_by_breed(self, breed):
+        """Mascotas de la raza indicada."""
+        return list(self._pets_by_breed.get(fold_name(breed), ()))
+
+    def _names_index(self, attribute, items):
+        """Índice de trigramas de los nombres de items, creándolo la primera vez que se usa."""
+        index = getattr(self, attribute)
+        if index is None:
+            # Con la lectura tomada ninguna alta se pierde mientras se crea el índice
+            with self.lock.read(), self._names_lock:
+                index = getattr(self, attribute)
+                if index is None:
+                    index = TrigramIndex()
+                    for item in items:
+                        index.add(item.name)
+                    setattr(self, attribute, index)
+        return index
+
+    def similar_owners(self, name, limit=5):
+        """Dueños con nombres parecidos (errores de tipeo), del más al menos parecido."""
+        index = self._names_index('_owner_names', self.owners)
+        return [self.find_owner(label) for label, _ in index.similar(name, limit)]
+
+    def similar_pets(self, name, limit=5):
+        """Mascotas con nombres parecidos (errores de tipeo), de la más a la menos parecida."""
+        index = self._names_index('_pet_names', self.pets)
+        return [self.find_pet(label) for label, _ in index.similar(name, limit)]
+
+    def breed_counts(self):
+        """{raza: cantidad de mascotas}, con la raza escrita como en la primera mascota registrada."""
+        return {pets[0].breed: len(pets) for pets in self._pets_by_breed.values() if pets}
+
+    def snapshot(self):
+        """
+        Copia instantánea y coherente de dueños, mascotas e historiales (RegistrySnapshot).
+        Solo se copian referencias, con la lectura tomada; los objetos no cambian después de
+        creados, así que la copia puede recorrerse sin candado mientras siguen las altas.
+        Los historiales pendientes de carga se cargan al copiarlos.
+        """
+        with self.lock.read():
+            pets = list(self.pets)
+            return RegistrySnapshot(list(self.owners), pets, [tuple(pet.consultations) for pet in pets])
+
+
+# Registro compartido por la aplicación
+default_registry = Registry()
@@ -0,0 +1,127 @@
+"""
+Índice invertido de texto sobre el motivo y el diagnóstico de las consultas.
+
+El texto se normaliza sin tildes y sin distinguir mayúsculas ("Otitis",
+"otítis" y "OTITIS" son el mismo término) y se divide en palabras. Cada
+palabra apunta a las consultas que la contienen, de modo que una búsqueda
+solo toca las consultas que coinciden.
+"""
+import functools
+import re
+import unicodedata
+from bisect import bisect_left, insort
+
+import classes
+
+FIELDS = ('reason', 'diagnosis')
+
+# Palabras demasiado comunes para aportar a una búsqueda
+STOPWORDS = frozenset({
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'los', 'no', 'o',
+    'para', 'por', 'se', 'sin', 'su', 'un', 'una', 'y',
+})
+
+_WORD = re.compile(r"\w+")
+
+
+def normalize_text(value):
+    """Quita tildes y diacríticos y pasa el texto a minúsculas."""
+    if value.isascii():
+        return value.lower()
+    decomposed = unicodedata.normalize('NFKD', value)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def tokenize(value):
+    """Palabras normalizadas del texto, sin palabras vacías."""
+    return [word for word in _WORD.findall(normalize_text(value)) if word not in STOPWORDS]
+
+
+@functools.lru_cache(maxsize=65536)
+def _distinct_tokens(value):
+    # Motivos y diagnósticos se repiten mucho: se tokeniza cada texto distinto una sola vez
+    return frozenset(tokenize(value))
+
+
+class ConsultationSearchIndex:
+    """Índice invertido palabra -> consultas, separado por campo."""
+
+    def __init__(self):
+        self._reset()
+
+    def _reset(self):
+        self._postings = {field: {} for field in FIELDS}
+        self._vocabulary = {field: [] for field in FIELDS}  # palabras ordenadas, para prefijos
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, pet, consultation):
+        """Indexa el motivo y el diagnóstico de la consulta."""
+        for field in FIELDS:
+            postings = self._postings[field]
+            for token in _distinct_tokens(getattr(consultation, field)):
+                matches = postings.get(token)
+                if matches is None:
+                    matches = postings[token] = []
+                    insort(self._vocabulary[field], token)
+                matches.append(consultation)
+        self._size += 1
+
+    def rebuild(self, pets):
+        """Reconstruye el índice en una sola pasada sobre las mascotas."""
+        self._reset()
+        for pet in pets:
+            for consultation in pet.consultations:
+                self.add(pet, consultation)
+
+    def attach(self):
+        """Empieza a recibir cada consulta agregada con Pet.add_consultation."""
+        if self.add not in classes.consultation_listeners:
+            classes.consultation_listeners.append(self.add)
+
+    def detach(self):
+        if self.add in classes.consultation_listeners:
+            classes.consultation_listeners.remove(self.add)
+
+    def _matches(self, field, token, prefix):
+        """Consultas cuyo campo contiene la palabra (o una palabra que empieza por ella)."""
+        postings = self._postings[field]
+        if not prefix:
+            return postings.get(token, ())
+        vocabulary = self._vocabulary[field]
+        matches = []
+        for position in range(bisect_left(vocabulary, token), len(vocabulary)):
+            word = vocabulary[position]
+            if not word.startswith(token):
+                break
+            matches.extend(postings[word])
+        return matches
+
+    def search(self, query, field=None, prefix=True):
+        """
+        Consultas que contienen todas las palabras de la búsqueda, de la más nueva a la más antigua.
+        field puede ser 'reason', 'diagnosis' o None (cualquiera de los dos).
+        Con prefix=True, "vacun" encuentra "vacuna" y "vacunación".
+        """
+        if field is not None and field not in FIELDS:
+            raise ValueError(f"Field must be one of: {', '.join(FIELDS)}.")
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        fields = (field,) if field else FIELDS
+        candidates = []
+        for token in tokens:
+            found = {}
+            for name in fields:
+                for consultation in self._matches(name, token, prefix):
+                    found[id(consultation)] = consultation
+            candidates.append(found)
+        candidates.sort(key=len)
+        result = candidates[0]
+        for other in candidates[1:]:
+            result = {key: value for key, value in result.items() if key in other}
+            if not result:
+                break
+        return sorted(result.values(), key=lambda c: c.day, reverse=True)
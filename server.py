@@ -0,0 +1,272 @@
+"""
+Modo servidor: varias recepciones comparten el mismo registro en vivo.
+
+Un servidor asyncio atiende conexiones TCP locales (o un socket Unix) con un
+protocolo de líneas. Cada pedido es una línea con un comando y, si hace
+falta, un objeto JSON con sus argumentos:
+
+    FIND_PET {"name": "Toby"}
+    HISTORY {"id": 12, "offset": 0, "limit": 10}
+    REGISTER_CONSULTATION {"pet_name": "Toby", "date": "10/05/2024", "reason": "...", "diagnosis": "..."}
+
+y cada respuesta es una línea JSON: {"ok": true, "result": ...} o
+{"ok": false, "error": "..."}.
+
+Varios dueños o mascotas pueden llamarse igual: FIND_OWNER y FIND_PET
+devuelven la lista de todos los que tienen ese nombre (o la del ID indicado
+con "id"), y HISTORY acepta "id" para elegir una mascota; con "name" usa la
+primera registrada. Con el ID de un dueño, REGISTER_PET acepta "owner_id".
+
+Las lecturas se atienden directamente en el event loop, sin esperar unas a
+otras. Las altas pasan por services.py de a una por vez con un asyncio.Lock.
+SAVE guarda en un hilo aparte desde una copia instantánea del registro
+(Registry.snapshot), así que lecturas y altas siguen atendiéndose mientras se
+escriben los archivos; solo un SAVE corre a la vez.
+
+Uso:
+    python server.py [--host 127.0.0.1] [--port 8765] [--unix /ruta/al/socket]
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+import functions
+import services
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+# Máximo de elementos devueltos por LIST o HISTORY en una sola respuesta
+MAX_PAGE_SIZE = 200
+# Largo máximo de una línea de pedido (bytes)
+MAX_LINE = 1024 * 1024
+
+
+class ProtocolError(ValueError):
+    """Pedido mal formado o comando desconocido."""
+
+
+def owner_data(owner):
+    return {'id': owner.id, 'name': owner.name, 'phone': owner.phone, 'address': owner.address}
+
+
+def pet_data(pet):
+    return {'id': pet.id, 'name': pet.name, 'species': pet.species, 'breed': pet.breed, 'age': pet.age,
+            'owner': owner_data(pet.owner)}
+
+
+def consultation_data(consultation):
+    return {'id': consultation.id, 'date': consultation.date, 'reason': consultation.reason, 'diagnosis': consultation.diagnosis}
+
+
+def parse_request(line):
+    """Divide una línea en (comando en mayúsculas, argumentos)."""
+    command, _, payload = line.strip().partition(' ')
+    if not command:
+        raise ProtocolError("Empty request.")
+    args = {}
+    if payload.strip():
+        try:
+            args = json.loads(payload)
+        except json.JSONDecodeError as e:
+            raise ProtocolError(f"Arguments must be a JSON object: {e}")
+        if not isinstance(args, dict):
+            raise ProtocolError("Arguments must be a JSON object.")
+    return command.upper(), args
+
+
+def _page(args, default_limit):
+    offset, limit = args.get('offset', 0), args.get('limit', default_limit)
+    if not isinstance(offset, int) or not isinstance(limit, int) or offset < 0 or limit < 1:
+        raise ProtocolError("offset and limit must be non-negative integers (limit at least 1).")
+    return offset, min(limit, MAX_PAGE_SIZE)
+
+
+def _name(args):
+    name = args.get('name')
+    if not isinstance(name, str) or not name.strip():
+        raise ProtocolError("A 'name' argument is required.")
+    return name.strip()
+
+
+def _id(args):
+    """El argumento 'id' (entero) o None si no se indicó."""
+    item_id = args.get('id')
+    if item_id is not None and (not isinstance(item_id, int) or isinstance(item_id, bool)):
+        raise ProtocolError("'id' must be an integer.")
+    return item_id
+
+
+def _batch_result(result):
+    return {'added': len(result.added),
+            'errors': [[position, str(error)] for position, error in result.errors]}
+
+
+def _records(args):
+    """Un alta puede traer un registro (los argumentos) o varios en 'records'."""
+    records = args.get('records', [args])
+    if not isinstance(records, list):
+        raise ProtocolError("'records' must be a list.")
+    return records
+
+
+class ClinicServer:
+    """Atiende los comandos del protocolo sobre el registro de functions.py."""
+
+    def __init__(self, registry=None):
+        self.registry = registry or functions.registry
+        self.clients = 0
+        self._write_lock = asyncio.Lock()
+        self._save_lock = asyncio.Lock()
+        self._server = None
+        self._reads = {
+            'PING': lambda args: 'pong',
+            'FIND_OWNER': self._find_owner,
+            'FIND_PET': self._find_pet,
+            'HISTORY': self._history,
+            'LIST': self._list,
+        }
+        self._writes = {
+            'REGISTER_OWNER': lambda args: _batch_result(services.add_owners(_records(args), self.registry)),
+            'REGISTER_PET': lambda args: _batch_result(services.add_pets(_records(args), self.registry)),
+            'REGISTER_CONSULTATION': lambda args: _batch_result(
+                services.add_consultations(_records(args), self.registry)),
+        }
+
+    def _find_owner(self, args):
+        owner_id = _id(args)
+        if owner_id is None:
+            return [owner_data(owner) for owner in self.registry.find_owners(_name(args))]
+        owner = self.registry.owner_by_id(owner_id)
+        return [owner_data(owner)] if owner else []
+
+    def _find_pet(self, args):
+        pet_id = _id(args)
+        if pet_id is None:
+            return [pet_data(pet) for pet in self.registry.find_pets(_name(args))]
+        pet = self.registry.pet_by_id(pet_id)
+        return [pet_data(pet)] if pet else []
+
+    def _history(self, args):
+        pet_id = _id(args)
+        pet = self.registry.find_pet(_name(args)) if pet_id is None else self.registry.pet_by_id(pet_id)
+        if pet is None:
+            return None
+        offset, limit = _page(args, functions.HISTORY_PAGE_SIZE)
+        return {'pet': pet_data(pet), 'total': len(pet.consultations),
+                'consultations': [consultation_data(c) for c in pet.recent_consultations(limit, offset)]}
+
+    def _list(self, args):
+        offset, limit = _page(args, functions.LIST_PAGE_SIZE)
+        pets = self.registry.pets
+        return {'total': len(pets), 'pets': [pet_data(pet) for pet in pets[offset:offset + limit]]}
+
+    async def _save(self):
+        loop = asyncio.get_running_loop()
+        async with self._save_lock:
+            return await loop.run_in_executor(None, functions.checkpoint)
+
+    async def execute(self, command, args):
+        """Ejecuta un comando y devuelve su resultado (lanza ProtocolError si no existe)."""
+        if command in self._reads:
+            return self._reads[command](args)
+        if command in self._writes:
+            async with self._write_lock:
+                return self._writes[command](args)
+        if command == 'SAVE':
+            return await self._save()
+        raise ProtocolError(f"Unknown command: {command}")
+
+    async def handle_client(self, reader, writer):
+        """Atiende una conexión: un pedido por línea hasta QUIT o hasta que el cliente se desconecta."""
+        self.clients += 1
+        peer = writer.get_extra_info('peername') or 'local socket'
+        logging.info("Client connected: %s (%d connected)", peer, self.clients)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # línea más larga que MAX_LINE
+                    await self._reply(writer, {'ok': False, 'error': "Request line too long."})
+                    break
+                if not line:
+                    break
+                try:
+                    command, args = parse_request(line.decode('utf-8'))
+                    if command == 'QUIT':
+                        await self._reply(writer, {'ok': True, 'result': 'bye'})
+                        break
+                    response = {'ok': True, 'result': await self.execute(command, args)}
+                except (ProtocolError, UnicodeDecodeError) as e:
+                    response = {'ok': False, 'error': str(e)}
+                except Exception as e:
+                    logging.error("Error handling %s from %s: %s", line[:80], peer, e)
+                    response = {'ok': False, 'error': f"Internal error: {e}"}
+                await self._reply(writer, response)
+        except ConnectionError:
+            pass
+        finally:
+            self.clients -= 1
+            logging.info("Client disconnected: %s", peer)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _reply(self, writer, response):
+        writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+        await writer.drain()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        """Empieza a escuchar; devuelve el asyncio.Server (port=0 elige un puerto libre)."""
+        if unix_path:
+            self._server = await asyncio.start_unix_server(self.handle_client, unix_path, limit=MAX_LINE)
+        else:
+            self._server = await asyncio.start_server(self.handle_client, host, port, limit=MAX_LINE)
+        logging.info("Server listening on %s", unix_path or self.address)
+        return self._server
+
+    @property
+    def address(self):
+        """(host, puerto) en el que escucha el servidor TCP."""
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+    server = ClinicServer()
+    async with await server.start(host, port, unix_path) as listener:
+        print(f"Serving on {unix_path or server.address}. Press Ctrl+C to stop.")
+        await listener.serve_forever()
+
+
+def main():
+    import main as app
+    parser = argparse.ArgumentParser(description="Share the clinic registry with several front desks.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="listen on this Unix socket instead of TCP")
+    args = parser.parse_args()
+
+    logging.info("Server mode started.")
+    app.start_up()
+    # Un servidor de larga duración carga de entrada los historiales pendientes
+    functions.ensure_histories_loaded()
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        app.shut_down()
+        logging.info("Server mode stopped.")
+        print("Server stopped; data saved.")
+
+
+if __name__ == "__main__":
+    main()
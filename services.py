@@ -0,0 +1,200 @@
+"""
+API de registro por lotes, independiente de input().
+
+add_owners, add_pets y add_consultations reciben iterables de registros
+(diccionarios), los validan con las mismas reglas que el registro
+interactivo, aplican de una sola vez los que son válidos y devuelven los
+errores de cada registro rechazado.
+
+Cada lote se valida y se aplica con el candado de escritura del registro
+tomado, así que varios hilos pueden registrar a la vez: los lotes se aplican
+de a uno y los listeners (el diario) los reciben en el mismo orden.
+"""
+import logging
+from collections import namedtuple
+
+from classes import Owner, Pet, Consultation
+from registry import default_registry
+from validation import is_valid_name, is_valid_reason_or_diagnosis, is_valid_date, is_valid_phone
+
+# Resultado de un lote: objetos agregados y lista de (posición del registro, excepción).
+# Las excepciones son ValueError (dato inválido) o LookupError (dueño o mascota inexistente).
+BatchResult = namedtuple('BatchResult', ['added', 'errors'])
+
+# Callables notificados como listener(record) por cada alta aplicada, con
+# record = {'op': 'owner' | 'pet' | 'consultation', ...campos}. El diario de cambios se registra aquí.
+change_listeners = []
+
+
+def _notify(record):
+    for listener in change_listeners:
+        listener(record)
+
+
+def _text(record, key):
+    value = record.get(key)
+    return value.strip() if isinstance(value, str) else value
+
+
+def _check_owner(record):
+    """Valida un registro de dueño y devuelve (nombre, teléfono, dirección)."""
+    name = _text(record, 'name')
+    if not is_valid_name(name):
+        logging.warning("Nombre de dueño inválido ingresado: '%s'", name)
+        raise ValueError("Owner's name must contain letters and cannot be only numbers.")
+    phone = _text(record, 'phone')
+    if not is_valid_phone(phone):
+        logging.warning("Teléfono inválido ingresado: '%s'", phone)
+        raise ValueError("Phone must be a non-empty number.")
+    address = _text(record, 'address')
+    if not address:
+        logging.warning("Dirección vacía ingresada.")
+        raise ValueError("Address cannot be empty.")
+    return name, phone, address
+
+
+def _check_pet(record, registry):
+    """Valida un registro de mascota y devuelve (nombre, especie, raza, edad, dueño)."""
+    name = _text(record, 'name')
+    if not is_valid_name(name):
+        logging.warning("Nombre de mascota inválido ingresado: '%s'", name)
+        raise ValueError("Pet's name must contain letters and cannot be only numbers.")
+    species = _text(record, 'species')
+    if not is_valid_name(species):
+        logging.warning("Especie inválida ingresada: '%s'", species)
+        raise ValueError("Species must contain letters and cannot be only numbers.")
+    breed = _text(record, 'breed')
+    if not is_valid_name(breed):
+        logging.warning("Raza inválida ingresada: '%s'", breed)
+        raise ValueError("Breed must contain letters and cannot be only numbers.")
+    age = _text(record, 'age')
+    if isinstance(age, str):
+        if not age.isdigit():
+            logging.warning("Edad inválida ingresada: '%s'", age)
+            raise ValueError("Age must be a non-negative integer.")
+        age = int(age)
+    if not isinstance(age, int) or isinstance(age, bool) or age < 0:
+        logging.warning("Edad inválida ingresada: '%s'", age)
+        raise ValueError("Age must be a non-negative integer.")
+    # Se puede indicar el dueño directamente (record['owner']), por ID (record['owner_id']) o por nombre
+    owner = record.get('owner')
+    if owner is not None and not isinstance(owner, Owner):
+        logging.warning("Dueño inválido ingresado: '%s'", owner)
+        raise ValueError("'owner' must be an Owner object (use 'owner_id' or 'owner_name' otherwise).")
+    if owner is None and record.get('owner_id') is not None:
+        owner = registry.owner_by_id(record['owner_id'])
+        if owner is None:
+            raise LookupError(f"Owner not found: #{record['owner_id']}")
+    if owner is None:
+        owner_name = _text(record, 'owner_name')
+        if not is_valid_name(owner_name):
+            logging.warning("Nombre de dueño inválido ingresado: '%s'", owner_name)
+            raise ValueError("Owner's name must contain letters and cannot be only numbers.")
+        owner = registry.find_owner(owner_name)
+        if owner is None:
+            raise LookupError(f"Owner not found: {owner_name}")
+    return name, species, breed, age, owner
+
+
+def _check_consultation(record, registry):
+    """Valida un registro de consulta y devuelve (mascota, fecha, motivo, diagnóstico)."""
+    pet = record.get('pet')
+    if pet is not None and not isinstance(pet, Pet):
+        logging.warning("Mascota inválida ingresada para consulta: '%s'", pet)
+        raise ValueError("'pet' must be a Pet object (use 'pet_id' or 'pet_name' otherwise).")
+    if pet is None and record.get('pet_id') is not None:
+        pet = registry.pet_by_id(record['pet_id'])
+        if pet is None:
+            raise LookupError(f"Pet not found: #{record['pet_id']}")
+    if pet is None:
+        pet_name = _text(record, 'pet_name')
+        if not is_valid_name(pet_name):
+            logging.warning("Nombre de mascota inválido ingresado para consulta: '%s'", pet_name)
+            raise ValueError("Pet's name must contain letters and cannot be only numbers.")
+        pet = registry.find_pet(pet_name)
+        if pet is None:
+            raise LookupError(f"Pet not found: {pet_name}")
+    date = _text(record, 'date')
+    if not is_valid_date(date):
+        logging.warning("Fecha inválida ingresada: '%s'", date)
+        raise ValueError("Date must not be only numbers, cannot be empty and should contain digits and separators (e.g. 10/05/2024).")
+    reason = _text(record, 'reason')
+    if not is_valid_reason_or_diagnosis(reason):
+        logging.warning("Motivo inválido ingresado: '%s'", reason)
+        raise ValueError("Reason must contain letters and cannot be only numbers.")
+    diagnosis = _text(record, 'diagnosis')
+    if not is_valid_reason_or_diagnosis(diagnosis):
+        logging.warning("Diagnóstico inválido ingresado: '%s'", diagnosis)
+        raise ValueError("Diagnosis must contain letters and cannot be only numbers.")
+    return pet, date, reason, diagnosis
+
+
+def _validate(records, check):
+    """Valida todo el lote antes de aplicar nada. Devuelve (valores válidos, errores)."""
+    valid = []
+    errors = []
+    for position, record in enumerate(records):
+        try:
+            valid.append(check(record))
+        except (ValueError, LookupError) as error:
+            errors.append((position, error))
+        except (AttributeError, TypeError) as error:
+            errors.append((position, ValueError(f"Malformed record: {error}")))
+    return valid, errors
+
+
+def owner_record(owner):
+    """Registro de alta de un dueño, tal como se anota en el diario."""
+    return {'op': 'owner', 'id': owner.id, 'name': owner.name, 'phone': owner.phone, 'address': owner.address}
+
+
+def add_owners(records, registry=default_registry):
+    """Registra un lote de dueños. Cada registro: {'name', 'phone', 'address'}."""
+    with registry.lock.write():
+        valid, errors = _validate(records, _check_owner)
+        added = [Owner(name, phone, address) for name, phone, address in valid]
+        registry.owners.extend(added)
+        for owner in added:
+            _notify(owner_record(owner))
+    logging.info("Batch owner registration: %d added, %d rejected", len(added), len(errors))
+    return BatchResult(added, errors)
+
+
+def add_pets(records, registry=default_registry):
+    """
+    Registra un lote de mascotas.
+    Cada registro: {'name', 'species', 'breed', 'age', 'owner_name'}, con 'owner_id' en lugar de
+    'owner_name' (distingue dueños con el mismo nombre) o 'owner' con el objeto Owner.
+    """
+    with registry.lock.write():
+        valid, errors = _validate(records, lambda record: _check_pet(record, registry))
+        added = [Pet(name, species, breed, age, owner) for name, species, breed, age, owner in valid]
+        registry.pets.extend(added)
+        for pet in added:
+            _notify({
+                'op': 'pet', 'id': pet.id, 'name': pet.name, 'species': pet.species, 'breed': pet.breed,
+                'age': pet.age, 'owner_id': pet.owner.id, 'owner_name': pet.owner.name
+            })
+    logging.info("Batch pet registration: %d added, %d rejected", len(added), len(errors))
+    return BatchResult(added, errors)
+
+
+def add_consultations(records, registry=default_registry):
+    """
+    Registra un lote de consultas.
+    Cada registro: {'pet_name', 'date', 'reason', 'diagnosis'}, con 'pet_id' en lugar de 'pet_name'
+    (distingue mascotas con el mismo nombre) o 'pet' con el objeto Pet.
+    """
+    with registry.lock.write():
+        valid, errors = _validate(records, lambda record: _check_consultation(record, registry))
+        added = []
+        for pet, date, reason, diagnosis in valid:
+            consultation = Consultation(date, reason, diagnosis, pet)
+            pet.add_consultation(consultation)
+            added.append(consultation)
+            _notify({
+                'op': 'consultation', 'id': consultation.id, 'pet_id': pet.id, 'pet_name': pet.name, 'date': date,
+                'reason': reason, 'diagnosis': diagnosis
+            })
+    logging.info("Batch consultation registration: %d added, %d rejected", len(added), len(errors))
+    return BatchResult(added, errors)
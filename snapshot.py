@@ -0,0 +1,268 @@
+"""
+Snapshot binario de la clínica para arrancar rápido.
+
+El archivo tiene registros de ancho fijo y una tabla de cadenas, así que se
+abre con mmap y se lee sin interpretar texto:
+
+    cabecera   magic, versión, cantidades, posición de cada sección y el mayor ID de consulta
+    cadenas    tabla de posiciones (n + 1 enteros) y los textos en UTF-8, sin repetir
+    dueños     (ID, nombre, teléfono, dirección) con los textos como índices de la tabla de cadenas
+    mascotas   (ID, nombre, especie, raza, edad, dueño, primera consulta, cantidad de consultas)
+    consultas  (ID, fecha, motivo, diagnóstico, día) agrupadas por mascota y ordenadas por fecha
+
+Al cargar se crean los dueños y las mascotas; las consultas de cada mascota
+quedan en el archivo y se convierten en objetos Consultation recién cuando
+se accede a su historial (Pet carga su historial pendiente bajo demanda).
+Todos los enteros se guardan en little-endian; los IDs ocupan 64 bits. Los
+snapshots anteriores se siguen pudiendo leer: los de la versión 2 (IDs de
+32 bits) y los de la versión 1 (sin IDs), cuyos registros se identifican por
+nombre.
+"""
+import logging
+import mmap
+import os
+import struct
+
+from classes import Owner, Pet, Consultation, consultation_ids, consultation_id_floor, keep_id
+from compression import temporary_file
+from registry import fold_name
+
+MAGIC = b'VETSNAP\x00'
+VERSION = 3
+
+# magic, versión, cadenas, dueños, mascotas, consultas, la posición de cada sección y el mayor ID de consulta
+HEADER = struct.Struct('<8sIIIII5QQ')
+STRING_OFFSET = struct.Struct('<I')
+OWNER = struct.Struct('<QIII')
+PET = struct.Struct('<QIIIiIII')
+CONSULTATION = struct.Struct('<QIIIi')
+
+# Versión 2: la misma cabecera, con IDs de 32 bits
+OWNER_V2 = struct.Struct('<IIII')
+PET_V2 = struct.Struct('<IIIIiIII')
+CONSULTATION_V2 = struct.Struct('<IIIIi')
+
+# Versión 1: los mismos registros sin IDs
+HEADER_V1 = struct.Struct('<8sIIIII5Q')
+OWNER_V1 = struct.Struct('<III')
+PET_V1 = struct.Struct('<IIIiIII')
+CONSULTATION_V1 = struct.Struct('<IIIi')
+
+
+class SnapshotError(ValueError):
+    """El archivo no es un snapshot válido o es de una versión desconocida."""
+
+
+class _StringTable:
+    """Asigna un índice a cada texto distinto al escribir el snapshot."""
+
+    def __init__(self):
+        self.ids = {}
+        self.values = []
+
+    def id(self, value):
+        value = str(value)
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return string_id
+
+    def pack(self):
+        """Devuelve (tabla de posiciones, textos) listos para escribir."""
+        blobs = [value.encode('utf-8') for value in self.values]
+        offsets = bytearray()
+        position = 0
+        for blob in blobs:
+            offsets += STRING_OFFSET.pack(position)
+            position += len(blob)
+        offsets += STRING_OFFSET.pack(position)
+        return bytes(offsets), b''.join(blobs)
+
+
+def write_snapshot(path, owners, pets, histories=None):
+    """
+    Escribe dueños, mascotas y consultas en `path` de forma atómica (archivo temporal y rename).
+    histories[i] son las consultas de pets[i] (por defecto, pet.consultations).
+    Devuelve la cantidad de consultas escritas.
+    """
+    if histories is None:
+        histories = [pet.consultations for pet in pets]
+    strings = _StringTable()
+    owner_index = {}
+    owner_rows = []
+
+    def add_owner(owner):
+        owner_index[id(owner)] = len(owner_rows)
+        owner_rows.append(OWNER.pack(owner.id, strings.id(owner.name), strings.id(owner.phone),
+                                     strings.id(owner.address)))
+
+    for owner in owners:
+        add_owner(owner)
+    pet_rows = []
+    consultation_rows = []
+    last_consultation_id = 0
+    for pet, history in zip(pets, histories):
+        if id(pet.owner) not in owner_index:
+            add_owner(pet.owner)
+        pet_rows.append(PET.pack(
+            pet.id, strings.id(pet.name), strings.id(pet.species), strings.id(pet.breed), int(pet.age),
+            owner_index[id(pet.owner)], len(consultation_rows), len(history)
+        ))
+        for consultation in history:
+            consultation_id = consultation.id
+            last_consultation_id = max(last_consultation_id, consultation_id)
+            consultation_rows.append(CONSULTATION.pack(
+                consultation_id, strings.id(consultation.date), strings.id(consultation.reason),
+                strings.id(consultation.diagnosis), consultation.day
+            ))
+
+    string_offsets, string_data = strings.pack()
+    sections = [string_offsets, string_data, b''.join(owner_rows), b''.join(pet_rows), b''.join(consultation_rows)]
+    positions = []
+    position = HEADER.size
+    for section in sections:
+        positions.append(position)
+        position += len(section)
+    header = HEADER.pack(MAGIC, VERSION, len(strings.values), len(owner_rows), len(pet_rows),
+                         len(consultation_rows), *positions, last_consultation_id)
+
+    f, temporary = temporary_file(path)
+    with f:
+        try:
+            f.write(header)
+            for section in sections:
+                f.write(section)
+            f.flush()
+            os.fsync(f.fileno())
+        except BaseException:
+            f.close()
+            os.remove(temporary)
+            raise
+    os.replace(temporary, path)
+    return len(consultation_rows)
+
+
+class SnapshotReader:
+    """Snapshot abierto con mmap. Debe seguir abierto mientras queden historiales sin cargar."""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"Empty snapshot file: {path}")
+        if len(self._map) < HEADER_V1.size:
+            self.close()
+            raise SnapshotError(f"Truncated snapshot file: {path}")
+        magic, self.version = struct.unpack_from('<8sI', self._map, 0)
+        if magic != MAGIC or self.version not in (1, 2, VERSION):
+            self.close()
+            raise SnapshotError(f"Not a version {VERSION} clinic snapshot: {path}")
+        if self.version == 1:
+            self._owner_row, self._pet_row, self._consultation_row = OWNER_V1, PET_V1, CONSULTATION_V1
+            header = HEADER_V1.unpack_from(self._map, 0) + (0,)
+        elif len(self._map) < HEADER.size:
+            self.close()
+            raise SnapshotError(f"Truncated snapshot file: {path}")
+        elif self.version == 2:
+            self._owner_row, self._pet_row, self._consultation_row = OWNER_V2, PET_V2, CONSULTATION_V2
+            header = HEADER.unpack_from(self._map, 0)
+        else:
+            self._owner_row, self._pet_row, self._consultation_row = OWNER, PET, CONSULTATION
+            header = HEADER.unpack_from(self._map, 0)
+        (_, _, self.string_count, self.owner_count, self.pet_count, self.consultation_count,
+         self._string_offsets, self._string_data, self._owners, self._pets, self._consultations,
+         self.last_consultation_id) = header
+        self._strings = [None] * self.string_count
+        self.pending = 0  # mascotas con el historial todavía en el archivo
+        self._id_floor = 0  # los IDs de consulta hasta este ya podían estar en uso al cargar
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    @property
+    def closed(self):
+        return self._map is None
+
+    def string(self, string_id):
+        """Texto de la tabla de cadenas (se decodifica una sola vez)."""
+        value = self._strings[string_id]
+        if value is None:
+            start, = STRING_OFFSET.unpack_from(self._map, self._string_offsets + string_id * STRING_OFFSET.size)
+            end, = STRING_OFFSET.unpack_from(self._map, self._string_offsets + (string_id + 1) * STRING_OFFSET.size)
+            value = self._strings[string_id] = self._map[self._string_data + start:self._string_data + end].decode('utf-8')
+        return value
+
+    def _rows(self, record, position, count):
+        return record.iter_unpack(self._map[position:position + count * record.size])
+
+    def _read_history(self, pet, pet_number):
+        pet_row, consultation_row = self._pet_row, self._consultation_row
+        *_, first, count = pet_row.unpack_from(self._map, self._pets + pet_number * pet_row.size)
+        rows = self._rows(consultation_row, self._consultations + first * consultation_row.size, count)
+        string = self.string
+        if self.version == 1:
+            return [Consultation(string(date), string(reason), string(diagnosis), pet)
+                    for date, reason, diagnosis, _ in rows]
+        floor = self._id_floor
+        return [Consultation(string(date), string(reason), string(diagnosis), pet, keep_id(consultation_id, floor))
+                for consultation_id, date, reason, diagnosis, _ in rows]
+
+    def load_consultations(self, pet, pet_number):
+        """Materializa el historial pendiente de la mascota número `pet_number` (ordenado por fecha)."""
+        self.pending -= 1
+        return self._read_history(pet, pet_number)
+
+    def load(self, registry):
+        """
+        Agrega al registro los dueños y mascotas del snapshot, con las mismas reglas de duplicados
+        que la importación CSV (por ID y nombre; por nombre en la versión 1). Las mascotas nuevas quedan con su historial pendiente de carga; las
+        que ya estaban en memoria reciben enseguida las consultas que les falten.
+        Devuelve la cantidad de mascotas con historial pendiente.
+        """
+        string = self.string
+        with_ids = self.version > 1
+        # Las consultas pendientes ya tienen ID: las nuevas deben recibir uno mayor
+        self._id_floor = consultation_id_floor(registry.pets)
+        consultation_ids.reserve(self.last_consultation_id)
+        owners = []
+        new_owners = {}
+        for row in self._rows(self._owner_row, self._owners, self.owner_count):
+            owner_id, name, phone, address = row if with_ids else (None, *row)
+            owner_name = string(name)
+            key = owner_id if with_ids else fold_name(owner_name)
+            owner = registry.match_owner(owner_id, owner_name) or new_owners.get(key)
+            if owner is None:
+                owner = new_owners[key] = Owner(owner_name, string(phone), string(address),
+                                                registry.unused_owner_id(owner_id))
+            owners.append(owner)
+        registry.owners.extend(new_owners.values())
+
+        new_pets = {}
+        for pet_number, row in enumerate(self._rows(self._pet_row, self._pets, self.pet_count)):
+            pet_id, name, species, breed, age, owner, first, count = row if with_ids else (None, *row)
+            pet_name = string(name)
+            key = pet_id if with_ids else fold_name(pet_name)
+            if key in new_pets:
+                continue
+            existing = registry.match_pet(pet_id, pet_name)
+            if existing is not None:
+                for consultation in self._read_history(existing, pet_number):
+                    if not existing.has_consultation(consultation.date, consultation.reason, consultation.diagnosis):
+                        existing.add_consultation(consultation)
+                continue
+            pet = new_pets[key] = Pet(pet_name, string(species), string(breed), age, owners[owner],
+                                      registry.unused_pet_id(pet_id))
+            if count:
+                pet.set_history_source(self, pet_number)
+                self.pending += 1
+        registry.pets.extend(new_pets.values())
+        logging.info("Loaded %s owners and %s pets from snapshot %s (%s consultations on demand)",
+                     len(new_owners), len(new_pets), self.path, self.consultation_count)
+        return self.pending
@@ -0,0 +1,251 @@
+"""
+Backend opcional de almacenamiento en SQLite.
+
+Guarda dueños, mascotas y consultas en tablas indexadas. Las escrituras son
+incrementales: solo se insertan (en lote, con executemany) los registros que
+todavía no están en la base de datos. Los IDs de las filas son los IDs de
+los objetos: al cargar se conservan y al guardar una fila nueva usa el ID del
+objeto si está libre.
+
+Al cargar solo se leen los dueños y las mascotas: el historial de cada mascota
+queda en la base de datos y se lee con un SELECT por mascota la primera vez
+que se accede a él (Pet.set_history_source).
+
+La conexión se comparte entre hilos (el autoguardado y el SAVE del servidor
+guardan desde otro hilo): cada operación la usa con un candado tomado. Al
+guardar, las filas nuevas se juntan con la lectura del registro tomada y se
+escriben después de soltarla, así las altas no esperan a la escritura en disco.
+"""
+import logging
+import sqlite3
+import threading
+import weakref
+from operator import attrgetter
+
+from classes import Owner, Pet, Consultation, consultation_ids, consultation_id_floor, keep_id
+
+_day_of = attrgetter('day')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS owners (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    phone TEXT NOT NULL,
+    address TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS pets (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    species TEXT NOT NULL,
+    breed TEXT NOT NULL,
+    age INTEGER NOT NULL,
+    owner_id INTEGER NOT NULL REFERENCES owners(id)
+);
+CREATE TABLE IF NOT EXISTS consultations (
+    id INTEGER PRIMARY KEY,
+    pet_id INTEGER NOT NULL REFERENCES pets(id),
+    date TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    diagnosis TEXT NOT NULL,
+    UNIQUE (pet_id, date, reason, diagnosis)
+);
+CREATE INDEX IF NOT EXISTS idx_owners_name ON owners(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_pets_name ON pets(name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_pets_owner ON pets(owner_id);
+"""
+
+# Una consulta igual de la misma mascota ya guardada se omite. Si otra consulta ya tiene ese ID
+# (por ejemplo de un historial que todavía no se cargó), SQLite le asigna uno nuevo a la fila.
+# El "WHERE true" es obligatorio en un INSERT ... SELECT con ON CONFLICT.
+INSERT_CONSULTATION = """
+INSERT INTO consultations (id, pet_id, date, reason, diagnosis)
+SELECT CASE WHEN EXISTS (SELECT 1 FROM consultations WHERE id = :id) THEN NULL ELSE :id END,
+       :pet_id, :date, :reason, :diagnosis
+WHERE true
+ON CONFLICT (pet_id, date, reason, diagnosis) DO NOTHING
+"""
+
+
+class SQLiteHistories:
+    """
+    Historiales que quedaron en la base de datos en una carga. Es el origen que se anota en
+    cada mascota; close() no cierra la conexión, que sigue siendo del almacenamiento.
+    """
+
+    def __init__(self, storage, id_floor=0):
+        self.storage = storage
+        self.id_floor = id_floor  # los IDs de consulta hasta este ya podían estar en uso al cargar
+        self.pending = 0  # mascotas con el historial todavía en la base de datos
+
+    def close(self):
+        """No tiene nada propio que cerrar; existe para tratarlo igual que un snapshot."""
+
+    def load_consultations(self, pet, row_id):
+        """Historial pendiente de una mascota (lo llama Pet al accederlo por primera vez)."""
+        history = self.storage.read_history(pet, row_id, self.id_floor)
+        self.pending -= 1
+        return history
+
+
+class SQLiteStorage:
+    """Persistencia de un Registry en una base de datos SQLite en modo WAL."""
+
+    def __init__(self, path='clinica_veterinaria.db'):
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        # Un guardado a la vez: dos guardados no deben juntar las mismas filas nuevas
+        self._save_lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(SCHEMA)
+        # Objeto en memoria -> id de su fila
+        self._owner_ids = weakref.WeakKeyDictionary()
+        self._pet_ids = weakref.WeakKeyDictionary()
+        # Mascota -> número de consultas ya guardadas
+        self._saved_consultations = weakref.WeakKeyDictionary()
+        # Mascotas cargadas cuyo historial sigue en la base de datos (no hay nada nuevo que guardar)
+        self._unloaded = weakref.WeakSet()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def is_empty(self):
+        """Indica si la base de datos todavía no tiene dueños registrados."""
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM owners LIMIT 1").fetchone() is None
+
+    def _next_id(self, table):
+        (max_id,) = self._conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {table}").fetchone()
+        return max_id + 1
+
+    def load(self, registry):
+        """
+        Carga en el registro los dueños y mascotas que aún no estén en memoria. Sus historiales
+        se leen al accederlos; devuelve el SQLiteHistories con la cantidad de historiales pendientes.
+        """
+        with self._lock:
+            return self._load(registry)
+
+    def _load(self, registry):
+        known_owners = {row_id: owner for owner, row_id in self._owner_ids.items()}
+        known_pets = {row_id: pet for pet, row_id in self._pet_ids.items()}
+
+        new_owners = []
+        for row_id, name, phone, address in self._conn.execute(
+                "SELECT id, name, phone, address FROM owners ORDER BY id"):
+            if row_id not in known_owners:
+                owner = Owner(name, phone, address, registry.unused_owner_id(row_id))
+                known_owners[row_id] = owner
+                self._owner_ids[owner] = row_id
+                new_owners.append(owner)
+        registry.owners.extend(new_owners)
+
+        new_pets = []
+        for row_id, name, species, breed, age, owner_id in self._conn.execute(
+                "SELECT id, name, species, breed, age, owner_id FROM pets ORDER BY id"):
+            if row_id not in known_pets:
+                pet = Pet(name, species, breed, age, known_owners[owner_id], registry.unused_pet_id(row_id))
+                known_pets[row_id] = pet
+                self._pet_ids[pet] = row_id
+                new_pets.append(pet)
+
+        # Las consultas pendientes ya tienen ID: las nuevas deben recibir uno mayor
+        histories = SQLiteHistories(self, consultation_id_floor(registry.pets))
+        consultation_ids.reserve(self._next_id('consultations') - 1)
+        for pet in new_pets:
+            pet.set_history_source(histories, self._pet_ids[pet])
+            self._unloaded.add(pet)
+        histories.pending = len(new_pets)
+        registry.pets.extend(new_pets)
+        logging.info("Loaded %s owners and %s pets from SQLite: %s (consultations on demand)",
+                     len(new_owners), len(new_pets), self.path)
+        return histories
+
+    def read_history(self, pet, row_id, id_floor=0):
+        """
+        Consultas guardadas de la mascota con ese ID de fila, ordenadas por fecha.
+        Las de ID hasta id_floor reciben uno nuevo (ver classes.keep_id).
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, date, reason, diagnosis FROM consultations WHERE pet_id = ? ORDER BY id", (row_id,))
+            history = [Consultation(date, reason, diagnosis, pet, keep_id(consultation_id, id_floor))
+                       for consultation_id, date, reason, diagnosis in rows]
+            self._saved_consultations[pet] = len(history)
+            self._unloaded.discard(pet)
+        # Orden estable: igual que agregarlas una a una con Pet.add_consultation
+        history.sort(key=_day_of)
+        return history
+
+    def save(self, registry):
+        """
+        Inserta en un único lote los dueños, mascotas y consultas nuevos o modificados.
+        Las filas se juntan con registry.lock.read() tomado y se escriben ya sin él.
+        """
+        with self._save_lock:
+            with registry.lock.read(), self._lock:
+                batch = self._collect(registry)
+            with self._lock:
+                self._write(*batch)
+
+    def _collect(self, registry):
+        """Filas que faltan guardar, y la cantidad de consultas de cada mascota en este momento."""
+        new_owner_ids = {}
+        new_pet_ids = {}
+        owner_rows = []
+        pet_rows = []
+        consultation_rows = []
+        next_owner_id = self._next_id('owners')
+        next_pet_id = self._next_id('pets')
+
+        def owner_id_for(owner):
+            nonlocal next_owner_id
+            row_id = self._owner_ids.get(owner) or new_owner_ids.get(owner)
+            if row_id is None:
+                row_id = new_owner_ids[owner] = max(owner.id, next_owner_id)
+                next_owner_id = row_id + 1
+                owner_rows.append((row_id, owner.name, owner.phone, owner.address))
+            return row_id
+
+        saved_counts = []
+        for owner in registry.owners:
+            owner_id_for(owner)
+        for pet in registry.pets:
+            pet_id = self._pet_ids.get(pet)
+            if pet_id is None:
+                pet_id = new_pet_ids[pet] = max(pet.id, next_pet_id)
+                next_pet_id = pet_id + 1
+                pet_rows.append((pet_id, pet.name, pet.species, pet.breed, pet.age, owner_id_for(pet.owner)))
+            if pet in self._unloaded:
+                continue
+            history = pet.consultations
+            if self._saved_consultations.get(pet, 0) != len(history):
+                consultation_rows.extend(
+                    {'id': c.id, 'pet_id': pet_id, 'date': c.date, 'reason': c.reason, 'diagnosis': c.diagnosis}
+                    for c in history
+                )
+            saved_counts.append((pet, len(history)))
+        return new_owner_ids, new_pet_ids, owner_rows, pet_rows, consultation_rows, saved_counts
+
+    def _write(self, new_owner_ids, new_pet_ids, owner_rows, pet_rows, consultation_rows, saved_counts):
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO owners (id, name, phone, address) VALUES (?, ?, ?, ?)", owner_rows)
+            self._conn.executemany(
+                "INSERT INTO pets (id, name, species, breed, age, owner_id) VALUES (?, ?, ?, ?, ?, ?)",
+                pet_rows)
+            self._conn.executemany(INSERT_CONSULTATION, consultation_rows)
+
+        # La transacción se confirmó: recordar lo que ya está guardado (las consultas agregadas
+        # mientras se escribía quedan para el próximo guardado)
+        self._owner_ids.update(new_owner_ids)
+        self._pet_ids.update(new_pet_ids)
+        for pet, count in saved_counts:
+            self._saved_consultations[pet] = count
+        logging.info(
+            "Saved to SQLite %s: %d owners, %d pets, %d consultation rows",
+            self.path, len(owner_rows), len(pet_rows), len(consultation_rows)
+        )
@@ -1,8 +1,12 @@
 import unittest
+import asyncio
 import logging
 import os
 import csv
 import json
+import tempfile
+import threading
+from importlib.util import find_spec
 
 # Import the classes and functions to test
 from classes import Owner, Pet, Consultation
@@ -47,6 +51,28 @@ class TestPet(unittest.TestCase):
         self.assertIn(consulta, pet.consultations)
         self.assertIn("Vacunación", pet.show_consultations())
 
+    def test_compact_layout(self):
+        """Verifica __slots__, cadenas internadas e historial creado bajo demanda."""
+        owner = Owner("Ana", "999", "Plaza 2")
+        pet = Pet("Toby", "".join(["Pe", "rro"]), "Labrador", 5, owner)
+        other = Pet("Rex", "".join(["Per", "ro"]), "Boxer", 3, owner)
+        self.assertFalse(hasattr(owner, "__dict__"))
+        self.assertFalse(hasattr(pet, "__dict__"))
+        self.assertIs(pet._species, other._species)
+        self.assertIsNone(pet._consultations)
+        pet.add_consultation(Consultation("01/01/2024", "Control", "Sano", pet))
+        self.assertEqual(len(pet.consultations), 1)
+
+    def test_has_consultation_fingerprint(self):
+        """Verifica la detección de consultas duplicadas por huella."""
+        owner = Owner("Sara", "222", "Calle 8")
+        pet = Pet("Luna", "Gato", "Angora", 4, owner)
+        pet.add_consultation(Consultation("01/02/2024", "Control", "Sano", pet))
+        self.assertTrue(pet.has_consultation("01/02/2024", "Control", "Sano"))
+        self.assertFalse(pet.has_consultation("01/02/2024", "Control", "Otitis"))
+        pet._consultations.clear()
+        self.assertFalse(pet.has_consultation("01/02/2024", "Control", "Sano"))
+
 class TestConsultation(unittest.TestCase):
     """Pruebas para la clase Consultation."""
 
@@ -82,6 +108,18 @@ class TestValidationFunctions(unittest.TestCase):
         self.assertFalse(functions.is_valid_date("abcd"))
         self.assertFalse(functions.is_valid_date(""))
 
+    def test_batch_matches_row_by_row(self):
+        from validation import validate_batch, row_errors, PET_OWNER_ROW_RULES
+        good = {"pet_name": "Rex", "species": "Perro", "breed": "Pug", "age": "3",
+                "owner_name": "Ana", "owner_phone": "999", "owner_address": "Plaza 2"}
+        rows = [good, dict(good, age=True), "x", dict(good, species=["Perro"]), dict(good, age=1),
+                dict(good, pet_name="123", owner_phone=None), good]
+        valid, rejected = validate_batch(rows, PET_OWNER_ROW_RULES)
+        self.assertEqual(valid, [good, dict(good, age=1), good])
+        self.assertEqual(rejected, [(position, row, row_errors(row, PET_OWNER_ROW_RULES))
+                                    for position, row in enumerate(rows) if row_errors(row, PET_OWNER_ROW_RULES)])
+        self.assertEqual(rejected[-1][2], ["invalid pet name", "invalid owner phone"])
+
 class TestExceptions(unittest.TestCase):
     """Pruebas para el manejo de excepciones al ingresar datos incorrectos."""
 
@@ -136,6 +174,52 @@ class TestLogging(unittest.TestCase):
             logs = log_file.read()
         self.assertIn("Test warning!", logs)
 
+class TestQueueLogging(unittest.TestCase):
+    """Verifica el log en segundo plano con formato diferido."""
+
+    LOG = "test_queue_clinica.log"
+
+    def tearDown(self):
+        import clinic_logging
+        clinic_logging.stop_logging()
+        for filename in (self.LOG, self.LOG + ".1"):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def test_deferred_formatting_reaches_file(self):
+        import clinic_logging
+        for handler in logging.root.handlers[:]:
+            logging.root.removeHandler(handler)
+        clinic_logging.configure_logging(self.LOG, rotation="size", max_bytes=1024, backup_count=1)
+        owner = Owner("Lazy", "1", "Calle 1")
+        logging.info("Owner registered: %s", owner)
+        clinic_logging.stop_logging()
+        with open(self.LOG, encoding="utf-8") as log_file:
+            self.assertIn("Owner registered: Name: Lazy", log_file.read())
+
+    def test_redirect_and_restore(self):
+        import clinic_logging
+        for handler in logging.root.handlers[:]:
+            logging.root.removeHandler(handler)
+        clinic_logging.configure_logging(self.LOG)
+        with tempfile.TemporaryDirectory() as directory:
+            redirected = os.path.join(directory, "bench.log")
+            with clinic_logging.redirect_logging(redirected):
+                logging.info("During benchmark")
+            logging.info("After benchmark")
+            clinic_logging.stop_logging()
+            with open(redirected, encoding="utf-8") as log_file:
+                self.assertIn("During benchmark", log_file.read())
+        with open(self.LOG, encoding="utf-8") as log_file:
+            logs = log_file.read()
+        self.assertIn("After benchmark", logs)
+        self.assertNotIn("During benchmark", logs)
+
+    def test_invalid_rotation(self):
+        import clinic_logging
+        with self.assertRaises(ValueError):
+            clinic_logging.configure_logging(self.LOG, rotation="weekly")
+
 class TestSerialization(unittest.TestCase):
     """Pruebas de serialización y deserialización CSV/JSON."""
 
@@ -182,11 +266,1347 @@ class TestSerialization(unittest.TestCase):
         functions.import_consultas_json("test_consultas.json")
         self.assertTrue(any("Recuperado" in c.diagnosis for c in pet.consultations))
 
+    def test_export_import_consultas_ndjson(self):
+        """Valida exportación NDJSON y su detección automática al importar."""
+        owner = Owner("Irene", "654", "Calle 12")
+        pet = Pet("Kira", "Perro", "Husky", 2, owner)
+        pet.add_consultation(Consultation("02/03/2024", "Vacuna", "Sano", pet))
+        pet.add_consultation(Consultation("09/03/2024", "Tos", "Resfriado", pet))
+        functions.owners.append(owner)
+        functions.pets.append(pet)
+
+        functions.export_consultas_ndjson("test_consultas.ndjson")
+        with open("test_consultas.ndjson", encoding="utf-8") as ndjsonfile:
+            lines = ndjsonfile.read().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1])["diagnosis"], "Resfriado")
+
+        pet._consultations.clear()
+        functions.import_consultas_json("test_consultas.ndjson")
+        functions.import_consultas_json("test_consultas.ndjson")
+        self.assertEqual([c.reason for c in pet.consultations], ["Vacuna", "Tos"])
+
+    def test_same_name_pets_keep_ids_and_histories(self):
+        """Dos mascotas con el mismo nombre sobreviven a exportar e importar, con sus IDs e historiales."""
+        ana = Owner("Ana", "111", "Calle 1")
+        luis = Owner("Luis", "222", "Calle 2")
+        toby_ana = Pet("Toby", "Perro", "Labrador", 5, ana)
+        toby_luis = Pet("Toby", "Gato", "Persa", 2, luis)
+        functions.owners.extend([ana, luis])
+        functions.pets.extend([toby_ana, toby_luis])
+        toby_ana.add_consultation(Consultation("01/02/2024", "Vacuna", "Sano", toby_ana))
+        toby_luis.add_consultation(Consultation("03/04/2024", "Tos", "Resfriado", toby_luis))
+        consultation_id = toby_luis.consultations[0].id
+        functions.export_mascotas_duenos_csv("test_mascotas_dueños.csv")
+        functions.export_consultas_json("test_consultas.json")
+
+        functions.reset_data()
+        functions.import_mascotas_duenos_csv("test_mascotas_dueños.csv")
+        functions.import_consultas_json("test_consultas.json")
+        functions.import_consultas_json("test_consultas.json")
+        tobys = functions.registry.find_pets("toby")
+        self.assertEqual([(p.id, p.owner.id) for p in tobys], [(toby_ana.id, ana.id), (toby_luis.id, luis.id)])
+        self.assertEqual([[c.diagnosis for c in p.consultations] for p in tobys], [["Sano"], ["Resfriado"]])
+        self.assertEqual(tobys[1].consultations[0].id, consultation_id)
+        # Los IDs nuevos no repiten los importados
+        self.assertGreater(Owner("Eva", "333", "Calle 3").id, luis.id)
+
+    def test_invalid_rows_are_quarantined(self):
+        """Las filas inválidas no se importan y quedan en el archivo de rechazos."""
+        with open("test_mascotas_dueños.csv", "w", newline="", encoding="utf-8") as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(["pet_name", "species", "breed", "age", "owner_name", "owner_phone", "owner_address"])
+            writer.writerow(["Sol", "Gato", "Comun", "2", "Eva", "123", "Calle 9"])
+            writer.writerow(["Luna", "Gato", "Comun", "dos", "Eva", "123", "Calle 9"])
+            writer.writerow(["999", "Perro", "Pug", "1", "Eva", "123", "Calle 9"])
+        functions.import_mascotas_duenos_csv("test_mascotas_dueños.csv")
+        self.assertEqual([p.name for p in functions.pets], ["Sol"])
+        with open("test_mascotas_dueños.csv.rejected.ndjson", encoding="utf-8") as rejects:
+            rejected = [json.loads(line) for line in rejects]
+        self.assertEqual([r["record"] for r in rejected], [2, 3])
+        self.assertEqual(rejected[0]["errors"], ["invalid age"])
+
+        with open("test_consultas.ndjson", "w", encoding="utf-8") as ndjsonfile:
+            ndjsonfile.write('{"pet_name": "Sol", "date": "01/01/2024", "reason": "Control", "diagnosis": "Sano"}\n')
+            ndjsonfile.write('{"pet_name": "Sol", "date": "enero", "reason": "Control", "diagnosis": "Sano"}\n')
+            ndjsonfile.write('["no", "es", "un", "objeto"]\n')
+            ndjsonfile.write('{"pet_name": "Sol", "date": \n')
+            ndjsonfile.write('{"pet_name": 7, "date": "02/01/2024", "reason": "Control", "diagnosis": "Sano"}\n')
+        functions.import_consultas_json("test_consultas.ndjson")
+        self.assertEqual(len(functions.pets[0].consultations), 1)
+        with open("test_consultas.ndjson.rejected.ndjson", encoding="utf-8") as rejects:
+            rejected = [json.loads(line) for line in rejects]
+        self.assertEqual([r["record"] for r in rejected], [2, 3, 4, 5])
+        self.assertEqual(rejected[2]["errors"], ["malformed record"])
+        self.assertEqual(rejected[3]["errors"], ["invalid pet name"])
+
+    def test_precompiled_validators_match_rules(self):
+        from validation import is_valid_date, is_valid_name, is_valid_age
+        self.assertTrue(is_valid_date("2024-05-10"))
+        self.assertFalse(is_valid_date("20240510"))
+        self.assertFalse(is_valid_date("10 de mayo"))
+        self.assertTrue(is_valid_name("Ñandú"))
+        self.assertTrue(is_valid_age("7"))
+        self.assertFalse(is_valid_age("-7"))
+
     def tearDown(self):
-        if os.path.exists("test_mascotas_dueños.csv"):
-            os.remove("test_mascotas_dueños.csv")
-        if os.path.exists("test_consultas.json"):
-            os.remove("test_consultas.json")
+        for filename in ("test_mascotas_dueños.csv", "test_consultas.json", "test_consultas.ndjson",
+                         "test_mascotas_dueños.csv.rejected.ndjson", "test_consultas.ndjson.rejected.ndjson"):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+class TestRegistry(unittest.TestCase):
+    """Pruebas de los índices del registro de dueños y mascotas."""
+
+    def setUp(self):
+        functions.owners.clear()
+        functions.pets.clear()
+
+    def test_find_by_name_is_case_insensitive(self):
+        owner = Owner("Elena", "555", "Calle 3")
+        pet = Pet("Nube", "Gato", "Persa", 2, owner)
+        functions.owners.append(owner)
+        functions.pets.append(pet)
+        self.assertIs(functions.find_owner_by_name("ELENA"), owner)
+        self.assertIs(functions.find_pet_by_name("nube"), pet)
+        self.assertIsNone(functions.find_pet_by_name("Otro"))
+
+    def test_secondary_indexes_and_removal(self):
+        owner = Owner("Pablo", "111", "Calle 4")
+        rex = Pet("Rex", "Perro", "Beagle", 3, owner)
+        mia = Pet("Mia", "Gato", "Siames", 1, owner)
+        functions.owners.append(owner)
+        functions.pets.extend([rex, mia])
+        self.assertEqual(functions.registry.pets_by_owner("pablo"), [rex, mia])
+        self.assertEqual(functions.registry.pets_by_species("perro"), [rex])
+        self.assertEqual(functions.registry.pets_by_breed("SIAMES"), [mia])
+        functions.pets.remove(rex)
+        self.assertIsNone(functions.find_pet_by_name("Rex"))
+        self.assertEqual(functions.registry.pets_by_owner("Pablo"), [mia])
+
+    def test_ids_and_pets_of_owner(self):
+        pablo = Owner("Pablo", "111", "Calle 4")
+        other = Owner("Pablo", "222", "Calle 5")
+        rex = Pet("Rex", "Perro", "Beagle", 3, pablo)
+        rex_too = Pet("Rex", "Gato", "Siames", 1, other)
+        functions.owners.extend([pablo, other])
+        functions.pets.extend([rex, rex_too])
+        self.assertNotEqual(pablo.id, other.id)
+        self.assertIs(functions.registry.owner_by_id(other.id), other)
+        self.assertIs(functions.registry.pet_by_id(rex_too.id), rex_too)
+        self.assertEqual(functions.registry.pets_of(other), [rex_too])
+        self.assertEqual(functions.registry.find_pets("rex"), [rex, rex_too])
+        self.assertEqual(functions.registry.pets_by_owner("pablo"), [rex, rex_too])
+
+class TestSQLiteStorage(unittest.TestCase):
+    """Pruebas del backend SQLite."""
+
+    DB = "test_clinica.db"
+
+    def setUp(self):
+        functions.owners.clear()
+        functions.pets.clear()
+        self._remove_db()
+
+    def tearDown(self):
+        functions.storage = None
+        functions.reset_data()
+        self._remove_db()
+        for filename in ("test_mascotas_dueños.csv", "test_consultas.json"):
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def _remove_db(self):
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(self.DB + suffix):
+                os.remove(self.DB + suffix)
+
+    def test_incremental_save_and_load(self):
+        from sqlite_storage import SQLiteStorage
+        storage = SQLiteStorage(self.DB)
+        owner = Owner("Nora", "101", "Calle 20")
+        pet = Pet("Bruno", "Perro", "Mastin", 7, owner)
+        pet.add_consultation(Consultation("05/01/2024", "Cojera", "Esguince", pet))
+        functions.owners.append(owner)
+        functions.pets.append(pet)
+        storage.save(functions.registry)
+        pet.add_consultation(Consultation("12/01/2024", "Control", "Mejorando", pet))
+        storage.save(functions.registry)
+        storage.save(functions.registry)
+        storage.close()
+
+        functions.owners.clear()
+        functions.pets.clear()
+        storage = SQLiteStorage(self.DB)
+        storage.load(functions.registry)
+        self.assertEqual(storage.load(functions.registry).pending, 0)
+        self.assertEqual(len(functions.pets), 1)
+        loaded = functions.find_pet_by_name("bruno")
+        # El historial se lee de la base de datos recién al accederlo
+        self.assertFalse(loaded.history_loaded)
+        storage.save(functions.registry)
+        self.assertFalse(loaded.history_loaded)
+        self.assertEqual([c.reason for c in loaded.consultations], ["Cojera", "Control"])
+        loaded.add_consultation(Consultation("20/01/2024", "Alta", "Sano", loaded))
+        storage.save(functions.registry)
+        (count,) = storage._conn.execute("SELECT COUNT(*) FROM consultations").fetchone()
+        storage.close()
+        self.assertEqual(count, 3)
+
+    def test_consultations_sharing_an_id_are_all_saved(self):
+        from sqlite_storage import SQLiteStorage
+        storage = SQLiteStorage(self.DB)
+        owner = Owner("Nora", "101", "Calle 20")
+        toby = Pet("Toby", "Perro", "Pug", 3, owner)
+        mia = Pet("Mia", "Gato", "Persa", 2, owner)
+        toby.add_consultation(Consultation("05/01/2024", "Vacuna", "Sano", toby, 1))
+        mia.add_consultation(Consultation("06/01/2024", "Tos", "Gripe", mia, 1))
+        functions.owners.append(owner)
+        functions.pets.extend([toby, mia])
+        storage.save(functions.registry)
+        storage.save(functions.registry)
+        rows = storage._conn.execute("SELECT id, reason FROM consultations ORDER BY id").fetchall()
+        storage.close()
+        self.assertEqual([reason for _, reason in rows], ["Vacuna", "Tos"])
+        self.assertEqual(rows[0][0], 1)
+
+    def test_save_from_another_thread(self):
+        from concurrent.futures import ThreadPoolExecutor
+        from sqlite_storage import SQLiteStorage
+        functions.storage = SQLiteStorage(self.DB)
+        owner = Owner("Nora", "101", "Calle 20")
+        functions.owners.append(owner)
+        functions.pets.append(Pet("Bruno", "Perro", "Mastin", 7, owner))
+        with ThreadPoolExecutor(1) as executor:  # como el autoguardado o el SAVE del servidor
+            self.assertTrue(executor.submit(functions.call_with_output, True, functions.export_all).result())
+        functions.storage.close()
+        storage = SQLiteStorage(self.DB)
+        self.assertFalse(storage.is_empty())
+        storage.close()
+
+    def test_registration_during_the_write(self):
+        from unittest import mock
+        from sqlite_storage import SQLiteStorage
+        storage = SQLiteStorage(self.DB)
+        owner = Owner("Nora", "101", "Calle 20")
+        pet = Pet("Bruno", "Perro", "Mastin", 7, owner)
+        functions.owners.append(owner)
+        functions.pets.append(pet)
+        write = storage._write
+
+        def write_while_registering(*batch):
+            # Mientras se escribe en disco, otro hilo puede tomar la escritura del registro
+            def register():
+                with functions.registry.lock.write():
+                    pet.add_consultation(Consultation("05/01/2024", "Cojera", "Esguince", pet))
+            thread = threading.Thread(target=register)
+            thread.start()
+            thread.join(5)
+            self.assertFalse(thread.is_alive())
+            write(*batch)
+
+        with mock.patch.object(storage, "_write", write_while_registering):
+            storage.save(functions.registry)
+        # La consulta agregada durante la escritura se guarda en el siguiente guardado
+        storage.save(functions.registry)
+        (count,) = storage._conn.execute("SELECT COUNT(*) FROM consultations").fetchone()
+        storage.close()
+        self.assertEqual(count, 1)
+
+    def test_migration_from_files(self):
+        owner = Owner("Tomas", "202", "Calle 21")
+        pet = Pet("Pelusa", "Gato", "Comun", 3, owner)
+        pet.add_consultation(Consultation("06/02/2024", "Vomito", "Gastritis", pet))
+        functions.owners.append(owner)
+        functions.pets.append(pet)
+        functions.export_mascotas_duenos_csv("test_mascotas_dueños.csv")
+        functions.export_consultas_json("test_consultas.json")
+        functions.owners.clear()
+        functions.pets.clear()
+
+        functions.use_sqlite_storage(self.DB, "test_mascotas_dueños.csv", "test_consultas.json")
+        functions.storage.close()
+        functions.owners.clear()
+        functions.pets.clear()
+        functions.use_sqlite_storage(self.DB, "test_mascotas_dueños.csv", "test_consultas.json")
+        functions.import_all()
+        self.assertEqual(len(functions.pets), 1)
+        self.assertEqual(functions.pets[0].consultations[0].diagnosis, "Gastritis")
+        functions.storage.close()
+
+class TestJournal(unittest.TestCase):
+    """Pruebas del diario de cambios."""
+
+    JOURNAL = "test_clinica.journal"
+
+    def setUp(self):
+        functions.owners.clear()
+        functions.pets.clear()
+        if os.path.exists(self.JOURNAL):
+            os.remove(self.JOURNAL)
+        functions.enable_journal(self.JOURNAL, sync_every=2)
+
+    def tearDown(self):
+        functions.change_journal.close()
+        functions.change_journal = None
+        if os.path.exists(self.JOURNAL):
+            os.remove(self.JOURNAL)
+
+    def test_registrations_are_replayed(self):
+        from unittest import mock
+        answers = ["Gina", "303", "Calle 30",
+                   "Simba", "Gato", "Persa", "2", "Gina",
+                   "Simba", "07/03/2024", "Control", "Sano"]
+        with mock.patch("builtins.input", side_effect=answers), mock.patch("builtins.print"):
+            functions.register_owner()
+            functions.register_pet()
+            functions.register_consultation()
+
+        functions.owners.clear()
+        functions.pets.clear()
+        functions.replay_journal()
+        functions.replay_journal()
+        pet = functions.find_pet_by_name("Simba")
+        self.assertEqual(len(functions.owners), 1)
+        self.assertEqual(pet.owner.name, "Gina")
+        self.assertEqual([c.diagnosis for c in pet.consultations], ["Sano"])
+
+    def test_truncated_last_line_is_ignored(self):
+        functions.journal_record({"op": "owner", "name": "Hugo", "phone": "1", "address": "X"})
+        functions.change_journal.sync()
+        with open(self.JOURNAL, "a", encoding="utf-8") as journal_file:
+            journal_file.write('{"op": "pet", "na')
+        functions.replay_journal()
+        self.assertIsNotNone(functions.find_owner_by_name("Hugo"))
+
+    def test_discard_prefix_keeps_later_records(self):
+        from journal import read_journal
+        functions.journal_record({"op": "owner", "name": "Hugo", "phone": "1", "address": "X"})
+        functions.change_journal.sync()
+        saved = functions.change_journal.size()
+        functions.journal_record({"op": "owner", "name": "Iris", "phone": "2", "address": "Y"})
+        functions.change_journal.discard_prefix(saved)
+        functions.journal_record({"op": "owner", "name": "Juan", "phone": "3", "address": "Z"})
+        functions.change_journal.sync()
+        self.assertEqual([r["name"] for r in read_journal(self.JOURNAL)], ["Iris", "Juan"])
+
+    def test_compaction_keeps_owners_without_pets(self):
+        from unittest import mock
+        import services
+        previous_directory = os.getcwd()
+        functions.change_journal.close()
+        with tempfile.TemporaryDirectory() as directory, mock.patch("builtins.print"):
+            os.chdir(directory)
+            try:
+                functions.enable_journal(self.JOURNAL)
+                services.add_owners([{"name": "Solo", "phone": "1", "address": "X"},
+                                     {"name": "Gina", "phone": "2", "address": "Y"}])
+                services.add_pets([{"name": "Simba", "species": "Gato", "breed": "Persa", "age": 2,
+                                    "owner_name": "Gina"}])
+                # El CSV no tiene filas para Solo: su alta queda en el diario
+                self.assertTrue(functions.compact_journal())
+                self.assertTrue(functions.compact_journal())
+                functions.reset_data()
+                functions.import_all()
+                self.assertEqual(sorted(o.name for o in functions.owners), ["Gina", "Solo"])
+                self.assertEqual([p.name for p in functions.pets], ["Simba"])
+            finally:
+                functions.change_journal.close()
+                os.chdir(previous_directory)
+                functions.reset_data()
+        functions.enable_journal(self.JOURNAL, sync_every=2)
+
+class TestColumnarStore(unittest.TestCase):
+    """Pruebas del almacén columnar de consultas."""
+
+    def setUp(self):
+        from columnar import ConsultationStore
+        self.store = ConsultationStore()
+        self.store.attach()
+        owner = Owner("Marta", "404", "Calle 40")
+        self.dog = Pet("Coco", "Perro", "Pug", 4, owner)
+        self.cat = Pet("Mishi", "Gato", "Persa", 2, owner)
+        self.dog.add_consultation(Consultation("10/01/2024", "Picazón", "Otitis", self.dog))
+        self.dog.add_consultation(Consultation("2024-02-15", "Control", "Sano", self.dog))
+        self.cat.add_consultation(Consultation("20/01/2024", "Oído", "otitis", self.cat))
+        self.cat.add_consultation(Consultation("sin fecha", "Control", "Sano", self.cat))
+
+    def tearDown(self):
+        self.store.detach()
+
+    def test_date_range_and_filters(self):
+        self.assertEqual(len(self.store), 4)
+        self.assertEqual(self.store.count(), 4)
+        self.assertEqual(self.store.count("01/01/2024", "31/01/2024"), 2)
+        self.assertEqual(self.store.count(end="31/12/2024", species="perro"), 2)
+        self.assertEqual(self.store.count(diagnosis="OTITIS"), 2)
+        self.assertEqual(self.store.count(species="Conejo"), 0)
+        selected = self.store.select(start="01/02/2024")
+        self.assertEqual([c.diagnosis for c in selected], ["Sano"])
+        self.assertEqual(self.store.counts_by_diagnosis(species="Gato"), {"Otitis": 1, "Sano": 1})
+
+    def test_range_queries_with_and_without_store(self):
+        functions.reset_data()
+        functions.owners.append(self.dog.owner)
+        functions.pets.extend([self.dog, self.cat])
+        functions.rebuild_clinic_indexes()
+        queries = [("01/01/2024", "31/12/2024", None, None), ("01/01/2024", "31/01/2024", "gato", None),
+                   ("01/01/2024", "31/12/2024", None, "OTITIS"), ("01/03/2024", "31/12/2024", None, None)]
+        try:
+            without_store = [functions.consultations_between(*query) for query in queries]
+            counts = functions.diagnosis_counts("01/01/2024", "31/12/2024")
+            functions.enable_columnar_store()
+            self.assertEqual([functions.consultations_between(*query) for query in queries], without_store)
+            self.assertEqual(functions.diagnosis_counts("01/01/2024", "31/12/2024"), counts)
+            from unittest import mock
+            with mock.patch("builtins.input", side_effect=["01/01/2024", "31/12/2024", "perro", ""]), \
+                    mock.patch("builtins.print") as fake_print:
+                functions.view_recent_consultations()
+            fake_print.assert_any_call("Diagnoses in this range:")
+            fake_print.assert_any_call(f"  {'Otitis':<24}{1:>8}")
+        finally:
+            functions.consultation_store.detach()
+            functions.consultation_store = None
+            functions.reset_data()
+        self.assertEqual([c.pet.name for c in without_store[0]], ["Coco", "Mishi", "Coco"])
+        self.assertEqual([c.diagnosis for c in without_store[1]], ["otitis"])
+        self.assertEqual(counts, {"Otitis": 2, "Sano": 1})
+
+    @unittest.skipUnless(find_spec("numpy"), "NumPy is not installed")
+    def test_numpy_matches_python_loop(self):
+        from unittest import mock
+        queries = [{}, {"start": "01/01/2024", "end": "31/01/2024"}, {"end": "31/12/2024", "species": "perro"},
+                   {"diagnosis": "OTITIS"}, {"species": "Conejo"}]
+        vectorized = [(self.store.count(**q), self.store.select(**q)) for q in queries]
+        by_diagnosis = self.store.counts_by_diagnosis(species="Gato")
+        with mock.patch("columnar.np", None):
+            self.assertEqual([(self.store.count(**q), self.store.select(**q)) for q in queries], vectorized)
+            self.assertEqual(self.store.counts_by_diagnosis(species="Gato"), by_diagnosis)
+
+        # Agregar filas mientras otro hilo filtra con vistas de NumPy sobre las mismas columnas
+        errors = []
+        def add_many():
+            try:
+                for day in range(1, 2001):
+                    self.dog.add_consultation(Consultation(f"2023-01-{day % 28 + 1:02d}", "Control", f"D{day}", self.dog))
+            except Exception as e:
+                errors.append(e)
+        writer = threading.Thread(target=add_many)
+        writer.start()
+        while writer.is_alive():
+            self.store.counts_by_diagnosis(start="01/01/2023", end="31/12/2023")
+        writer.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(self.store.count(start="01/01/2023", end="31/12/2023"), 2000)
+
+    def test_rebuild_matches_incremental(self):
+        self.store.rebuild([self.dog, self.cat])
+        self.assertEqual(self.store.count("01/01/2024", "20/01/2024"), 2)
+        with self.assertRaises(ValueError):
+            self.store.count(start="ayer")
+
+class TestDateOrdering(unittest.TestCase):
+    """Pruebas del orden por fecha de los historiales y del índice de la clínica."""
+
+    def test_pet_history_sorted_and_paged(self):
+        owner = Owner("Rosa", "505", "Calle 50")
+        pet = Pet("Lola", "Perro", "Caniche", 6, owner)
+        for date in ("15/03/2024", "01/01/2024", "20/02/2024", "15/03/2024"):
+            pet.add_consultation(Consultation(date, f"Motivo {date}", "Sano", pet))
+        self.assertEqual([c.date for c in pet.consultations],
+                         ["01/01/2024", "20/02/2024", "15/03/2024", "15/03/2024"])
+        self.assertEqual([c.date for c in pet.recent_consultations(2)], ["15/03/2024", "15/03/2024"])
+        self.assertEqual([c.date for c in pet.recent_consultations(2, offset=2)], ["20/02/2024", "01/01/2024"])
+        self.assertEqual(len(pet.consultations_between("01/02/2024", "2024-03-15")), 3)
+
+    def test_clinic_index_recent_and_window(self):
+        from date_index import ClinicDateIndex
+        index = ClinicDateIndex()
+        index.attach()
+        try:
+            owner = Owner("Rosa", "505", "Calle 50")
+            a = Pet("Lola", "Perro", "Caniche", 6, owner)
+            b = Pet("Tom", "Gato", "Comun", 1, owner)
+            a.add_consultation(Consultation("05/05/2024", "Control", "Sano", a))
+            b.add_consultation(Consultation("01/05/2024", "Vacuna", "Sano", b))
+            b.add_consultation(Consultation("09/05/2024", "Tos", "Resfriado", b))
+        finally:
+            index.detach()
+        self.assertEqual([c.date for c in index.recent(2)], ["09/05/2024", "05/05/2024"])
+        self.assertEqual([c.pet.name for c in index.between("01/05/2024", "05/05/2024")], ["Tom", "Lola"])
+        rebuilt = ClinicDateIndex()
+        rebuilt.rebuild([a, b])
+        self.assertEqual([c.date for c in rebuilt.recent(3)], [c.date for c in index.recent(3)])
+
+class TestSearchIndex(unittest.TestCase):
+    """Pruebas del índice invertido de motivos y diagnósticos."""
+
+    def setUp(self):
+        from search_index import ConsultationSearchIndex
+        self.index = ConsultationSearchIndex()
+        owner = Owner("Clara", "606", "Calle 60")
+        self.pet = Pet("Bobby", "Perro", "Beagle", 5, owner)
+        self.first = Consultation("01/04/2024", "Vacunación anual", "Sano", self.pet)
+        self.second = Consultation("08/04/2024", "Rascado de oreja", "Otitis externa", self.pet)
+        self.third = Consultation("15/04/2024", "Control de oído", "OTÍTIS leve", self.pet)
+        for consultation in (self.first, self.second, self.third):
+            self.index.add(self.pet, consultation)
+
+    def test_accent_and_case_folding(self):
+        self.assertEqual(self.index.search("otitis", field="diagnosis"), [self.third, self.second])
+        self.assertEqual(self.index.search("vacuna", field="reason"), [self.first])
+        self.assertEqual(self.index.search("vacuna", field="reason", prefix=False), [])
+        self.assertEqual(self.index.search("otitis leve"), [self.third])
+        self.assertEqual(self.index.search("de"), [])
+
+    def test_index_updated_from_add_consultation(self):
+        self.pet.add_consultation(Consultation("20/04/2024", "Cojera", "Displasia", self.pet))
+        self.assertEqual([c.diagnosis for c in functions.search_index.search("displasia")], ["Displasia"])
+
+class TestPagination(unittest.TestCase):
+    """Pruebas del renderizado por páginas."""
+
+    def setUp(self):
+        functions.owners.clear()
+        functions.pets.clear()
+        owner = Owner("Iris", "707", "Calle 70")
+        functions.owners.append(owner)
+        for number in range(5):
+            functions.pets.append(Pet(f"Mascota{number}", "Gato", "Comun", number, owner))
+
+    def test_iter_pets_rendered_offset_limit(self):
+        chunks = list(functions.iter_pets_rendered(offset=3, limit=10))
+        self.assertEqual(len(chunks), 2)
+        self.assertIn("Mascota3", chunks[0])
+
+    def test_iter_consultations_newest_first(self):
+        pet = functions.pets[0]
+        for day in range(1, 6):
+            pet.add_consultation(Consultation(f"0{day}/01/2024", "Control", "Sano", pet))
+        page = list(pet.iter_consultations(offset=1, limit=2, newest_first=True))
+        self.assertEqual(len(page), 2)
+        self.assertIn("04/01/2024", page[0])
+        self.assertIn("03/01/2024", page[1])
+
+    def test_browse_pages_navigation(self):
+        from unittest import mock
+        seen = []
+        def render(offset, limit):
+            seen.append(offset)
+            return iter(())
+        with mock.patch("builtins.input", side_effect=["n", "n", "n", "p", "q"]), mock.patch("builtins.print"):
+            functions.browse_pages(render, 5, 2)
+        self.assertEqual(seen, [0, 2, 4, 4, 2])
+
+class TestServices(unittest.TestCase):
+    """Pruebas de la API de registro por lotes."""
+
+    def setUp(self):
+        functions.owners.clear()
+        functions.pets.clear()
+
+    def test_batches_report_per_record_errors(self):
+        import services
+        owners = services.add_owners([
+            {"name": "Lucia", "phone": "808", "address": "Calle 80"},
+            {"name": "1234", "phone": "808", "address": "Calle 81"},
+            {"name": "Mateo", "phone": "", "address": "Calle 82"},
+        ])
+        self.assertEqual([o.name for o in owners.added], ["Lucia"])
+        self.assertEqual([position for position, _ in owners.errors], [1, 2])
+        self.assertIsInstance(owners.errors[0][1], ValueError)
+
+        pets = services.add_pets([
+            {"name": "Kiwi", "species": "Ave", "breed": "Loro", "age": "3", "owner_name": "lucia"},
+            {"name": "Pipo", "species": "Ave", "breed": "Loro", "age": "-1", "owner_name": "Lucia"},
+            {"name": "Nemo", "species": "Pez", "breed": "Payaso", "age": 1, "owner_name": "Nadie"},
+        ])
+        self.assertEqual(len(pets.added), 1)
+        self.assertIsInstance(pets.errors[1][1], LookupError)
+        self.assertIs(functions.find_pet_by_name("kiwi").owner, owners.added[0])
+
+        consultations = services.add_consultations([
+            {"pet_name": "Kiwi", "date": "03/03/2024", "reason": "Plumas", "diagnosis": "Muda"},
+            {"pet_name": "Kiwi", "date": "ayer", "reason": "Plumas", "diagnosis": "Muda"},
+        ])
+        self.assertEqual(len(consultations.added), 1)
+        self.assertEqual(len(functions.find_pet_by_name("Kiwi").consultations), 1)
+
+    def test_interactive_wrapper_reports_input_error(self):
+        from unittest import mock
+        with mock.patch("builtins.input", side_effect=["Ana", "abc", "Calle 1"]), \
+                mock.patch("builtins.print") as fake_print:
+            self.assertIsNone(functions.register_owner())
+        fake_print.assert_any_call("Input error: Phone must be a non-empty number.")
+        self.assertEqual(len(functions.owners), 0)
+
+class TestParallelImport(unittest.TestCase):
+    """Pruebas de la importación en paralelo de varios archivos."""
+
+    FILES = ("test_shard_1.csv", "test_shard_2.csv", "test_shard_1.ndjson",
+             "test_shard_2.csv.rejected.ndjson")
+
+    def setUp(self):
+        functions.reset_data()
+        header = "pet_name,species,breed,age,owner_name,owner_phone,owner_address\n"
+        with open("test_shard_1.csv", "w", encoding="utf-8") as f:
+            f.write(header + "Toby,Perro,Labrador,5,Ana,123,Calle 1\n")
+        with open("test_shard_2.csv", "w", encoding="utf-8") as f:
+            f.write(header + "toby,Gato,Siames,2,Luis,456,Calle 2\n"
+                             "Mia,Gato,Persa,3,Luis,456,Calle 2\n"
+                             "1234,Gato,Persa,3,Luis,456,Calle 2\n")
+        with open("test_shard_1.ndjson", "w", encoding="utf-8") as f:
+            f.write('{"pet_name": "Mia", "date": "01/02/2024", "reason": "Tos", "diagnosis": "Gripe"}\n')
+            f.write('{"pet_name": "Mia", "date": "01/02/2024", "reason": "Tos", "diagnosis": "Gripe"}\n')
+
+    def tearDown(self):
+        functions.reset_data()
+        for filename in self.FILES:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def test_merge_is_deterministic_and_keeps_first_duplicate(self):
+        from parallel_import import import_shards
+        stats = import_shards(["test_shard_1.csv", "test_shard_2.csv"], ["test_shard_1.ndjson"],
+                              max_workers=2)
+        self.assertEqual(stats, {'pet_owner_rows': 3, 'consultation_rows': 2, 'rejected': 1})
+        self.assertEqual([p.name for p in functions.pets], ["Toby", "Mia"])
+        self.assertEqual(functions.find_pet_by_name("Toby").species, "Perro")
+        self.assertEqual(len(functions.find_pet_by_name("Mia").consultations), 1)
+        self.assertTrue(os.path.exists("test_shard_2.csv.rejected.ndjson"))
+
+    def test_overlapping_consultation_ids_get_new_ids(self):
+        """Dos orígenes con el mismo ID de consulta: la segunda consulta recibe un ID nuevo."""
+        from parallel_import import import_shards
+        header = "pet_id,pet_name,species,breed,age,owner_id,owner_name,owner_phone,owner_address\n"
+        for number, (pet, owner) in enumerate((("Toby", "Ana"), ("Mia", "Luis")), 1):
+            with open(f"test_ids_{number}.csv", "w", encoding="utf-8") as f:
+                f.write(header + f"1,{pet},Perro,Pug,3,1,{owner},123,Calle 1\n")
+            with open(f"test_ids_{number}.ndjson", "w", encoding="utf-8") as f:
+                f.write(json.dumps({"id": 1, "pet_id": 1, "pet_name": pet, "date": "01/02/2024",
+                                    "reason": "Vacuna", "diagnosis": "Sano"}) + "\n")
+        try:
+            import_shards(["test_ids_1.csv", "test_ids_2.csv"], ["test_ids_1.ndjson", "test_ids_2.ndjson"],
+                          max_workers=2)
+        finally:
+            for name in ("test_ids_1.csv", "test_ids_2.csv", "test_ids_1.ndjson", "test_ids_2.ndjson"):
+                os.remove(name)
+        toby, mia = functions.pets
+        self.assertEqual(toby.id, 1)
+        self.assertNotEqual(mia.id, 1)
+        self.assertEqual(toby.consultations[0].id, 1)
+        self.assertNotEqual(mia.consultations[0].id, 1)
+        # Tras vaciar el registro el mismo ID vuelve a estar libre
+        functions.reset_data()
+        owner = Owner("Eva", "1", "Calle 3")
+        pet = Pet("Sol", "Gato", "Persa", 1, owner)
+        functions.owners.append(owner)
+        functions.pets.append(pet)
+        functions.merge_consultation_record("Sol", "02/02/2024", "Tos", "Gripe", pet.id, 1, set())
+        self.assertEqual(pet.consultations[0].id, 1)
+
+class TestBenchmarkSuite(unittest.TestCase):
+    """Pruebas de la comparación de resultados de benchmarks."""
+
+    def test_compare_flags_only_slowdowns_beyond_tolerance(self):
+        from bench_suite import compare_results
+        baseline = {"results": {"import_all": {"seconds": 1.0}, "import_all_memory": {"peak_bytes": 1000},
+                                "find_pet_by_name": {"seconds": 0.5}}}
+        current = {"results": {"import_all": {"seconds": 1.05}, "import_all_memory": {"peak_bytes": 1500},
+                               "find_pet_by_name": {"seconds": 0.2}, "new_metric": {"seconds": 9.0}}}
+        regressions = compare_results(current, baseline, tolerance=0.10)
+        self.assertEqual([(metric, field) for metric, field, *_ in regressions],
+                         [("import_all_memory", "peak_bytes")])
+
+class TestMetrics(unittest.TestCase):
+    """Pruebas de las métricas de operaciones."""
+
+    TEXTFILE = "test_metrics.prom"
+
+    def setUp(self):
+        functions.reset_data()
+        functions.owners.append(Owner("Ana", "123", "Calle 1"))
+
+    def tearDown(self):
+        import metrics
+        metrics.disable()
+        metrics.reset()
+        functions.reset_data()
+        if os.path.exists(self.TEXTFILE):
+            os.remove(self.TEXTFILE)
+
+    def test_disabled_functions_are_not_wrapped(self):
+        import metrics
+        original = functions.find_owner_by_name
+        metrics.enable()
+        self.assertIsNot(functions.find_owner_by_name, original)
+        metrics.disable()
+        self.assertIs(functions.find_owner_by_name, original)
+
+    def test_counts_latency_and_textfile(self):
+        import metrics
+        functions.enable_metrics(self.TEXTFILE)
+        for _ in range(3):
+            functions.find_owner_by_name("ana")
+        metrics.add_rows("find_owner", 3)
+        (name, calls, p50, p99, rows_per_second), = metrics.summary()
+        self.assertEqual((name, calls), ("find_owner", 3))
+        self.assertLessEqual(p50, p99)
+        self.assertGreater(rows_per_second, 0)
+
+        self.assertTrue(functions.dump_metrics())
+        with open(self.TEXTFILE, encoding="utf-8") as f:
+            text = f.read()
+        self.assertIn('vet_operation_seconds_count{operation="find_owner"} 3', text)
+        self.assertIn('vet_operation_seconds_bucket{operation="find_owner",le="+Inf"} 3', text)
+        self.assertIn('vet_operation_rows_total{operation="find_owner"} 3', text)
+
+    def test_textfile_uses_its_own_temporary_file(self):
+        import metrics
+        # Un temporal con nombre fijo ya ocupado (como el de otra escritura en curso) no molesta
+        os.mkdir(self.TEXTFILE + ".tmp")
+        try:
+            self.assertEqual(metrics.write_textfile(self.TEXTFILE), self.TEXTFILE)
+            self.assertTrue(os.path.isfile(self.TEXTFILE))
+        finally:
+            os.rmdir(self.TEXTFILE + ".tmp")
+        self.assertFalse([name for name in os.listdir(".") if name.startswith(self.TEXTFILE + ".")])
+
+class TestSnapshot(unittest.TestCase):
+    """Pruebas del snapshot binario con carga diferida de historiales."""
+
+    SNAPSHOT = "test_clinica.snap"
+
+    def setUp(self):
+        functions.reset_data()
+        ana = Owner("Ana", "123", "Calle Ñandú 1")
+        toby = Pet("Toby", "Perro", "Labrador", 5, ana)
+        mia = Pet("Mia", "Gato", "Siamés", 2, ana)
+        functions.owners.extend([ana, Owner("Luis", "456", "Calle 2")])
+        functions.pets.extend([toby, mia])
+        toby.add_consultation(Consultation("10/05/2024", "Vacunación", "Sano", toby))
+        toby.add_consultation(Consultation("01/01/2024", "Tos", "Resfriado", toby))
+        mia.add_consultation(Consultation("03/03/2024", "Control", "Otitis", mia))
+
+    def tearDown(self):
+        functions.reset_data()
+        if os.path.exists(self.SNAPSHOT):
+            os.remove(self.SNAPSHOT)
+
+    def test_round_trip_loads_histories_on_demand(self):
+        self.assertTrue(functions.export_snapshot(self.SNAPSHOT))
+        functions.reset_data()
+        functions.import_snapshot(self.SNAPSHOT)
+
+        self.assertEqual([o.name for o in functions.owners], ["Ana", "Luis"])
+        toby, mia = functions.pets
+        self.assertIs(toby.owner, mia.owner)
+        self.assertEqual(toby.owner.address, "Calle Ñandú 1")
+        self.assertFalse(toby.history_loaded)
+        self.assertEqual([c.date for c in toby.consultations], ["01/01/2024", "10/05/2024"])
+        self.assertTrue(toby.history_loaded)
+        self.assertFalse(mia.history_loaded)
+
+        # Las consultas de toda la clínica completan los historiales pendientes
+        functions.ensure_histories_loaded()
+        self.assertTrue(mia.history_loaded)
+        self.assertEqual([c.reason for c in functions.clinic_dates.recent(5)], ["Vacunación", "Control", "Tos"])
+        self.assertEqual(len(functions.search_index.search("otitis")), 1)
+
+    def test_import_merges_into_existing_pets(self):
+        functions.export_snapshot(self.SNAPSHOT)
+        functions.reset_data()
+        ana = Owner("ana", "999", "Otra calle")
+        toby = Pet("TOBY", "Perro", "Labrador", 5, ana)
+        functions.owners.append(ana)
+        functions.pets.append(toby)
+        toby.add_consultation(Consultation("01/01/2024", "Tos", "Resfriado", toby))
+        functions.import_snapshot(self.SNAPSHOT)
+        self.assertEqual([o.name for o in functions.owners], ["ana", "Luis"])
+        self.assertEqual([p.name for p in functions.pets], ["TOBY", "Mia"])
+        self.assertEqual(len(toby.consultations), 2)
+
+    def test_consultation_ids_taken_before_loading_are_replaced(self):
+        functions.export_snapshot(self.SNAPSHOT)
+        toby_ids = [c.id for c in functions.pets[0].consultations]
+        functions.reset_data()
+        functions.import_snapshot(self.SNAPSHOT)
+        # En un registro vacío el snapshot conserva sus IDs
+        self.assertEqual([c.id for c in functions.pets[0].consultations], toby_ids)
+
+        functions.reset_data()
+        eva = Owner("Eva", "789", "Calle 3")
+        rex = Pet("Rex", "Perro", "Boxer", 4, eva)
+        rex.add_consultation(Consultation("02/02/2024", "Control", "Sano", rex, toby_ids[0]))
+        functions.owners.append(eva)
+        functions.pets.append(rex)
+        functions.import_snapshot(self.SNAPSHOT)
+        toby = functions.find_pet_by_name("Toby")
+        self.assertFalse(toby.history_loaded)
+        self.assertNotIn(toby_ids[0], [c.id for c in toby.consultations])
+
+    def test_ids_beyond_32_bits(self):
+        from unittest import mock
+        import classes
+        # Las secuencias de IDs son globales: se restauran al terminar para no afectar a otras pruebas
+        for sequence in (classes.owner_ids, classes.pet_ids, classes.consultation_ids):
+            patcher = mock.patch.object(sequence, "_next", sequence._next)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        big = 2 ** 40
+        owner = Owner("Eva", "789", "Calle 3", big)
+        pet = Pet("Kira", "Perro", "Boxer", 4, owner, big + 1)
+        pet.add_consultation(Consultation("02/02/2024", "Control", "Sano", pet, big + 2))
+        functions.owners.append(owner)
+        functions.pets.append(pet)
+        self.assertTrue(functions.export_snapshot(self.SNAPSHOT))
+        functions.reset_data()
+        functions.import_snapshot(self.SNAPSHOT)
+        self.assertEqual(functions.registry.owner_by_id(big).name, "Eva")
+        kira = functions.registry.pet_by_id(big + 1)
+        self.assertEqual([c.id for c in kira.consultations], [big + 2])
+
+    def test_reads_version_2(self):
+        from unittest import mock
+        import snapshot
+        with mock.patch.multiple(snapshot, VERSION=2, OWNER=snapshot.OWNER_V2, PET=snapshot.PET_V2,
+                                 CONSULTATION=snapshot.CONSULTATION_V2):
+            self.assertTrue(functions.export_snapshot(self.SNAPSHOT))
+        functions.reset_data()
+        functions.import_snapshot(self.SNAPSHOT)
+        self.assertEqual([p.name for p in functions.pets], ["Toby", "Mia"])
+        self.assertEqual([c.date for c in functions.pets[0].consultations], ["01/01/2024", "10/05/2024"])
+
+    def test_rejects_other_files(self):
+        from snapshot import SnapshotReader, SnapshotError
+        with open(self.SNAPSHOT, "wb") as f:
+            f.write(b"pet_name,species\n" * 10)
+        with self.assertRaises(SnapshotError):
+            SnapshotReader(self.SNAPSHOT)
+
+class TestCompression(unittest.TestCase):
+    """Pruebas de las exportaciones comprimidas y de la escritura atómica."""
+
+    def setUp(self):
+        import tempfile
+        functions.reset_data()
+        ana = Owner("Ana", "123", "Calle Ñandú 1")
+        toby = Pet("Toby", "Perro", "Labrador", 5, ana)
+        functions.owners.append(ana)
+        functions.pets.append(toby)
+        toby.add_consultation(Consultation("10/05/2024", "Vacunación", "Sano", toby))
+        self.previous_directory = os.getcwd()
+        self.directory = tempfile.TemporaryDirectory()
+        os.chdir(self.directory.name)
+
+    def tearDown(self):
+        os.chdir(self.previous_directory)
+        self.directory.cleanup()
+        functions.export_compression = None
+        functions.reset_data()
+
+    def test_export_all_compressed_round_trip(self):
+        from unittest import mock
+        for compression, suffix in (("gzip", ".gz"), ("xz", ".xz")):
+            functions.use_compression(compression)
+            with mock.patch("builtins.print"):
+                self.assertTrue(functions.export_all())
+                self.assertFalse(os.path.exists("consultas.json"))
+                with open("consultas.json" + suffix, "rb") as f:
+                    self.assertNotEqual(f.read(1), b"[")
+                functions.reset_data()
+                functions.import_all()
+            self.assertEqual([p.name for p in functions.pets], ["Toby"])
+            self.assertEqual([c.reason for c in functions.pets[0].consultations], ["Vacunación"])
+
+    def test_import_reads_newest_variant(self):
+        from unittest import mock
+        from compression import latest_export
+        with mock.patch("builtins.print"):
+            functions.export_all()
+            functions.pets[0].add_consultation(Consultation("11/05/2024", "Control", "Sano", functions.pets[0]))
+            functions.use_compression("gzip")
+            functions.export_all()
+            os.utime("consultas.json", (0, 0))  # el archivo sin comprimir quedó viejo
+            self.assertEqual(latest_export("consultas.json"), "consultas.json.gz")
+            functions.reset_data()
+            functions.import_all()
+        self.assertEqual(len(functions.pets[0].consultations), 2)
+
+    def test_failed_write_keeps_previous_file(self):
+        from compression import atomic_text_writer
+        with atomic_text_writer("data.txt") as f:
+            f.write("first")
+        with self.assertRaises(RuntimeError):
+            with atomic_text_writer("data.txt", "gzip") as f:
+                f.write("second")
+                raise RuntimeError("disk full")
+        with open("data.txt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "first")
+        self.assertEqual(os.listdir("."), ["data.txt"])
+
+    def test_overlapping_writers_use_separate_temporary_files(self):
+        from compression import atomic_text_writer
+        # Como el menú y el autoguardado exportando el mismo archivo a la vez
+        with atomic_text_writer("data.txt") as menu:
+            menu.write("menu " * 1000)
+            with atomic_text_writer("data.txt") as autosave:
+                autosave.write("autosave")
+            with open("data.txt", encoding="utf-8") as f:
+                self.assertEqual(f.read(), "autosave")
+        with open("data.txt", encoding="utf-8") as f:
+            self.assertEqual(f.read(), "menu " * 1000)
+        self.assertEqual(os.listdir("."), ["data.txt"])
+
+    @unittest.skipUnless(os.name == "posix", "permisos POSIX")
+    def test_new_files_follow_the_umask(self):
+        from compression import atomic_text_writer
+        previous = os.umask(0o027)
+        try:
+            with atomic_text_writer("data.txt") as f:
+                f.write("x")
+            self.assertEqual(os.umask(0o027), 0o027)  # la escritura no cambió la umask
+        finally:
+            os.umask(previous)
+        self.assertEqual(os.stat("data.txt").st_mode & 0o777, 0o640)
+
+class TestAutosave(unittest.TestCase):
+    """Pruebas del autoguardado en segundo plano con seguimiento de cambios."""
+
+    def setUp(self):
+        functions.reset_data()
+        self.ana = Owner("Ana", "123", "Calle 1")
+        self.toby = Pet("Toby", "Perro", "Labrador", 5, self.ana)
+        functions.owners.append(self.ana)
+        functions.pets.append(self.toby)
+
+    def tearDown(self):
+        functions.disable_autosave()
+        functions.reset_data()
+
+    def test_saves_only_changes_and_retries_failures(self):
+        from autosave import Autosaver
+        results = [False, True]
+        saver = Autosaver(functions.registry, lambda: results.pop(0), interval=3600)
+        saver.tracker.attach(functions.registry)
+        try:
+            self.assertTrue(saver.save_if_changed())
+            self.assertEqual(saver.skipped, 1)
+            self.toby.add_consultation(Consultation("01/01/2024", "Tos", "Resfriado", self.toby))
+            self.assertFalse(saver.save_if_changed())  # el guardado falla: el cambio sigue anotado
+            self.assertTrue(saver.tracker)
+            self.assertTrue(saver.save_if_changed())
+            self.assertEqual((saver.saves, bool(saver.tracker)), (1, False))
+            self.assertEqual(results, [])
+        finally:
+            saver.tracker.detach(functions.registry)
+
+    def test_tracker_does_not_keep_discarded_pets(self):
+        import gc
+        import weakref
+        from autosave import ChangeTracker
+        tracker = ChangeTracker()
+        tracker.attach(functions.registry)
+        try:
+            mia = Pet("Mia", "Gato", "Siamés", 2, self.ana)
+            functions.pets.append(mia)
+            mia.add_consultation(Consultation("01/01/2024", "Tos", "Resfriado", mia))
+            discarded = weakref.ref(mia)
+            del mia
+            functions.reset_data()
+            gc.collect()
+            self.assertIsNone(discarded())
+            self.assertEqual(tracker.take(), (2, True))
+        finally:
+            tracker.detach(functions.registry)
+
+    def test_background_thread_saves_after_changes(self):
+        import time
+        import services
+        saves = []
+        functions.autosaver = None
+        from autosave import Autosaver
+        saver = functions.autosaver = Autosaver(functions.registry, lambda: saves.append(1) or True, 0.02)
+        saver.start()
+        services.add_consultations([{"pet_name": "Toby", "date": "01/01/2024", "reason": "Tos",
+                                     "diagnosis": "Resfriado"}])
+        deadline = time.monotonic() + 5
+        while not saves and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(saves, [1])
+        while saver.skipped == 0 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(saves, [1])  # sin cambios nuevos no vuelve a guardar
+
+    def test_checkpoint_skips_write_when_nothing_changed(self):
+        import tempfile
+        from unittest import mock
+        previous_directory = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory, mock.patch("builtins.print") as printed:
+            os.chdir(directory)
+            try:
+                functions.enable_autosave(3600)
+                self.assertTrue(functions.checkpoint())
+                self.assertFalse(os.path.exists("consultas.json"))
+                functions.pets.append(Pet("Mia", "Gato", "Siamés", 2, self.ana))
+                self.assertTrue(functions.checkpoint())
+                self.assertTrue(os.path.exists("consultas.json"))
+            finally:
+                os.chdir(previous_directory)
+        printed.assert_not_called()  # el guardado del autoguardado no interrumpe el menú
+
+class TestAggregates(unittest.TestCase):
+    """Pruebas de los contadores del reporte de la clínica."""
+
+    def setUp(self):
+        functions.reset_data()
+        import services
+        services.add_owners([{"name": "Ana", "phone": "123", "address": "Calle 1"}])
+        services.add_pets([
+            {"name": "Toby", "species": "Perro", "breed": "Labrador", "age": 5, "owner_name": "Ana"},
+            {"name": "Rex", "species": "perro", "breed": "labrador", "age": 3, "owner_name": "Ana"},
+            {"name": "Mia", "species": "Gato", "breed": "Siamés", "age": 2, "owner_name": "Ana"},
+        ])
+        services.add_consultations([
+            {"pet_name": "Toby", "date": "10/05/2024", "reason": "Oído", "diagnosis": "Otitis"},
+            {"pet_name": "Rex", "date": "20/05/2024", "reason": "Oído", "diagnosis": "otitis"},
+            {"pet_name": "Rex", "date": "02/06/2024", "reason": "Tos", "diagnosis": "Resfriado"},
+            {"pet_name": "Mia", "date": "15/01/2024", "reason": "Control", "diagnosis": "Sano"},
+        ])
+
+    def tearDown(self):
+        functions.reset_data()
+
+    def test_counters_follow_registrations(self):
+        report = functions.clinic_report()
+        self.assertEqual(report["visits_per_month"], [("2024-01", 1), ("2024-05", 2), ("2024-06", 1)])
+        self.assertEqual(report["top_diagnoses"], {"Gato": [("Sano", 1)],
+                                                   "Perro": [("Otitis", 2), ("Resfriado", 1)]})
+        self.assertEqual(report["pets_per_breed"], [("Labrador", 2), ("Siamés", 1)])
+        self.assertEqual(functions.clinic_aggregates.visits_per_month("2024-05", "2024-05"), [("2024-05", 2)])
+
+    def test_rebuilt_after_import_all(self):
+        import tempfile
+        from unittest import mock
+        expected = functions.clinic_report()
+        previous_directory = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory, mock.patch("builtins.print"):
+            os.chdir(directory)
+            try:
+                functions.export_all()
+                functions.reset_data()
+                functions.import_all()
+                functions.import_all()  # los duplicados no se cuentan dos veces
+            finally:
+                os.chdir(previous_directory)
+        self.assertEqual(functions.clinic_report(), expected)
+        self.assertEqual(len(functions.clinic_aggregates), 4)
+
+class TestNameSuggestions(unittest.TestCase):
+    """Pruebas de las sugerencias por nombres parecidos."""
+
+    def setUp(self):
+        functions.reset_data()
+        self.ana = Owner("Ana Pérez", "123", "Calle 1")
+        functions.owners.extend([self.ana, Owner("Juan Gómez", "456", "Calle 2")])
+        functions.pets.extend([Pet("Toby", "Perro", "Labrador", 5, self.ana),
+                               Pet("Ñandú", "Ave", "Rhea", 3, self.ana),
+                               Pet("Tomás", "Gato", "Persa", 1, self.ana)])
+
+    def tearDown(self):
+        functions.reset_data()
+
+    def test_ranked_near_matches(self):
+        self.assertEqual([p.name for p in functions.suggest_pets("Tobby")][:1], ["Toby"])
+        self.assertEqual([p.name for p in functions.suggest_pets("nandu")], ["Ñandú"])
+        self.assertEqual(functions.suggest_pets("Zzyzx"), [])
+        self.assertIs(functions.suggest_owners("ana peres")[0], self.ana)
+        # Después de la primera búsqueda el índice se actualiza con cada alta
+        functions.pets.append(Pet("Tobías", "Perro", "Boxer", 2, self.ana))
+        self.assertIn("Tobías", [p.name for p in functions.suggest_pets("Tobia")])
+
+    def test_register_pet_with_mistyped_owner_reuses_existing_owner(self):
+        from unittest import mock
+        answers = ["Kira", "Perro", "Boxer", "4", "Ana Peres", "1"]
+        with mock.patch("builtins.input", side_effect=answers), mock.patch("builtins.print"):
+            functions.register_pet()
+        self.assertEqual(len(functions.owners), 2)
+        self.assertIs(functions.find_pet_by_name("Kira").owner, self.ana)
+
+    def test_register_consultation_with_mistyped_pet(self):
+        from unittest import mock
+        answers = ["Tobi", "10/05/2024", "Control", "Sano", "1"]
+        with mock.patch("builtins.input", side_effect=answers), mock.patch("builtins.print"):
+            functions.register_consultation()
+        self.assertEqual(len(functions.find_pet_by_name("Toby").consultations), 1)
+
+class TestLazyHistories(unittest.TestCase):
+    """Pruebas de la carga diferida de historiales desde el archivo de consultas."""
+
+    FILES = ("test_lazy.json", "test_lazy.ndjson", "test_lazy.ndjson.rejected.ndjson")
+
+    def setUp(self):
+        functions.reset_data()
+        ana = Owner("Ana", "123", "Calle 1")
+        functions.owners.append(ana)
+        self.pets = [Pet("Ñandú", "Ave", "Rhea", 3, ana), Pet("Toby", "Perro", "Labrador", 5, ana)]
+        functions.pets.extend(self.pets)
+        for pet, visits in zip(self.pets, (["10/05/2024", "01/01/2024"], ["03/03/2024"])):
+            for date in visits:
+                pet.add_consultation(Consultation(date, "Revisión", "Otitis leve", pet))
+
+    def tearDown(self):
+        functions.reset_data()
+        for filename in self.FILES:
+            if os.path.exists(filename):
+                os.remove(filename)
+
+    def test_json_and_ndjson_histories_load_on_access(self):
+        functions.export_consultas_json("test_lazy.json")
+        functions.export_consultas_ndjson("test_lazy.ndjson")
+        for filename in ("test_lazy.json", "test_lazy.ndjson"):
+            functions.reset_data()
+            functions.owners.append(self.pets[0].owner)
+            self.pets = [Pet(p.name, p.species, p.breed, p.age, p.owner) for p in self.pets]
+            functions.pets.extend(self.pets)
+            functions.import_consultas_json(filename, lazy=True)
+            nandu, toby = self.pets
+            self.assertFalse(nandu.history_loaded)
+            self.assertEqual([c.date for c in nandu.consultations], ["01/01/2024", "10/05/2024"])
+            self.assertEqual(nandu.consultations[0].reason, "Revisión")
+            self.assertFalse(toby.history_loaded)
+            functions.ensure_histories_loaded()
+            self.assertTrue(toby.history_loaded)
+            self.assertEqual(len(functions.search_index.search("otitis")), 3)
+
+    def test_index_reads_file_in_chunks(self):
+        from unittest import mock
+        functions.export_consultas_json("test_lazy.json")
+        expected = [[c.date for c in pet.consultations] for pet in self.pets]
+        for pet in self.pets:
+            pet._consultations = None
+        # Bloques más chicos que una mascota y que cortan los caracteres de varios bytes
+        with mock.patch("history_index.CHUNK_SIZE", 7):
+            functions.import_consultas_json("test_lazy.json", lazy=True)
+        self.assertEqual([[c.date for c in pet.consultations] for pet in self.pets], expected)
+        self.assertEqual(self.pets[0].consultations[0].reason, "Revisión")
+
+    def test_invalid_and_duplicate_records(self):
+        with open("test_lazy.ndjson", "w", encoding="utf-8") as f:
+            f.write('{"pet_name": "toby", "date": "03/03/2024", "reason": "Tos", "diagnosis": "Gripe"}\n')
+            f.write('{"pet_name": "Toby", "date": "03/03/2024", "reason": "Tos", "diagnosis": "Gripe"}\n')
+            f.write('{"pet_name": "Toby", "date": "2024", "reason": "Tos", "diagnosis": "Gripe"}\n')
+            f.write('{"pet_name": "Toby", "da\n')
+        toby = functions.find_pet_by_name("Toby")
+        toby._consultations = None
+        functions.import_consultas_json("test_lazy.ndjson", lazy=True)
+        self.assertTrue(os.path.exists("test_lazy.ndjson.rejected.ndjson"))
+        self.assertEqual(len(toby.consultations), 1)
+
+    def test_changed_file_keeps_history_pending(self):
+        functions.export_consultas_ndjson("test_lazy.ndjson")
+        toby = functions.find_pet_by_name("Toby")
+        toby._consultations = None
+        functions.import_consultas_json("test_lazy.ndjson", lazy=True)
+        with open("test_lazy.ndjson", "a", encoding="utf-8") as f:
+            f.write("\n")
+        with self.assertRaises(RuntimeError):
+            toby.consultations
+        self.assertFalse(toby.history_loaded)
+
+class TestServer(unittest.IsolatedAsyncioTestCase):
+    """Pruebas del modo servidor con varios clientes conectados."""
+
+    async def asyncSetUp(self):
+        from server import ClinicServer
+        functions.reset_data()
+        self.server = ClinicServer()
+        await self.server.start(port=0)
+        self.host, self.port = self.server.address
+
+    async def asyncTearDown(self):
+        await self.server.stop()
+        functions.reset_data()
+
+    async def test_commands_round_trip(self):
+        from vet_client import ClinicClient, ServerError
+        client = await ClinicClient.connect(self.host, self.port)
+        self.assertEqual(await client.request("ping"), "pong")
+        result = await client.request("REGISTER_OWNER", records=[
+            {"name": "Ana", "phone": "123", "address": "Calle 1"},
+            {"name": "1234", "phone": "123", "address": "Calle 1"},
+        ])
+        self.assertEqual(result["added"], 1)
+        self.assertEqual(result["errors"][0][0], 1)
+        await client.request("REGISTER_PET", name="Toby", species="Perro", breed="Labrador", age=5, owner_name="ana")
+        await client.request("REGISTER_CONSULTATION", pet_name="Toby", date="10/05/2024", reason="Tos", diagnosis="Gripe")
+        history = await client.request("HISTORY", name="toby")
+        self.assertEqual(history["total"], 1)
+        self.assertEqual(history["consultations"][0]["reason"], "Tos")
+        self.assertEqual((await client.request("LIST"))["pets"][0]["owner"]["name"], "Ana")
+        self.assertEqual(await client.request("FIND_PET", name="Nadie"), [])
+        with self.assertRaises(ServerError):
+            await client.request("DROP_TABLES")
+        with self.assertRaises(ServerError):
+            await client.request("LIST", limit=-1)
+        await client.close()
+
+    async def test_pets_with_the_same_name_by_id(self):
+        from vet_client import ClinicClient, ServerError
+        client = await ClinicClient.connect(self.host, self.port)
+        await client.request("REGISTER_OWNER", name="Ana", phone="123", address="Calle 1")
+        await client.request("REGISTER_PET", records=[
+            {"name": "Rex", "species": "Perro", "breed": "Boxer", "age": 3, "owner_name": "Ana"},
+            {"name": "Rex", "species": "Gato", "breed": "Persa", "age": 1, "owner_name": "Ana"},
+        ])
+        first, second = functions.registry.find_pets("Rex")
+        second.add_consultation(Consultation("10/05/2024", "Tos", "Gripe", second))
+        found = await client.request("FIND_PET", name="rex")
+        self.assertEqual([pet["id"] for pet in found], [first.id, second.id])
+        self.assertEqual((await client.request("FIND_PET", id=second.id))[0]["species"], "Gato")
+        history = await client.request("HISTORY", id=second.id)
+        self.assertEqual((history["pet"]["id"], history["total"]), (second.id, 1))
+        self.assertEqual((await client.request("HISTORY", name="Rex"))["total"], 0)
+        self.assertIsNone(await client.request("HISTORY", id=10 ** 9))
+        with self.assertRaises(ServerError):
+            await client.request("HISTORY", id="2")
+        await client.close()
+
+    async def test_owners_with_the_same_name_by_id(self):
+        from vet_client import ClinicClient
+        client = await ClinicClient.connect(self.host, self.port)
+        await client.request("REGISTER_OWNER", records=[
+            {"name": "Ana", "phone": "123", "address": "Calle 1"},
+            {"name": "Ana", "phone": "456", "address": "Calle 2"},
+        ])
+        found = await client.request("FIND_OWNER", name="ana")
+        self.assertEqual([owner["phone"] for owner in found], ["123", "456"])
+        second_id = found[1]["id"]
+        self.assertEqual((await client.request("FIND_OWNER", id=second_id))[0]["address"], "Calle 2")
+        self.assertEqual(await client.request("FIND_OWNER", id=10 ** 9), [])
+        self.assertEqual(await client.request("FIND_OWNER", name="Nadie"), [])
+        # Con el ID del dueño la mascota queda con la segunda Ana
+        await client.request("REGISTER_PET", name="Luna", species="Gato", breed="Persa", age=2, owner_id=second_id)
+        self.assertEqual((await client.request("FIND_PET", name="Luna"))[0]["owner"]["phone"], "456")
+        await client.close()
+
+    async def test_rejects_objects_sent_as_plain_values(self):
+        from vet_client import ClinicClient
+        client = await ClinicClient.connect(self.host, self.port)
+        await client.request("REGISTER_OWNER", name="Ana", phone="123", address="Calle 1")
+        result = await client.request("REGISTER_PET", name="Toby", species="Perro", breed="Labrador", age=5,
+                                      owner="bob")
+        self.assertEqual((result["added"], result["errors"][0][0]), (0, 0))
+        result = await client.request("REGISTER_CONSULTATION", pet={"name": "zzz"}, date="10/05/2024",
+                                      reason="Tos", diagnosis="Gripe")
+        self.assertEqual((result["added"], result["errors"][0][0]), (0, 0))
+        self.assertEqual((await client.request("LIST"))["total"], 0)
+        await client.close()
+        with self.assertRaises(AttributeError):  # un objeto que no se puede indexar no queda en la lista
+            functions.pets.append("bob")
+        self.assertEqual(len(functions.pets), 0)
+        previous_directory = os.getcwd()
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                self.assertTrue(functions.export_all())
+            finally:
+                os.chdir(previous_directory)
+
+    async def test_many_clients_at_once(self):
+        from vet_client import load_test
+        stats = await load_test(clients=100, requests=8, host=self.host, port=self.port)
+        self.assertEqual(stats["requests"], 800)
+        self.assertEqual(len(functions.pets), 100)
+        self.assertEqual(sum(len(pet.consultations) for pet in functions.pets), 200)
+        for _ in range(100):  # las conexiones terminan de cerrarse del lado del servidor
+            if self.server.clients == 0:
+                break
+            await asyncio.sleep(0.01)
+        self.assertEqual(self.server.clients, 0)
+
+class TestThreadSafety(unittest.TestCase):
+    """Pruebas del registro compartido entre hilos."""
+
+    def setUp(self):
+        functions.reset_data()
+
+    def tearDown(self):
+        functions.reset_data()
+
+    def test_rw_lock_is_reentrant_and_excludes_writers(self):
+        import threading
+        from registry import RWLock
+        lock = RWLock()
+        with lock.write():
+            with lock.read(), lock.write():
+                pass
+        acquired = threading.Event()
+
+        def writer():
+            with lock.write():
+                acquired.set()
+
+        with lock.read():
+            with lock.read():
+                pass
+            with self.assertRaises(RuntimeError):
+                lock.acquire_write()
+            thread = threading.Thread(target=writer)
+            thread.start()
+            self.assertFalse(acquired.wait(0.05))
+        self.assertTrue(acquired.wait(5))
+        thread.join()
+
+    def test_concurrent_registrations_reads_and_exports(self):
+        import tempfile
+        from concurrent.futures import ThreadPoolExecutor
+        from unittest import mock
+        import services
+        desks, pets_per_desk, visits_per_pet = 16, 4, 10
+
+        def desk(number):
+            owner = f"Desk Owner {number}"
+            services.add_owners([{"name": owner, "phone": str(1000 + number), "address": f"Calle {number}"}])
+            for p in range(pets_per_desk):
+                services.add_pets([{"name": f"Desk Pet {number}-{p}", "species": "Perro", "breed": "Boxer",
+                                    "age": p, "owner_name": owner}])
+            for visit in range(visits_per_pet):
+                for p in range(pets_per_desk):
+                    # Fechas desordenadas para que cada alta inserte en medio del historial
+                    services.add_consultations([{"pet_name": f"Desk Pet {number}-{p}",
+                                                 "date": f"{(visit * 7) % 28 + 1:02d}/02/2024",
+                                                 "reason": f"Control {visit}", "diagnosis": "Sano"}])
+
+        def reader(_):
+            view = functions.registry.snapshot()
+            owners = set(map(id, view.owners))
+            self.assertEqual(len(view.pets), len(view.histories))
+            for pet, history in zip(view.pets, view.histories):
+                self.assertIn(id(pet.owner), owners)
+                days = [consultation.day for consultation in history]
+                self.assertEqual(days, sorted(days))
+            return sum(map(len, view.histories))
+
+        def exporter(number):
+            filename = os.path.join(directory, f"consultas_{number}.ndjson")
+            view = functions.registry.snapshot()
+            self.assertTrue(functions.export_consultas_ndjson(filename, view))
+            with open(filename, encoding="utf-8") as f:
+                self.assertEqual(sum(1 for _ in f), sum(map(len, view.histories)))
+
+        with tempfile.TemporaryDirectory() as directory, mock.patch("builtins.print"), \
+                ThreadPoolExecutor(max_workers=8) as pool:
+            futures = [pool.submit(desk, number) for number in range(desks)]
+            futures += [pool.submit(reader, number) for number in range(40)]
+            futures += [pool.submit(exporter, number) for number in range(10)]
+            for future in futures:
+                future.result()
+
+        self.assertEqual(len(functions.owners), desks)
+        self.assertEqual(len(functions.pets), desks * pets_per_desk)
+        self.assertEqual(reader(None), desks * pets_per_desk * visits_per_pet)
+        self.assertEqual(len(functions.clinic_dates.recent(10 ** 6)), desks * pets_per_desk * visits_per_pet)
 
 if __name__ == '__main__':
     print("\n======== Running Veterinary Clinic Unit Tests ========")
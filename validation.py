@@ -0,0 +1,209 @@
+"""
+Reglas de validación de los datos ingresados.
+Se usan tanto en el registro interactivo como en el registro por lotes (services.py)
+y en la importación de archivos, donde se validan lotes completos de filas con
+expresiones regulares precompiladas y las filas inválidas se apartan a un archivo
+de rechazos.
+"""
+import json
+import os
+import re
+
+# Una letra (cualquier carácter de palabra que no sea dígito ni guion bajo)
+_LETTER = re.compile(r"[^\W\d_]")
+# Con dígitos, sin letras y que no sea solo dígitos (por ejemplo 10/05/2024)
+_DATE = re.compile(r"(?s)(?!.*[^\W\d_])(?=.*\d)(?!\d+\Z).+")
+_AGE = re.compile(r"\s*\d+\s*")
+
+
+# Los validadores de texto rechazan los valores que no son cadenas (un número o una lista en un
+# archivo importado) en lugar de fallar con TypeError.
+
+def is_valid_name(value):
+    """Valida que el valor no sea solo numérico y tenga sentido como nombre."""
+    # Si contiene una letra ya no puede ser solo numérico
+    return isinstance(value, str) and _LETTER.search(value) is not None
+
+def is_valid_reason_or_diagnosis(value):
+    """Valida que el motivo o diagnóstico no sea solo numérico, no esté vacío y tenga letras."""
+    return isinstance(value, str) and _LETTER.search(value) is not None
+
+def is_valid_date(value):
+    """Valida que la fecha no esté vacía, no sea solo números y que tenga formato básico."""
+    return isinstance(value, str) and _DATE.match(value) is not None
+
+def is_valid_phone(value):
+    """Valida que el teléfono no esté vacío ni sea solo letras."""
+    return isinstance(value, str) and bool(value) and not value.isalpha()
+
+def is_valid_age(value):
+    """Valida que la edad sea un entero no negativo (como número o como texto)."""
+    if isinstance(value, int):
+        return value >= 0 and not isinstance(value, bool)
+    return isinstance(value, str) and _AGE.fullmatch(value) is not None
+
+def is_not_empty(value):
+    """Valida que el valor tenga algún carácter además de espacios."""
+    return isinstance(value, str) and bool(value) and not value.isspace()
+
+def parse_id(value):
+    """
+    ID de un registro importado como entero, o None si no tiene (archivos anteriores a los IDs)
+    o no es un entero no negativo; en ese caso el registro se identifica por nombre.
+    """
+    if type(value) is int:
+        return value if value >= 0 else None
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    return None
+
+
+##############################
+# VALIDACIÓN POR LOTES PARA IMPORTACIONES
+##############################
+
+# Reglas por campo: (campo, validador, mensaje de error)
+PET_OWNER_ROW_RULES = (
+    ('pet_name', is_valid_name, "invalid pet name"),
+    ('species', is_valid_name, "invalid species"),
+    ('breed', is_valid_name, "invalid breed"),
+    ('age', is_valid_age, "invalid age"),
+    ('owner_name', is_valid_name, "invalid owner name"),
+    ('owner_phone', is_valid_phone, "invalid owner phone"),
+    ('owner_address', is_not_empty, "empty owner address"),
+)
+
+CONSULTATION_RECORD_RULES = (
+    ('pet_name', is_valid_name, "invalid pet name"),
+    ('date', is_valid_date, "invalid date"),
+    ('reason', is_valid_reason_or_diagnosis, "invalid reason"),
+    ('diagnosis', is_valid_reason_or_diagnosis, "invalid diagnosis"),
+)
+
+# Cantidad de filas validadas juntas durante una importación
+BATCH_SIZE = 10000
+
+
+def row_errors(row, rules):
+    """Mensajes de error de una fila (lista vacía si es válida)."""
+    if not isinstance(row, dict):
+        return ["malformed record"]
+    errors = []
+    for field, check, message in rules:
+        value = row.get(field)
+        if value is None or not check(value):
+            errors.append(message)
+    return errors
+
+
+def check_column(values, check):
+    """
+    Veredicto de `check` para cada valor de una columna. Cada texto distinto se valida una
+    sola vez (especies, fechas y dueños se repiten mucho); None nunca es válido.
+    """
+    verdicts = {}
+    result = []
+    append = result.append
+    for value in values:
+        if type(value) is str:
+            verdict = verdicts.get(value)
+            if verdict is None:
+                verdict = verdicts[value] = check(value)
+        else:  # números, listas, etc.: sin caché (True y 1 serían la misma clave)
+            verdict = value is not None and check(value)
+        append(verdict)
+    return result
+
+
+def validate_batch(rows, rules):
+    """
+    Valida un lote de filas de una vez, columna por columna.
+    Devuelve (filas válidas, rechazos) donde cada rechazo es (posición en el lote, fila, errores).
+    """
+    errors = {}  # posición -> mensajes de error
+    records = []
+    positions = []
+    for position, row in enumerate(rows):
+        if isinstance(row, dict):
+            records.append(row)
+            positions.append(position)
+        else:
+            errors[position] = ["malformed record"]
+    for field, check, message in rules:
+        column = [row.get(field) for row in records]
+        for position, valid in zip(positions, check_column(column, check)):
+            if not valid:
+                errors.setdefault(position, []).append(message)
+    if not errors:
+        return records, []
+    rejected = [(position, rows[position], errors[position]) for position in sorted(errors)]
+    valid = [row for position, row in zip(positions, records) if position not in errors]
+    return valid, rejected
+
+
+def iter_batches(rows, size=BATCH_SIZE):
+    """Agrupa un iterable de filas en listas de hasta `size` elementos, sin cargarlo entero."""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class RejectFile:
+    """
+    Archivo de cuarentena (una fila rechazada por línea, en JSON).
+    Solo se crea si realmente hay filas rechazadas; los rechazos de una importación
+    anterior del mismo archivo se descartan.
+    """
+
+    def __init__(self, filename, source):
+        self.filename = filename
+        self.source = source
+        self.count = 0
+        self._file = None
+        if os.path.exists(filename):
+            os.remove(filename)
+
+    def write(self, record_number, row, errors):
+        if self._file is None:
+            self._file = open(self.filename, 'w', encoding='utf-8')
+        self._file.write(json.dumps(
+            {'source': self.source, 'record': record_number, 'errors': errors, 'row': row},
+            ensure_ascii=False
+        ))
+        self._file.write('\n')
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def reject_filename(filename):
+    """Nombre del archivo de rechazos asociado a un archivo importado."""
+    return f"{filename}.rejected.ndjson"
+
+
+def validated_rows(rows, rules, rejects, batch_size=BATCH_SIZE):
+    """
+    Genera las filas válidas de `rows`, validándolas por lotes.
+    Las inválidas se escriben en `rejects` (RejectFile) con su número de registro (desde 1).
+    """
+    offset = 0
+    for batch in iter_batches(rows, batch_size):
+        valid, rejected = validate_batch(batch, rules)
+        for position, row, errors in rejected:
+            rejects.write(offset + position + 1, row, errors)
+        offset += len(batch)
+        yield from valid
@@ -0,0 +1,136 @@
+"""
+Cliente de prueba del modo servidor (server.py).
+
+Envía un comando y muestra la respuesta, o con --load abre muchas conexiones
+a la vez y mide la latencia de los pedidos para comprobar que el servidor
+sigue respondiendo con cientos de recepciones conectadas.
+
+Uso:
+    python vet_client.py [--host H] [--port P | --unix RUTA] COMANDO ['{"arg": ...}']
+    python vet_client.py [--host H] [--port P | --unix RUTA] --load 300 [--requests 20]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from server import DEFAULT_HOST, DEFAULT_PORT
+
+
+class ServerError(Exception):
+    """El servidor respondió {"ok": false, "error": ...}."""
+
+
+class ClinicClient:
+    """Conexión a un ClinicServer; un pedido a la vez por conexión."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+
+    @classmethod
+    async def connect(cls, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+        if unix_path:
+            reader, writer = await asyncio.open_unix_connection(unix_path)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def request(self, command, **args):
+        """Envía un comando y devuelve su resultado; lanza ServerError si el servidor lo rechaza."""
+        line = command if not args else f"{command} {json.dumps(args, ensure_ascii=False)}"
+        self._writer.write(line.encode('utf-8') + b'\n')
+        await self._writer.drain()
+        response = await self._reader.readline()
+        if not response:
+            raise ConnectionError("Server closed the connection.")
+        response = json.loads(response)
+        if not response['ok']:
+            raise ServerError(response['error'])
+        return response['result']
+
+    async def close(self):
+        try:
+            await self.request('QUIT')
+        except (ConnectionError, ServerError):
+            pass
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+async def load_test(clients=300, requests=20, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_path=None):
+    """
+    Conecta `clients` clientes a la vez; cada uno hace `requests` pedidos mezclando lecturas y altas.
+    Devuelve un diccionario con la cantidad de pedidos, la duración total y las latencias p50/p99.
+    """
+    connections = await asyncio.gather(*(ClinicClient.connect(host, port, unix_path) for _ in range(clients)))
+    latencies = []
+
+    async def desk(number, client):
+        owner = f"Load Owner {number}"
+        await client.request('REGISTER_OWNER', name=owner, phone=f"{5550000 + number}", address=f"Desk {number}")
+        await client.request('REGISTER_PET', name=f"Load Pet {number}", species="Perro", breed="Mestizo",
+                             age=number % 15, owner_name=owner)
+        for request_number in range(requests):
+            start = time.perf_counter()
+            if request_number % 4 == 0:
+                await client.request('REGISTER_CONSULTATION', pet_name=f"Load Pet {number}",
+                                     date=f"{request_number % 28 + 1:02d}/01/2024",
+                                     reason=f"Control {request_number}", diagnosis="Sano")
+            elif request_number % 4 == 1:
+                await client.request('HISTORY', name=f"Load Pet {number}", limit=5)
+            elif request_number % 4 == 2:
+                await client.request('LIST', offset=number % 10, limit=20)
+            else:
+                await client.request('FIND_PET', name=f"Load Pet {(number * 7) % clients}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(desk(number, client) for number, client in enumerate(connections)))
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*(client.close() for client in connections))
+    latencies.sort()
+    return {
+        'clients': clients,
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'p50': statistics.median(latencies),
+        'p99': latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+async def _run_command(args):
+    client = await ClinicClient.connect(args.host, args.port, args.unix)
+    try:
+        arguments = json.loads(args.arguments) if args.arguments else {}
+        result = await client.request(args.command, **arguments)
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    except ServerError as e:
+        print(f"Server error: {e}")
+    finally:
+        await client.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Test client for the clinic server.")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--unix", help="connect to this Unix socket instead of TCP")
+    parser.add_argument("--load", type=int, metavar="CLIENTS", help="run a load test with this many clients")
+    parser.add_argument("--requests", type=int, default=20, help="requests per client in the load test")
+    parser.add_argument("command", nargs="?", default="PING")
+    parser.add_argument("arguments", nargs="?", help="JSON object with the command arguments")
+    args = parser.parse_args()
+
+    if args.load:
+        stats = asyncio.run(load_test(args.load, args.requests, args.host, args.port, args.unix))
+        print(f"{stats['requests']} requests from {stats['clients']} clients in {stats['seconds']:.2f} s "
+              f"({stats['requests'] / stats['seconds']:,.0f} req/s); "
+              f"p50 {stats['p50'] * 1000:.1f} ms, p99 {stats['p99'] * 1000:.1f} ms")
+    else:
+        asyncio.run(_run_command(args))
+
+
+if __name__ == "__main__":
+    main()